@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+from functools import wraps
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+
+logger = logging.getLogger(__name__)
+
+SLOTS_CACHE_KEY = "redfid_edx_api.admission.slots.{}"
+POLL_INTERVAL = 0.1
+
+_semaphores = {}
+_semaphores_lock = threading.Lock()
+
+
+def get_local_limit(endpoint):
+    """
+    Cantidad máxima de solicitudes simultáneas del endpoint en este proceso (REDFID_EDX_API_CONCURRENCY_LIMITS),
+    o None si el endpoint no tiene límite.
+    """
+    return settings.REDFID_EDX_API_CONCURRENCY_LIMITS.get(endpoint)
+
+
+def get_cluster_limit(endpoint):
+    """
+    Cantidad máxima de solicitudes simultáneas del endpoint entre todos los procesos
+    (REDFID_EDX_API_CLUSTER_CONCURRENCY_LIMITS), contadas en la cache compartida, o None si no tiene límite.
+    """
+    return settings.REDFID_EDX_API_CLUSTER_CONCURRENCY_LIMITS.get(endpoint)
+
+
+def get_slots_cache():
+    return caches[settings.REDFID_EDX_API_CONCURRENCY_CACHE_ALIAS]
+
+
+def _get_semaphore(endpoint, limit):
+    key = (endpoint, limit)
+    semaphore = _semaphores.get(key)
+    if semaphore is None:
+        with _semaphores_lock:
+            semaphore = _semaphores.setdefault(key, threading.BoundedSemaphore(limit))
+    return semaphore
+
+
+def _acquire_cluster_slot(endpoint, limit, deadline):
+    """
+    Toma un cupo del contador compartido, esperando hasta deadline. El contador expira a los
+    REDFID_EDX_API_CONCURRENCY_SLOT_TIMEOUT segundos, para que los cupos de un worker que murió sin liberarlos
+    no queden tomados para siempre.
+    """
+    cache = get_slots_cache()
+    key = SLOTS_CACHE_KEY.format(endpoint)
+    while True:
+        cache.add(key, 0, settings.REDFID_EDX_API_CONCURRENCY_SLOT_TIMEOUT)
+        try:
+            if cache.incr(key) <= limit:
+                return True
+            cache.decr(key)
+        except ValueError:
+            # El contador expiró entre add e incr.
+            continue
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(POLL_INTERVAL)
+
+
+def _release_cluster_slot(endpoint):
+    try:
+        get_slots_cache().decr(SLOTS_CACHE_KEY.format(endpoint))
+    except ValueError:
+        pass
+
+
+def acquire(endpoint):
+    """
+    Toma un cupo del endpoint, esperando hasta REDFID_EDX_API_CONCURRENCY_QUEUE_TIMEOUT segundos. Retorna una
+    función que libera el cupo, o None si el endpoint está saturado.
+    """
+    local_limit = get_local_limit(endpoint)
+    cluster_limit = get_cluster_limit(endpoint)
+    deadline = time.monotonic() + settings.REDFID_EDX_API_CONCURRENCY_QUEUE_TIMEOUT
+    semaphore = _get_semaphore(endpoint, local_limit) if local_limit else None
+    if semaphore is not None and not semaphore.acquire(timeout=max(deadline - time.monotonic(), 0)):
+        return None
+    if cluster_limit and not _acquire_cluster_slot(endpoint, cluster_limit, deadline):
+        if semaphore is not None:
+            semaphore.release()
+        return None
+    released = []
+
+    def release():
+        if released:
+            return
+        released.append(True)
+        if cluster_limit:
+            _release_cluster_slot(endpoint)
+        if semaphore is not None:
+            semaphore.release()
+    return release
+
+
+class _ReleasingIterator(object):
+    """
+    Itera el contenido de una respuesta en streaming y libera el cupo al terminar, al fallar, o cuando el servidor
+    cierra la respuesta (aunque no se haya terminado de generar, por ejemplo si el cliente se desconecta).
+    """
+
+    def __init__(self, content, release):
+        self.iterator = iter(content)
+        self.release = release
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self.iterator)
+        except BaseException:
+            self.release()
+            raise
+
+    def close(self):
+        self.release()
+
+
+def too_many_requests():
+    response = HttpResponse("Too many concurrent requests", status=429)
+    response['Retry-After'] = str(settings.REDFID_EDX_API_CONCURRENCY_RETRY_AFTER)
+    return response
+
+
+def limit_concurrency(endpoint):
+    """
+    Decorador para el método post de los endpoints costosos (exportaciones de un curso completo). Limita las
+    solicitudes simultáneas del endpoint por proceso y, opcionalmente, en todo el cluster; si no hay cupo dentro
+    del tiempo de espera se retorna 429 con el header Retry-After. En las respuestas en streaming el cupo se libera
+    al terminar de generarlas.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(self, request, *args, **kwargs):
+            if not get_local_limit(endpoint) and not get_cluster_limit(endpoint):
+                return view_func(self, request, *args, **kwargs)
+            release = acquire(endpoint)
+            if release is None:
+                logger.warning("limit_concurrency - {} saturated".format(endpoint))
+                return too_many_requests()
+            try:
+                response = view_func(self, request, *args, **kwargs)
+            except Exception:
+                release()
+                raise
+            if response.streaming:
+                response.streaming_content = _ReleasingIterator(response.streaming_content, release)
+            else:
+                release()
+            return response
+        return wrapper
+    return decorator
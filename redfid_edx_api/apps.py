@@ -1,6 +1,7 @@
 from django.apps import AppConfig
 from openedx.core.djangoapps.plugins.constants import (
     PluginSettings,
+    PluginSignals,
     PluginURLs,
     ProjectType,
     SettingsType,
@@ -24,4 +25,88 @@ class RedfidEdxApi(AppConfig):
                 SettingsType.COMMON: {
                     PluginSettings.RELATIVE_PATH: "settings.common"}},
         },
-    }
\ No newline at end of file
+        PluginSignals.CONFIG: {
+            ProjectType.CMS: {
+                PluginSignals.RELATIVE_PATH: "signals",
+                PluginSignals.RECEIVERS: [
+                    {
+                        PluginSignals.RECEIVER_FUNC_NAME: "invalidate_course_cache",
+                        PluginSignals.SIGNAL_PATH: "xmodule.modulestore.django.COURSE_PUBLISHED",
+                    },
+                    {
+                        PluginSignals.RECEIVER_FUNC_NAME: "remember_previous_username",
+                        PluginSignals.SIGNAL_PATH: "django.db.models.signals.pre_save",
+                        PluginSignals.SENDER_PATH: "django.contrib.auth.models.User",
+                    },
+                    {
+                        PluginSignals.RECEIVER_FUNC_NAME: "invalidate_user_cache",
+                        PluginSignals.SIGNAL_PATH: "django.db.models.signals.post_save",
+                        PluginSignals.SENDER_PATH: "django.contrib.auth.models.User",
+                    },
+                    {
+                        PluginSignals.RECEIVER_FUNC_NAME: "invalidate_deleted_user_cache",
+                        PluginSignals.SIGNAL_PATH: "django.db.models.signals.post_delete",
+                        PluginSignals.SENDER_PATH: "django.contrib.auth.models.User",
+                    },
+                ],
+            },
+            ProjectType.LMS: {
+                PluginSignals.RELATIVE_PATH: "signals",
+                PluginSignals.RECEIVERS: [
+                    {
+                        PluginSignals.RECEIVER_FUNC_NAME: "update_xblock_answer_snapshot",
+                        PluginSignals.SIGNAL_PATH: "django.db.models.signals.post_save",
+                        PluginSignals.SENDER_PATH: "lms.djangoapps.courseware.models.StudentModule",
+                    },
+                    {
+                        PluginSignals.RECEIVER_FUNC_NAME: "delete_xblock_answer_snapshot",
+                        PluginSignals.SIGNAL_PATH: "django.db.models.signals.post_delete",
+                        PluginSignals.SENDER_PATH: "lms.djangoapps.courseware.models.StudentModule",
+                    },
+                    {
+                        PluginSignals.RECEIVER_FUNC_NAME: "update_xblock_answer_snapshot_username",
+                        PluginSignals.SIGNAL_PATH: "django.db.models.signals.post_save",
+                        PluginSignals.SENDER_PATH: "django.contrib.auth.models.User",
+                    },
+                    {
+                        PluginSignals.RECEIVER_FUNC_NAME: "invalidate_course_cache",
+                        PluginSignals.SIGNAL_PATH: "xmodule.modulestore.django.COURSE_PUBLISHED",
+                    },
+                    {
+                        PluginSignals.RECEIVER_FUNC_NAME: "remember_previous_username",
+                        PluginSignals.SIGNAL_PATH: "django.db.models.signals.pre_save",
+                        PluginSignals.SENDER_PATH: "django.contrib.auth.models.User",
+                    },
+                    {
+                        PluginSignals.RECEIVER_FUNC_NAME: "invalidate_user_cache",
+                        PluginSignals.SIGNAL_PATH: "django.db.models.signals.post_save",
+                        PluginSignals.SENDER_PATH: "django.contrib.auth.models.User",
+                    },
+                    {
+                        PluginSignals.RECEIVER_FUNC_NAME: "invalidate_deleted_user_cache",
+                        PluginSignals.SIGNAL_PATH: "django.db.models.signals.post_delete",
+                        PluginSignals.SENDER_PATH: "django.contrib.auth.models.User",
+                    },
+                ] + [
+                    {
+                        PluginSignals.RECEIVER_FUNC_NAME: "invalidate_course_response_cache",
+                        PluginSignals.SIGNAL_PATH: signal_path,
+                        PluginSignals.SENDER_PATH: sender_path,
+                        PluginSignals.DISPATCH_UID: "redfid_edx_api.invalidate_course_response_cache.{}.{}".format(sender_path, signal_path),
+                    }
+                    for sender_path in (
+                        "lms.djangoapps.courseware.models.StudentModule",
+                        "lms.djangoapps.certificates.models.GeneratedCertificate",
+                        "common.djangoapps.student.models.CourseEnrollment",
+                    )
+                    for signal_path in (
+                        "django.db.models.signals.post_save",
+                        "django.db.models.signals.post_delete",
+                    )
+                ],
+            }},
+    }
+
+    def ready(self):
+        from .signals import connect_optional_xblock_signals
+        connect_optional_xblock_signals()
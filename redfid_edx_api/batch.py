@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+import json
+import logging
+import queue
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.http import HttpRequest, QueryDict
+
+from .db_routing import primary_only
+from .instrumentation import get_current_metrics
+from .query_guard import QueryBudgetExceeded
+
+
+logger = logging.getLogger(__name__)
+
+# Endpoints que se pueden usar en batch/: nombre -> (vista, método).
+READ_ONLY_OPERATIONS = {
+    'get_users': ('GetRedfidUsers', 'get'),
+    'get_iaa_user_data': ('GetIAAUserData', 'post'),
+    'get_iaa_course_data': ('GetIAACourseData', 'post'),
+    'get_iterativexblock_user_data': ('GetIterativeXBlockUserData', 'post'),
+    'get_iterativexblock_course_data': ('GetIterativeXBlockCourseData', 'post'),
+    'get_user_certificates': ('GetUserCertificates', 'post'),
+    'get_course_certificates': ('GetCourseCertificates', 'post'),
+    'get_certificate_status': ('GetCertificateStatus', 'post'),
+    'get_certificate_emission_job': ('GetCertificateEmissionJob', 'post'),
+    'get_xblock_user_data': ('GetXBlockUserData', 'post'),
+    'get_xblock_course_data': ('GetXBlockCourseData', 'post'),
+}
+MUTATING_OPERATIONS = {
+    'create_user': ('CreateRedfidUser', 'post'),
+    'edit_user': ('EditRedfidUser', 'post'),
+    'suspend_or_activate_user': ('SuspendOrActivateRedfidUser', 'post'),
+    'change_user_password': ('ChangeRedfidUserPassword', 'post'),
+    'delete_user': ('DeleteRedfidUser', 'post'),
+    'ensure_user_has_redfid_social_auth': ('EnsureUserHasRedfidSocialAuth', 'post'),
+    'emit_user_certificate': ('EmitUserCertificate', 'post'),
+    'emit_course_certificates': ('EmitCourseCertificates', 'post'),
+    'queue_user_certificate': ('QueueUserCertificate', 'post'),
+    'revoke_user_certificate': ('RevokeUserCertificate', 'post'),
+    'revoke_course_certificates': ('RevokeCourseCertificates', 'post'),
+    'enroll_user_into_course': ('EnrollUserIntoCourse', 'post'),
+    'unenroll_user_from_course': ('UnenrollUserFromCourse', 'post'),
+    'enroll_users_into_course': ('EnrollUsersIntoCourse', 'post'),
+    'unenroll_users_from_course': ('UnenrollUsersFromCourse', 'post'),
+    'sync_course_roster': ('SyncCourseRoster', 'post'),
+}
+
+
+class BatchRollback(Exception):
+    """
+    Se lanza para deshacer la transacción de un batch atómico cuando una operación falla.
+    """
+
+
+def get_batch_workers():
+    """
+    Cantidad máxima de hilos usados para ejecutar en paralelo las operaciones de lectura de un batch.
+    """
+    return getattr(settings, 'REDFID_EDX_API_BATCH_WORKERS', 4)
+
+
+def validate_operations(operations):
+    """
+    Valida la lista de operaciones de un batch. Retorna un mensaje de error, o None si la lista es válida.
+    """
+    if not operations:
+        return "Missing operations"
+    if type(operations) != list:
+        return "Invalid operations"
+    if len(operations) > settings.REDFID_EDX_API_BATCH_MAX_OPERATIONS:
+        return "Too many operations"
+    for operation in operations:
+        if type(operation) != dict:
+            return "Invalid operations"
+        endpoint = operation.get('endpoint')
+        if endpoint not in READ_ONLY_OPERATIONS and endpoint not in MUTATING_OPERATIONS:
+            return "Invalid endpoint"
+        if type(operation.get('body', {})) != dict:
+            return "Invalid body"
+    return None
+
+
+def _make_request(request, body):
+    """
+    Construye la solicitud de una operación a partir de la solicitud del batch, ya autenticada.
+    Las operaciones nunca retornan respuestas en streaming.
+    """
+    sub_request = HttpRequest()
+    sub_request.method = 'POST'
+    sub_request.path = request.path
+    sub_request.META = dict(request.META, HTTP_ACCEPT='application/json', QUERY_STRING='')
+    sub_request.META.pop('HTTP_ACCEPT_ENCODING', None)
+    sub_request.GET = QueryDict()
+    sub_request._body = json.dumps(body).encode('utf-8')
+    sub_request.user = request.user
+    sub_request.auth = getattr(request, 'auth', None)
+    return sub_request
+
+
+def _get_content(response):
+    content = response.content
+    if response.get('Content-Type', '').startswith('application/json'):
+        return json.loads(content)
+    return content.decode('utf-8')
+
+
+def run_operation(request, views, operation):
+    """
+    Ejecuta una operación llamando directamente al método de la vista correspondiente, sin volver a pasar por la
+    autenticación ni los middlewares. Retorna el resultado de la operación.
+    """
+    endpoint = operation['endpoint']
+    view_name, method = READ_ONLY_OPERATIONS.get(endpoint) or MUTATING_OPERATIONS[endpoint]
+    result = {"endpoint": endpoint}
+    if 'id' in operation:
+        result["id"] = operation['id']
+    try:
+        view = getattr(views, view_name)()
+        response = getattr(view, method)(_make_request(request, operation.get('body', {})))
+        result["status"] = response.status_code
+        result["body"] = _get_content(response)
+    except QueryBudgetExceeded:
+        raise
+    except Exception:
+        logger.exception("run_operation - error running batch operation {}".format(endpoint))
+        result["status"] = 500
+        result["body"] = "Internal error"
+    return result
+
+
+def _run_read_only_group(request, views, operations, concurrent):
+    """
+    Ejecuta un grupo de operaciones de lectura, en orden o, con concurrent, repartidas entre un pool acotado de
+    hilos. Cada hilo toma operaciones hasta que no quedan, registra sus consultas en las métricas de la solicitud
+    (ver instrumentation.py) y cierra sus conexiones una sola vez, al terminar.
+    """
+    workers = min(get_batch_workers(), len(operations))
+    if not concurrent or workers <= 1:
+        return [run_operation(request, views, operation) for operation in operations]
+    metrics = get_current_metrics()
+    pending = queue.Queue()
+    for item in enumerate(operations):
+        pending.put(item)
+    results = [None] * len(operations)
+
+    def worker():
+        try:
+            with ExitStack() as stack:
+                if metrics is not None:
+                    stack.enter_context(metrics.activate(timed=False))
+                while True:
+                    try:
+                        index, operation = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    results[index] = run_operation(request, views, operation)
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(worker) for _ in range(workers)]
+    for future in futures:
+        future.result()
+    return results
+
+
+def run_batch(request, operations, concurrent=False, atomic=False):
+    """
+    Ejecuta las operaciones de un batch en orden. Con concurrent, cada grupo de operaciones de lectura consecutivas
+    se ejecuta en un pool acotado de hilos. Con atomic, el batch se ejecuta en una sola transacción, sin hilos
+    ni réplica de lectura, y se detiene y deshace en la primera operación que falla.
+    Retorna (results, rolled_back).
+    """
+    from . import views
+    if atomic:
+        results = []
+        try:
+            with transaction.atomic(), primary_only():
+                for operation in operations:
+                    results.append(run_operation(request, views, operation))
+                    if results[-1]["status"] >= 400:
+                        raise BatchRollback()
+        except BatchRollback:
+            return results, True
+        return results, False
+
+    results = []
+    group = []
+    for operation in operations:
+        if operation['endpoint'] in READ_ONLY_OPERATIONS:
+            group.append(operation)
+            continue
+        if group:
+            results += _run_read_only_group(request, views, group, concurrent)
+            group = []
+        results.append(run_operation(request, views, operation))
+    if group:
+        results += _run_read_only_group(request, views, group, concurrent)
+    return results, False
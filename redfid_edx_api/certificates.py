@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+import logging
+
+from django.db import transaction
+from django.http import JsonResponse
+
+from .instrumentation import count_rows
+from .query_guard import QueryBudgetExceeded
+from .streaming import list_response
+from .utils import chunked, get_bulk_chunk_size
+
+
+logger = logging.getLogger(__name__)
+
+
+def emit_certificate(xqueue, user, course_id, course):
+    """
+    Emite el certificado de un usuario con la nota forzada "Aprobado", igual que EmitUserCertificate.
+    """
+    xqueue.add_cert(user, course_id, course=course, generate_pdf=False, forced_grade="Aprobado")
+
+
+def bulk_emit_certificates(xqueue, users, course_id, course):
+    """
+    Emite los certificados de una lista de usuarios en un curso, reutilizando el curso y la XQueueCertInterface.
+    Los certificados se emiten de forma secuencial, ya que ni la XQueueCertInterface ni el curso del modulestore
+    se pueden compartir entre hilos; cada lote se ejecuta en una transacción, y cada usuario en un savepoint para
+    que un error no afecte al resto. Las listas largas se pueden emitir de forma asíncrona con
+    queue_user_certificate. Retorna una lista con el resultado de cada usuario, en el mismo orden.
+    """
+    out = []
+    for chunk in chunked(users):
+        with transaction.atomic():
+            for user in chunk:
+                try:
+                    with transaction.atomic():
+                        emit_certificate(xqueue, user, course_id, course)
+                except QueryBudgetExceeded:
+                    raise
+                except Exception:
+                    logger.exception("bulk_emit_certificates - error emitting certificate for user {} in course {}".format(user.username, course_id))
+                    out.append({"username": user.username, "status": "error", "reason": "Error emitting certificate"})
+                    continue
+                out.append({"username": user.username, "status": "emitted"})
+    return out
+
+
+def bulk_revoke_certificates(course_id, usernames_by_id):
+    """
+    Elimina los GeneratedCertificate de un curso para los usuarios de usernames_by_id (user_id -> username), por
+    lotes. Se usa queryset.delete() y no un DELETE directo porque deben correr el collector (CertificateInvalidation
+    y el historial referencian al certificado) y las señales post_delete, que invalidan las respuestas en cache del
+    curso. Retorna la lista de usernames cuyos certificados fueron eliminados.
+    """
+    from lms.djangoapps.certificates.models import GeneratedCertificate
+    revoked = []
+    for chunk in chunked(list(usernames_by_id)):
+        with transaction.atomic():
+            certificates = GeneratedCertificate.objects.filter(course_id=course_id, user_id__in=chunk)
+            revoked += [usernames_by_id[user_id] for user_id in certificates.values_list('user_id', flat=True)]
+            certificates.delete()
+    return revoked
+
+
+def iter_certificates(certificates, after=None, limit=None):
+    """
+    Itera los certificados de un queryset de GeneratedCertificate como pares (id, dict), ordenados por id.
+    Los campos se obtienen con values_list (con un join a auth_user), en lotes, sin instanciar los modelos.
+    after y limit permiten paginar por keyset.
+    """
+    certificates = certificates.order_by('id')
+    if after is not None:
+        certificates = certificates.filter(id__gt=after)
+    if limit is not None:
+        certificates = certificates[:limit]
+    rows = certificates.values_list('id', 'user__username', 'course_id', 'verify_uuid', 'key').iterator(
+        chunk_size=get_bulk_chunk_size()
+    )
+    for certificate_id, username, course_id, verify_uuid, key in rows:
+        yield certificate_id, {
+            "username": username,
+            "course_id": str(course_id),
+            "verify_uuid": verify_uuid,
+            "key": key
+        }
+
+
+def certificates_response(request, certificates, page_size=None, after=None):
+    """
+    Construye la respuesta de los listados de certificados. Sin page_size se retorna la lista completa
+    (ver streaming.list_response); con page_size se retorna {"results": [...], "next_after": ...}, donde next_after
+    es None en la última página.
+    """
+    if page_size is None:
+        return list_response(request, (certificate for _, certificate in iter_certificates(certificates)))
+    rows = list(iter_certificates(certificates, after=after, limit=page_size))
+    count_rows(len(rows))
+    return JsonResponse({
+        "results": [certificate for _, certificate in rows],
+        "next_after": rows[-1][0] if len(rows) == page_size else None,
+    }, safe=False)
+
+
+def get_certificate_statuses(pairs):
+    """
+    Retorna un diccionario (username, course_id) -> (status, verify_uuid, key) para los pares dados que tienen
+    certificado. Los pares se consultan en lotes, con una consulta por lote (con un join a auth_user) que filtra por
+    los usernames y los cursos del lote, sin importar cuántos cursos distintos haya; los certificados de
+    combinaciones que no se pidieron se descartan en memoria. Los usernames se comparan sin distinguir mayúsculas,
+    como en una collation case-insensitive.
+    """
+    from lms.djangoapps.certificates.models import GeneratedCertificate
+    statuses = {}
+    for chunk in chunked(list(pairs)):
+        requested = {(username.lower(), course_key): username for username, course_key in chunk}
+        rows = GeneratedCertificate.objects.filter(
+            user__username__in={username for username, _ in chunk},
+            course_id__in={course_key for _, course_key in chunk},
+        ).values_list('user__username', 'course_id', 'status', 'verify_uuid', 'key')
+        for username, course_key, status, verify_uuid, key in rows:
+            requested_username = requested.get((username.lower(), course_key))
+            if requested_username is not None:
+                statuses[(requested_username, course_key)] = (status, verify_uuid, key)
+    return statuses
+
+
+def get_courses_certificates(course_keys=None, course_prefix=None):
+    """
+    Retorna los certificados de varios cursos, agrupados por curso, con el nombre y las fechas del curso obtenidos
+    de CourseOverview en una sola consulta. Los cursos se indican con una lista de course_keys o con un prefijo
+    de course_id (por ejemplo "course-v1:mss+", para todos los cursos de una organización).
+    """
+    from lms.djangoapps.certificates.models import GeneratedCertificate
+    from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
+    if course_prefix is not None:
+        overviews = CourseOverview.objects.filter(id__startswith=course_prefix)
+    else:
+        overviews = CourseOverview.objects.filter(id__in=course_keys)
+    metadata = {
+        str(course_key): (display_name, start, end)
+        for course_key, display_name, start, end in overviews.values_list('id', 'display_name', 'start', 'end')
+    }
+    if course_prefix is not None:
+        course_ids = sorted(metadata)
+    else:
+        course_ids = list(dict.fromkeys(str(course_key) for course_key in course_keys))
+    out = {
+        course_id: {
+            "course_id": course_id,
+            "display_name": metadata[course_id][0] if course_id in metadata else None,
+            "start": metadata[course_id][1].isoformat() if course_id in metadata and metadata[course_id][1] else None,
+            "end": metadata[course_id][2].isoformat() if course_id in metadata and metadata[course_id][2] else None,
+            "certificates": [],
+        } for course_id in course_ids
+    }
+    for chunk in chunked(course_ids):
+        certificates = GeneratedCertificate.objects.filter(course_id__in=chunk)
+        for _, certificate in iter_certificates(certificates):
+            out[certificate["course_id"]]["certificates"].append(certificate)
+    return list(out.values())
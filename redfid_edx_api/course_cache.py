@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+from collections import OrderedDict
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = "redfid_edx_api.course_cache.version.{}"
+
+
+class CourseCache(object):
+    """
+    Cache LRU de los cursos obtenidos con modulestore().get_course, indexada por CourseKey.
+    Las entradas expiran después de REDFID_EDX_API_COURSE_CACHE_TTL segundos, y se invalidan cuando se publica el curso
+    (señal course_published). Como la señal puede emitirse en otro proceso (por ejemplo en Studio), además se guarda
+    una versión por curso en el cache compartido de Django, que se compara al leer cada entrada.
+    La cache es por hilo (de hasta REDFID_EDX_API_COURSE_CACHE_SIZE cursos cada una), ya que el curso del modulestore
+    no se puede compartir entre hilos: sus bloques y campos se cargan de forma perezosa y se guardan en el propio
+    descriptor y en su runtime.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        # Se incrementa en clear, para que todos los hilos descarten sus entradas.
+        self._generation = 0
+
+    def _get_entries(self):
+        if getattr(self._local, 'generation', None) != self._generation:
+            self._local.entries = OrderedDict()
+            self._local.generation = self._generation
+        return self._local.entries
+
+    def get_course(self, course_key):
+        from xmodule.modulestore.django import modulestore
+        version = cache.get(VERSION_CACHE_KEY.format(course_key), 0)
+        now = time.time()
+        entries = self._get_entries()
+        entry = entries.get(course_key)
+        if entry is not None:
+            course, entry_version, expires_at = entry
+            if entry_version == version and expires_at > now:
+                entries.move_to_end(course_key)
+                return course
+            del entries[course_key]
+        course = modulestore().get_course(course_key)
+        if course is None:
+            return None
+        entries[course_key] = (course, version, now + settings.REDFID_EDX_API_COURSE_CACHE_TTL)
+        while len(entries) > settings.REDFID_EDX_API_COURSE_CACHE_SIZE:
+            entries.popitem(last=False)
+        return course
+
+    def invalidate(self, course_key):
+        """
+        Invalida un curso en todos los hilos y procesos, incrementando su versión compartida.
+        """
+        self._get_entries().pop(course_key, None)
+        version_key = VERSION_CACHE_KEY.format(course_key)
+        try:
+            cache.incr(version_key)
+        except ValueError:
+            cache.set(version_key, 1, None)
+
+    def clear(self):
+        self._generation += 1
+
+
+course_cache = CourseCache()
+
+
+def get_course(course_key):
+    """
+    Retorna el curso desde la cache del hilo, o desde el modulestore si no está en la cache.
+    """
+    return course_cache.get_course(course_key)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+from contextlib import contextmanager
+from functools import wraps
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+STICKY_CACHE_KEY = "redfid_edx_api.db_routing.sticky.{}"
+
+_state = threading.local()
+
+
+class ReadReplicaRouter(object):
+    """
+    Router de base de datos (agregado a DATABASE_ROUTERS en settings/common.py). Solo actúa dentro de use_alias,
+    es decir, en los endpoints de lectura decorados con read_replica; en el resto de la plataforma retorna None
+    y deja decidir a los demás routers.
+    """
+
+    def db_for_read(self, model, **hints):
+        return getattr(_state, 'alias', None)
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+def get_read_alias():
+    """
+    Alias de la réplica de lectura (REDFID_EDX_API_READ_REPLICA_ALIAS), o None si no está configurada en DATABASES.
+    """
+    alias = getattr(settings, 'REDFID_EDX_API_READ_REPLICA_ALIAS', None)
+    if alias and alias in settings.DATABASES:
+        return alias
+    return None
+
+
+@contextmanager
+def use_alias(alias):
+    """
+    Dirige las lecturas de este hilo a alias mientras dure el bloque.
+    """
+    previous = getattr(_state, 'alias', None)
+    _state.alias = alias
+    try:
+        yield
+    finally:
+        _state.alias = previous
+
+
+@contextmanager
+def primary_only():
+    """
+    Desactiva la réplica en este hilo mientras dure el bloque, por ejemplo en un batch atómico, donde las lecturas
+    deben ver las escrituras aún no confirmadas de la misma transacción.
+    """
+    previous = getattr(_state, 'primary_only', False)
+    _state.primary_only = True
+    try:
+        with use_alias(None):
+            yield
+    finally:
+        _state.primary_only = previous
+
+
+def is_sticky(user_id):
+    """
+    Indica si el cliente hizo una escritura hace menos de REDFID_EDX_API_READ_REPLICA_STICKY_SECONDS segundos,
+    en cuyo caso sus lecturas van a la base de datos principal (read-your-writes).
+    """
+    return bool(settings.REDFID_EDX_API_READ_REPLICA_STICKY_SECONDS) and bool(cache.get(STICKY_CACHE_KEY.format(user_id)))
+
+
+def _iter_with_alias(alias, content):
+    iterator = iter(content)
+    while True:
+        with use_alias(alias):
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+        yield chunk
+
+
+def read_replica(view_func):
+    """
+    Decorador para el método get/post de los endpoints de solo lectura. Si hay una réplica configurada, las
+    consultas de la vista (incluyendo las de las respuestas en streaming) se hacen en la réplica, salvo que el
+    cliente haya escrito recientemente (ver is_sticky) o que se esté dentro de primary_only.
+    """
+    @wraps(view_func)
+    def wrapper(self, request, *args, **kwargs):
+        alias = get_read_alias()
+        if alias is None or getattr(_state, 'primary_only', False) or is_sticky(request.user.id):
+            return view_func(self, request, *args, **kwargs)
+        with use_alias(alias):
+            response = view_func(self, request, *args, **kwargs)
+        if response.streaming:
+            response.streaming_content = _iter_with_alias(alias, response.streaming_content)
+        return response
+    return wrapper
+
+
+def sticky_write(view_func):
+    """
+    Decorador para el método post de los endpoints que modifican datos. Si la solicitud fue exitosa, las lecturas
+    del mismo cliente van a la base de datos principal durante REDFID_EDX_API_READ_REPLICA_STICKY_SECONDS segundos.
+    """
+    @wraps(view_func)
+    def wrapper(self, request, *args, **kwargs):
+        response = view_func(self, request, *args, **kwargs)
+        seconds = settings.REDFID_EDX_API_READ_REPLICA_STICKY_SECONDS
+        if seconds and get_read_alias() is not None and response.status_code < 400:
+            cache.set(STICKY_CACHE_KEY.format(request.user.id), True, seconds)
+        return response
+    return wrapper
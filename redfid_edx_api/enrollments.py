@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+import logging
+
+from django.db import transaction
+
+from .query_guard import QueryBudgetExceeded
+from .utils import chunked, get_email_languages, get_users_by_username
+
+
+logger = logging.getLogger(__name__)
+
+
+def bulk_enroll_users(course_id, usernames):
+    """
+    Inscribe una lista de usuarios en un curso, por lotes.
+    Retorna una lista con el resultado de cada usuario.
+    """
+    from lms.djangoapps.instructor.enrollment import enroll_email
+
+    def enroll(user, language):
+        enroll_email(course_id, user.email, False, False, {}, language=language)
+
+    return _apply_to_users(usernames, enroll, "enrolled", "Error enrolling user in course")
+
+
+def bulk_unenroll_users(course_id, usernames):
+    """
+    Desinscribe una lista de usuarios de un curso, por lotes.
+    Retorna una lista con el resultado de cada usuario.
+    """
+    from lms.djangoapps.instructor.enrollment import unenroll_email
+
+    def unenroll(user, language):
+        unenroll_email(course_id, user.email, False, {}, language=language)
+
+    return _apply_to_users(usernames, unenroll, "unenrolled", "Error unenrolling user from course")
+
+
+def _apply_to_users(usernames, action, success_status, error_reason):
+    """
+    Obtiene los usuarios y sus preferencias de idioma con consultas en lote, y aplica action a cada usuario.
+    Cada lote se ejecuta en una transacción, y cada usuario en un savepoint para que un error no afecte al resto.
+    """
+    users = get_users_by_username(usernames)
+    languages = get_email_languages(users.values())
+    out = []
+    for chunk in chunked(usernames):
+        with transaction.atomic():
+            for username in chunk:
+                user = users.get(username)
+                if user is None:
+                    out.append({"username": username, "status": "error", "reason": "User not found"})
+                    continue
+                try:
+                    with transaction.atomic():
+                        action(user, languages.get(user.id))
+                except QueryBudgetExceeded:
+                    raise
+                except Exception:
+                    logger.exception("{} - error for user {}".format(error_reason, username))
+                    out.append({"username": username, "status": "error", "reason": error_reason})
+                    continue
+                out.append({"username": username, "status": success_status})
+    return out
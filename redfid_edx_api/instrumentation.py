@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+from contextlib import contextmanager, ExitStack
+from functools import wraps
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import registry
+from .profiling import profile_view
+from .query_guard import (
+    QueryBudgetExceeded,
+    check_slow_query,
+    fingerprint_sql,
+    get_call_site,
+    get_query_budget,
+    is_strict,
+    is_transaction_statement,
+    report_query_budget,
+    sample_query_details,
+)
+
+
+logger = logging.getLogger(__name__)
+
+SERVER_TIMING_HEADER = 'HTTP_X_REDFID_SERVER_TIMING'
+TIMINGS = ('parse', 'decode', 'serialize')
+
+_state = threading.local()
+
+
+def instrumentation_enabled():
+    return getattr(settings, 'REDFID_EDX_API_INSTRUMENTATION_ENABLED', True)
+
+
+def get_current_metrics():
+    """
+    Retorna las métricas de la solicitud en curso en este hilo, o None si no se está instrumentando.
+    """
+    return getattr(_state, 'metrics', None)
+
+
+@contextmanager
+def timer(name):
+    """
+    Suma el tiempo del bloque a la métrica name (parse, decode o serialize) de la solicitud en curso.
+    """
+    metrics = get_current_metrics()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.timings[name] += time.perf_counter() - start
+
+
+class RequestMetrics(object):
+    """
+    Métricas de una solicitud: cantidad y tiempo de las consultas a la base de datos, tiempos de parseo del cuerpo,
+    de decodificación de los states y de serialización de la respuesta, y bytes de la respuesta.
+    """
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.total = 0.0
+        self.queries = 0
+        self.query_time = 0.0
+        self.timings = {name: 0.0 for name in TIMINGS}
+        self.bytes = 0
+        self.rows = None
+        self.query_budget = get_query_budget(endpoint)
+        self.strict = is_strict()
+        # Huella -> [cantidad, puntos de llamada], de todas las consultas en las solicitudes muestreadas, y en las
+        # demás solo de las que exceden el presupuesto (ver query_guard.py).
+        self.query_details = {}
+        self.sample_query_details = sample_query_details()
+        # Las operaciones de lectura de un batch concurrente registran sus consultas desde varios hilos.
+        self._lock = threading.Lock()
+
+    def _add_query_detail(self, sql, exceeded):
+        if not self.sample_query_details and not exceeded:
+            return
+        detail = self.query_details.setdefault(fingerprint_sql(sql), [0, set()])
+        detail[0] += 1
+        detail[1].add(get_call_site())
+
+    def _record_query(self, execute, sql, params, many, context):
+        exceeded = self.queries >= self.query_budget
+        if exceeded and self.strict and not is_transaction_statement(sql):
+            # La consulta no se ejecuta: la excepción se lanza dentro de la vista y de su transacción.
+            self._add_query_detail(sql, exceeded)
+            raise QueryBudgetExceeded(
+                report_query_budget(self.endpoint, self.queries + 1, self.query_budget, self.query_details)
+            )
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            with self._lock:
+                self.queries += 1
+                self.query_time += duration
+                self._add_query_detail(sql, exceeded)
+            check_slow_query(self.endpoint, sql, duration)
+
+    @contextmanager
+    def activate(self, timed=True):
+        """
+        Registra las métricas como las de la solicitud en curso en este hilo, y cuenta las consultas de todas sus
+        conexiones. Sin timed, el tiempo del bloque no se suma al total (por ejemplo, en los hilos de un batch
+        concurrente, cuyo tiempo ya está incluido en el de la solicitud).
+        """
+        previous = get_current_metrics()
+        _state.metrics = self
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(self._record_query))
+                yield
+        finally:
+            if timed:
+                self.total += time.perf_counter() - start
+            _state.metrics = previous
+
+    def server_timing(self):
+        parts = ['db;dur={:.1f};desc="{} queries"'.format(self.query_time * 1000, self.queries)]
+        parts += ['{};dur={:.1f}'.format(name, self.timings[name] * 1000) for name in TIMINGS]
+        parts.append('total;dur={:.1f}'.format(self.total * 1000))
+        if self.bytes:
+            parts.append('bytes;desc="{}"'.format(self.bytes))
+        return ', '.join(parts)
+
+    def finish(self, status_code, streaming, reason=None):
+        """
+        Registra las métricas de la solicitud en el log y en los agregados de metrics.py, y si excedió su
+        presupuesto de consultas lo registra con las huellas de las consultas (ver query_guard.py).
+        """
+        registry.record(self.endpoint, status_code, self.total, self.queries, rows=self.rows, reason=reason)
+        logger.info("redfid_edx_api request metrics %s", json.dumps({
+            "endpoint": self.endpoint,
+            "status": status_code,
+            "streaming": streaming,
+            "total_ms": round(self.total * 1000, 1),
+            "db_queries": self.queries,
+            "db_ms": round(self.query_time * 1000, 1),
+            "parse_ms": round(self.timings['parse'] * 1000, 1),
+            "decode_ms": round(self.timings['decode'] * 1000, 1),
+            "serialize_ms": round(self.timings['serialize'] * 1000, 1),
+            "bytes": self.bytes,
+            "rows": self.rows,
+        }))
+        if self.queries > self.query_budget:
+            report_query_budget(self.endpoint, self.queries, self.query_budget, self.query_details)
+
+
+def count_rows(rows):
+    """
+    Suma rows a las filas retornadas por la solicitud en curso.
+    """
+    metrics = get_current_metrics()
+    if metrics is not None:
+        metrics.rows = (metrics.rows or 0) + rows
+
+
+def get_error_reason(response):
+    """
+    Motivo de una respuesta de error: el mensaje de los HttpResponseBadRequest de las vistas ("User not found",
+    "Invalid JSON data", etc.) o, si la respuesta no es texto, la descripción del código de respuesta.
+    """
+    if response.status_code < 400:
+        return None
+    if response.get('Content-Type', '').startswith('text/html'):
+        return response.content.decode('utf-8', 'replace')
+    return response.reason_phrase
+
+
+def server_timing_requested(request):
+    """
+    El header Server-Timing solo se agrega si la solicitud lo pide (header X-Redfid-Server-Timing: 1)
+    y el usuario autenticado es staff o superusuario.
+    """
+    if request.META.get(SERVER_TIMING_HEADER) != '1':
+        return False
+    user = getattr(request, 'user', None)
+    return user is not None and (user.is_staff or user.is_superuser)
+
+
+def _iter_streaming_content(metrics, content, status_code):
+    """
+    Itera el contenido de una respuesta en streaming con las métricas activas, ya que las consultas y la
+    serialización ocurren mientras se genera. Las métricas se registran en el log al terminar; si la generación
+    falla, se registran con código 500 y motivo "exception".
+    """
+    iterator = iter(content)
+    reason = None
+    try:
+        while True:
+            with metrics.activate():
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    break
+            metrics.bytes += len(chunk)
+            yield chunk
+    except Exception:
+        status_code, reason = 500, "exception"
+        raise
+    finally:
+        metrics.finish(status_code, True, reason)
+
+
+def instrument(view_func):
+    """
+    Decorador de las vistas registradas en urls.py. Mide cada solicitud y la registra en el log como una línea JSON;
+    si se pide, agrega además el header Server-Timing a la respuesta (ver server_timing_requested).
+    En las respuestas en streaming el header solo incluye lo medido antes de empezar a enviar el contenido.
+    Si la vista lanza una excepción, la solicitud se registra con código 500 y motivo "exception" antes de
+    relanzarla. La vista además se envuelve con profiling.profile_view.
+    """
+    view_func = profile_view(view_func)
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not instrumentation_enabled():
+            return view_func(request, *args, **kwargs)
+        endpoint = request.resolver_match.url_name if request.resolver_match else view_func.__name__
+        metrics = RequestMetrics(endpoint)
+        try:
+            with metrics.activate():
+                response = view_func(request, *args, **kwargs)
+        except Exception:
+            metrics.finish(500, False, "exception")
+            raise
+        if response.streaming:
+            response.streaming_content = _iter_streaming_content(
+                metrics, response.streaming_content, response.status_code
+            )
+        else:
+            if not getattr(response, 'is_rendered', True):
+                response.render()
+            metrics.bytes = len(response.content)
+            metrics.finish(response.status_code, False, get_error_reason(response))
+        if server_timing_requested(request):
+            response['Server-Timing'] = metrics.server_timing()
+        return response
+    return wrapper
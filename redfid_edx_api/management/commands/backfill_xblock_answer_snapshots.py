@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+from lms.djangoapps.courseware.models import StudentModule
+from opaque_keys import InvalidKeyError
+from opaque_keys.edx.keys import CourseKey
+
+from redfid_edx_api.models import XBlockAnswerSnapshot
+from redfid_edx_api.snapshots import SNAPSHOT_XBLOCK_TYPES, get_snapshot_fields
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Puebla XBlockAnswerSnapshot a partir de los StudentModule existentes de los tipos de XBlock soportados."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course-id', dest='course_id', default=None, help="Limitar el backfill a un curso.")
+        parser.add_argument('--batch-size', dest='batch_size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        modules = StudentModule.objects.filter(module_type__in=SNAPSHOT_XBLOCK_TYPES)
+        if options['course_id']:
+            try:
+                course_key = CourseKey.from_string(options['course_id'])
+            except InvalidKeyError:
+                raise CommandError("Invalid course_id")
+            modules = modules.filter(course_id=course_key)
+        modules = modules.select_related('student').order_by('id')
+
+        total = 0
+        last_id = 0
+        while True:
+            batch = list(modules.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            self._save_batch(batch)
+            last_id = batch[-1].id
+            total += len(batch)
+            logger.info("backfill_xblock_answer_snapshots - {} StudentModules processed".format(total))
+        self.stdout.write("{} snapshots backfilled".format(total))
+
+    def _save_batch(self, batch):
+        existing = {
+            (user_id, str(block_key)): snapshot_id
+            for snapshot_id, user_id, block_key in XBlockAnswerSnapshot.objects.filter(
+                user_id__in={module.student_id for module in batch},
+                block_key__in=[module.module_state_key for module in batch],
+            ).values_list('id', 'user_id', 'block_key')
+        }
+        to_create = []
+        to_update = []
+        for module in batch:
+            snapshot = XBlockAnswerSnapshot(
+                user_id=module.student_id,
+                block_key=module.module_state_key,
+                **get_snapshot_fields(module)
+            )
+            snapshot.id = existing.get((module.student_id, str(module.module_state_key)))
+            if snapshot.id:
+                to_update.append(snapshot)
+            else:
+                to_create.append(snapshot)
+        XBlockAnswerSnapshot.objects.bulk_create(to_create)
+        XBlockAnswerSnapshot.objects.bulk_update(
+            to_update, ['course_id', 'xblock_type', 'username', 'answer', 'modified']
+        )
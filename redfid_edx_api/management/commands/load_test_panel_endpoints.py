@@ -0,0 +1,405 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import math
+import random
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+from opaque_keys import InvalidKeyError
+from opaque_keys.edx.keys import CourseKey
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIX = (
+    "get_xblock_course_data=20,get_xblock_user_data=20,get_user_certificates=15,get_course_certificates=5,"
+    "get_certificate_status=5,get_iaa_user_data=5,get_iaa_course_data=3,get_iterativexblock_user_data=5,"
+    "get_iterativexblock_course_data=3,batch=3,get_users=1"
+)
+# Endpoints que modifican datos: solo se pueden incluir en la mezcla con --allow-destructive.
+DESTRUCTIVE_ENDPOINTS = (
+    'enroll_user_into_course', 'suspend_or_activate_user', 'edit_user', 'ensure_user_has_redfid_social_auth',
+    'sync_course_roster',
+)
+
+LOREM = (
+    "La evaluación formativa permite ajustar la enseñanza a partir de la evidencia del aprendizaje de los estudiantes. "
+    "En mi práctica docente uso preguntas abiertas al inicio de la clase para identificar ideas previas, "
+    "y luego organizo el trabajo en grupos según las respuestas. "
+)
+
+
+def percentile(values, fraction):
+    """
+    Percentil (por el método del rango más cercano) de una lista ordenada de valores.
+    """
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, math.ceil(fraction * len(values)) - 1))
+    return values[index]
+
+
+def problem_state(rng, block_id):
+    """
+    State de un StudentModule de un problem de opción múltiple con varias respuestas, como lo guarda capa.
+    """
+    inputs = ["{}_{}_1".format(block_id, i) for i in range(2, 2 + rng.randint(1, 4))]
+    answers = {input_id: "choice_{}".format(rng.randint(0, 3)) for input_id in inputs}
+    correct = {input_id: rng.random() < 0.6 for input_id in inputs}
+    return json.dumps({
+        "attempts": rng.randint(1, 3),
+        "done": True,
+        "seed": rng.randint(1, 1000),
+        "correct_map": {
+            input_id: {
+                "correctness": "correct" if correct[input_id] else "incorrect",
+                "npoints": None, "msg": "", "hint": "", "hintmode": None, "queuestate": None, "answervariable": None,
+            } for input_id in inputs
+        },
+        "input_state": {input_id: {} for input_id in inputs},
+        "student_answers": answers,
+        "has_saved_answers": False,
+        "last_submission_time": "2021-05-10T15:{:02d}:00Z".format(rng.randint(0, 59)),
+        "score": {"raw_earned": sum(correct.values()), "raw_possible": len(inputs)},
+    })
+
+
+def freetextresponse_state(rng):
+    """
+    State de un StudentModule de un freetextresponse, con una respuesta de largo variable.
+    """
+    return json.dumps({
+        "count_attempts": rng.randint(1, 3),
+        "score": 1.0,
+        "student_answer": LOREM * rng.randint(1, 8),
+    })
+
+
+class Command(BaseCommand):
+    help = (
+        "Puebla la base de datos con usuarios, inscripciones y respuestas de prueba en un curso, y luego reproduce una "
+        "mezcla de solicitudes del panel de RedFID contra los endpoints, con distintos niveles de concurrencia, "
+        "reportando el throughput y la latencia p50/p95/p99 de cada endpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course-id', dest='course_id', required=True, help="Curso existente usado en la prueba.")
+        parser.add_argument('--users', dest='users', type=int, default=1000)
+        parser.add_argument('--blocks', dest='blocks', type=int, default=20)
+        parser.add_argument('--answer-rate', dest='answer_rate', type=float, default=0.7,
+                            help="Fracción de pares (usuario, bloque) con respuesta.")
+        parser.add_argument('--prefix', dest='prefix', default='loadtest', help="Prefijo de los usernames creados.")
+        parser.add_argument('--random-seed', dest='random_seed', type=int, default=0)
+        parser.add_argument('--requests', dest='requests', type=int, default=1000,
+                            help="Solicitudes por nivel de concurrencia.")
+        parser.add_argument('--concurrency', dest='concurrency', default='1,4,8',
+                            help="Niveles de concurrencia, separados por comas.")
+        parser.add_argument('--mix', dest='mix', default=DEFAULT_MIX,
+                            help="Endpoints y pesos, como endpoint=peso separados por comas.")
+        parser.add_argument('--allow-destructive', dest='allow_destructive', action='store_true',
+                            help="Permite endpoints que modifican datos en la mezcla. sync_course_roster desinscribe "
+                                 "del curso a todos los usuarios que no fueron creados por la prueba.")
+        parser.add_argument('--host', dest='host', default='localhost', help="Host usado en las solicitudes.")
+        parser.add_argument('--skip-seed', dest='skip_seed', action='store_true')
+        parser.add_argument('--seed-only', dest='seed_only', action='store_true')
+        parser.add_argument('--output', dest='output', default=None, help="Archivo JSON donde guardar el reporte.")
+
+    def handle(self, *args, **options):
+        try:
+            course_key = CourseKey.from_string(options['course_id'])
+        except InvalidKeyError:
+            raise CommandError("Invalid course_id")
+        mix = self._parse_mix(options['mix'])
+        destructive = [endpoint for endpoint in mix if endpoint in DESTRUCTIVE_ENDPOINTS]
+        if destructive and not options['allow_destructive']:
+            raise CommandError("Endpoints that modify data require --allow-destructive: {}".format(", ".join(destructive)))
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError("Invalid concurrency")
+        rng = random.Random(options['random_seed'])
+        block_ids = ['{}_{}'.format(options['prefix'], i) for i in range(options['blocks'])]
+        if not options['skip_seed']:
+            self._seed(course_key, options['prefix'], options['users'], block_ids, options['answer_rate'], rng)
+        if options['seed_only']:
+            return
+        usernames = list(User.objects.filter(
+            username__in=['{}_{}'.format(options['prefix'], i) for i in range(options['users'])]
+        ).order_by('id').values_list('username', 'id'))
+        if not usernames:
+            raise CommandError("No seeded users found")
+        context = {
+            'course_id': str(course_key),
+            'block_ids': block_ids,
+            'users': usernames,
+            'prefix': options['prefix'],
+        }
+        report = {"mix": mix, "levels": []}
+        # Usuario sin privilegios con el que se autentican las solicitudes; se elimina al terminar.
+        client_user = User(username='{}_client_{}'.format(options['prefix'], rng.getrandbits(32)))
+        client_user.set_unusable_password()
+        client_user.save()
+        try:
+            for level in levels:
+                result = self._replay(client_user, options['host'], context, mix, options['requests'], level, rng)
+                report["levels"].append(result)
+                self._print_level(result)
+        finally:
+            client_user.delete()
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+
+    def _parse_mix(self, value):
+        mix = {}
+        for item in value.split(','):
+            endpoint, _, weight = item.partition('=')
+            if endpoint not in PAYLOADS:
+                raise CommandError("Invalid endpoint in mix: {}".format(endpoint))
+            try:
+                mix[endpoint] = float(weight or 1)
+            except ValueError:
+                raise CommandError("Invalid weight in mix: {}".format(item))
+        return mix
+
+    def _seed(self, course_key, prefix, count, block_ids, answer_rate, rng):
+        """
+        Crea los usuarios (con UserProfile y UserSocialAuth de RedFID), sus inscripciones al curso, los StudentModule
+        de problem y freetextresponse, y las respuestas de IAAXBlock e IterativeXBlock si están instalados.
+        Los usuarios que ya existen se reutilizan.
+        """
+        from common.djangoapps.student.models import CourseEnrollment, UserProfile
+        from lms.djangoapps.courseware.models import StudentModule
+        from social_django.models import UserSocialAuth
+
+        usernames = ['{}_{}'.format(prefix, i) for i in range(count)]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        new_users = [
+            User(username=username, email='{}@example.com'.format(username), first_name='Nombre', last_name=username)
+            for username in usernames if username not in existing
+        ]
+        for user in new_users:
+            user.set_unusable_password()
+        User.objects.bulk_create(new_users, batch_size=500)
+        users = list(User.objects.filter(username__in=usernames).order_by('id'))
+        user_ids = [user.id for user in users]
+
+        with_profile = set(UserProfile.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+        UserProfile.objects.bulk_create([
+            UserProfile(user=user, name="Nombre {}".format(user.username)) for user in users if user.id not in with_profile
+        ], batch_size=500)
+        with_social_auth = set(UserSocialAuth.objects.filter(
+            user_id__in=user_ids, provider='redfid'
+        ).values_list('user_id', flat=True))
+        UserSocialAuth.objects.bulk_create([
+            UserSocialAuth(user=user, provider='redfid', uid=user.username, extra_data={})
+            for user in users if user.id not in with_social_auth
+        ], batch_size=500)
+        enrolled = set(CourseEnrollment.objects.filter(
+            user_id__in=user_ids, course_id=course_key
+        ).values_list('user_id', flat=True))
+        CourseEnrollment.objects.bulk_create([
+            CourseEnrollment(user=user, course_id=course_key, mode='audit', is_active=True)
+            for user in users if user.id not in enrolled
+        ], batch_size=500)
+        self.stdout.write("{} users and enrollments seeded".format(len(users)))
+
+        course_suffix = str(course_key).split("course-v1:")[1] if "course-v1:" in str(course_key) else str(course_key)
+        module_types = {block_id: 'problem' if i % 2 == 0 else 'freetextresponse' for i, block_id in enumerate(block_ids)}
+        keys = {
+            block_id: "block-v1:{}+type@{}+block@{}".format(course_suffix, module_types[block_id], block_id)
+            for block_id in block_ids
+        }
+        answered = set(StudentModule.objects.filter(
+            course_id=course_key, student_id__in=user_ids, module_state_key__in=list(keys.values())
+        ).values_list('student_id', 'module_state_key'))
+        answered = {(student_id, str(module_state_key)) for student_id, module_state_key in answered}
+        modules = []
+        for user in users:
+            for block_id in block_ids:
+                if rng.random() >= answer_rate or (user.id, keys[block_id]) in answered:
+                    continue
+                module_type = module_types[block_id]
+                modules.append(StudentModule(
+                    student=user,
+                    course_id=course_key,
+                    module_state_key=keys[block_id],
+                    module_type=module_type,
+                    state=problem_state(rng, block_id) if module_type == 'problem' else freetextresponse_state(rng),
+                ))
+        StudentModule.objects.bulk_create(modules, batch_size=500)
+        self.stdout.write("{} StudentModules seeded".format(len(modules)))
+
+        self._seed_iaa(course_key, users, rng)
+        self._seed_iterative(course_key, users, block_ids, rng)
+
+    def _seed_iaa(self, course_key, users, rng):
+        try:
+            from iaaxblock.models import IAAActivity, IAAStage, IAASubmission
+        except ImportError:
+            self.stdout.write("IAAXBlock not installed, skipping IAA submissions")
+            return
+        activity, _ = IAAActivity.objects.get_or_create(id_course=str(course_key), activity_name="Actividad de carga")
+        stages = [
+            IAAStage.objects.get_or_create(activity=activity, stage_number=number, defaults={'stage_label': "Etapa {}".format(number)})[0]
+            for number in range(1, 4)
+        ]
+        IAASubmission.objects.filter(stage__in=stages, id_student__in=[user.id for user in users]).delete()
+        IAASubmission.objects.bulk_create([
+            IAASubmission(id_student=user.id, stage=stage, submission=LOREM * rng.randint(1, 4))
+            for stage in stages for user in users if rng.random() < 0.7
+        ], batch_size=500)
+        self.stdout.write("IAA submissions seeded")
+
+    def _seed_iterative(self, course_key, users, block_ids, rng):
+        try:
+            from iterativexblock.models import IterativeXBlockQuestion, IterativeXBlockAnswer
+        except ImportError:
+            self.stdout.write("IterativeXBlock not installed, skipping Iterative answers")
+            return
+        questions = [
+            IterativeXBlockQuestion.objects.get_or_create(
+                id_course=str(course_key), id_xblock=block_id, id_question="q1"
+            )[0] for block_id in block_ids[:5]
+        ]
+        IterativeXBlockAnswer.objects.filter(question__in=questions, id_student__in=[user.id for user in users]).delete()
+        IterativeXBlockAnswer.objects.bulk_create([
+            IterativeXBlockAnswer(
+                id_course=str(course_key), question=question, id_student=user.id, answer=LOREM * rng.randint(1, 3)
+            ) for question in questions for user in users if rng.random() < 0.7
+        ], batch_size=500)
+        self.stdout.write("Iterative answers seeded")
+
+    def _replay(self, client_user, host, context, mix, count, level, rng):
+        """
+        Reproduce count solicitudes de la mezcla con level hilos, cada uno con su propio Client de Django.
+        Las solicitudes pasan por todos los middlewares y la autenticación por sesión, como en producción.
+        """
+        endpoints = list(mix)
+        plan = rng.choices(endpoints, weights=[mix[endpoint] for endpoint in endpoints], k=count)
+        plan = [(endpoint,) + PAYLOADS[endpoint](context, random.Random(rng.random())) for endpoint in plan]
+        local = threading.local()
+
+        def run(item):
+            endpoint, method, payload = item
+            client = getattr(local, 'client', None)
+            if client is None:
+                client = local.client = Client(HTTP_HOST=host)
+                client.force_login(client_user)
+            url = reverse('redfid_edx_api:{}'.format(endpoint))
+            start = time.perf_counter()
+            try:
+                if method == 'get':
+                    response = client.get(url)
+                else:
+                    response = client.post(url, content_type='application/json', data=json.dumps(payload))
+                status = response.status_code
+            except Exception:
+                logger.exception("load_test_panel_endpoints - error in request to {}".format(endpoint))
+                status = 500
+            return endpoint, status, time.perf_counter() - start
+
+        def run_in_thread(item):
+            try:
+                return run(item)
+            finally:
+                if level > 1:
+                    connections.close_all()
+
+        start = time.perf_counter()
+        if level <= 1:
+            results = [run(item) for item in plan]
+        else:
+            with ThreadPoolExecutor(max_workers=level) as pool:
+                results = list(pool.map(run_in_thread, plan))
+        elapsed = time.perf_counter() - start
+
+        by_endpoint = {}
+        for endpoint, status, latency in results:
+            by_endpoint.setdefault(endpoint, []).append((status, latency))
+        by_endpoint["*"] = [(status, latency) for _, status, latency in results]
+        summary = {}
+        for endpoint, values in sorted(by_endpoint.items()):
+            latencies = sorted(latency for _, latency in values)
+            summary[endpoint] = {
+                "requests": len(values),
+                "errors": sum(1 for status, _ in values if status >= 400),
+                "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+                "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+                "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+            }
+        return {
+            "concurrency": level,
+            "requests": len(results),
+            "seconds": round(elapsed, 2),
+            "throughput": round(len(results) / elapsed, 1) if elapsed else None,
+            "endpoints": summary,
+        }
+
+    def _print_level(self, result):
+        self.stdout.write("concurrency={concurrency} requests={requests} seconds={seconds} throughput={throughput}/s".format(**result))
+        self.stdout.write("  {:<36} {:>8} {:>7} {:>9} {:>9} {:>9}".format("endpoint", "requests", "errors", "p50_ms", "p95_ms", "p99_ms"))
+        for endpoint, row in result["endpoints"].items():
+            self.stdout.write("  {:<36} {requests:>8} {errors:>7} {p50_ms:>9} {p95_ms:>9} {p99_ms:>9}".format(endpoint, **row))
+
+
+def _username(context, rng):
+    return rng.choice(context['users'])[0]
+
+
+def _edit_user_payload(context, rng):
+    username = _username(context, rng)
+    return ('post', {
+        'username': username, 'email': '{}@example.com'.format(username), 'first_name': 'Nombre', 'last_name': username,
+        'is_staff': False, 'is_superuser': False,
+    })
+
+
+def _ensure_social_auth_payload(context, rng):
+    username = _username(context, rng)
+    return ('post', {'username': username, 'user_id': username})
+
+
+# Payload de cada endpoint: función (contexto, random) -> (método, payload).
+# No se incluyen los endpoints que crean, eliminan o emiten datos en otros sistemas (create_user, delete_user,
+# change_user_password, certificados, desinscripciones), para que la prueba se pueda repetir sobre los mismos datos.
+PAYLOADS = {
+    'get_users': lambda context, rng: ('get', None),
+    'get_iaa_user_data': lambda context, rng: ('post', {'username': _username(context, rng), 'course_id': context['course_id']}),
+    'get_iaa_course_data': lambda context, rng: ('post', {'course_id': context['course_id']}),
+    'get_iterativexblock_user_data': lambda context, rng: ('post', {'username': _username(context, rng), 'course_id': context['course_id']}),
+    'get_iterativexblock_course_data': lambda context, rng: ('post', {'course_id': context['course_id']}),
+    'get_user_certificates': lambda context, rng: ('post', {'username': _username(context, rng)}),
+    'get_course_certificates': lambda context, rng: ('post', {'course_id': context['course_id']}),
+    'get_certificate_status': lambda context, rng: ('post', {'pairs': [
+        {'username': username, 'course_id': context['course_id']} for username, _ in rng.sample(context['users'], min(50, len(context['users'])))
+    ]}),
+    'get_xblock_user_data': lambda context, rng: ('post', {
+        'username': _username(context, rng), 'course_id': context['course_id'], 'xblock_type': 'problem',
+        'id_xblock': context['block_ids'][::2],
+    }),
+    'get_xblock_course_data': lambda context, rng: ('post', {
+        'course_id': context['course_id'], 'xblock_type': rng.choice(['problem', 'freetextresponse']), 'id_xblock': '*',
+    }),
+    'enroll_user_into_course': lambda context, rng: ('post', {'username': _username(context, rng), 'course_id': context['course_id']}),
+    'suspend_or_activate_user': lambda context, rng: ('post', {'username': _username(context, rng), 'is_active': True}),
+    'edit_user': _edit_user_payload,
+    'ensure_user_has_redfid_social_auth': _ensure_social_auth_payload,
+    'sync_course_roster': lambda context, rng: ('post', {
+        'course_id': context['course_id'], 'usernames': [username for username, _ in context['users']],
+    }),
+    'batch': lambda context, rng: ('post', {'concurrent': True, 'operations': [
+        {'endpoint': 'get_user_certificates', 'body': {'username': _username(context, rng)}},
+        {'endpoint': 'get_xblock_user_data', 'body': PAYLOADS['get_xblock_user_data'](context, rng)[1]},
+        {'endpoint': 'get_iaa_user_data', 'body': PAYLOADS['get_iaa_user_data'](context, rng)[1]},
+    ]}),
+}
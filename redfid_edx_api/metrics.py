@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+from bisect import bisect_left
+import threading
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROWS_BUCKETS = (1, 10, 100, 1000, 10000, 100000)
+QUERIES_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 500)
+
+HISTOGRAMS = (
+    ('redfid_edx_api_request_duration_seconds', 'Duración de las solicitudes, en segundos.', LATENCY_BUCKETS),
+    ('redfid_edx_api_response_rows', 'Filas retornadas por los endpoints que retornan listas.', ROWS_BUCKETS),
+    ('redfid_edx_api_db_queries', 'Consultas a la base de datos por solicitud.', QUERIES_BUCKETS),
+)
+BUCKETS = {name: buckets for name, _, buckets in HISTOGRAMS}
+
+MAX_REASON_LENGTH = 64
+
+
+class MetricsRegistry(object):
+    """
+    Agregados por proceso de las solicitudes a los endpoints, exportados en formato de texto de Prometheus.
+    Cada hilo escribe solo en su propio shard, de modo que registrar una solicitud no toma ningún lock;
+    al exportar se suman los shards de todos los hilos. El lock solo se usa al crear el shard de un hilo nuevo.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def _get_shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = {}
+            self._local.shard = shard
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def _observe(self, shard, name, endpoint, value):
+        key = (name, endpoint)
+        histogram = shard.get(key)
+        if histogram is None:
+            # Cuentas por bucket (la última es +Inf), suma y cantidad.
+            histogram = shard[key] = [[0] * (len(BUCKETS[name]) + 1), 0, 0]
+        histogram[0][bisect_left(BUCKETS[name], value)] += 1
+        histogram[1] += value
+        histogram[2] += 1
+
+    def record(self, endpoint, status_code, duration, queries, rows=None, reason=None):
+        shard = self._get_shard()
+        key = ('redfid_edx_api_requests_total', endpoint, str(status_code))
+        shard[key] = shard.get(key, 0) + 1
+        if reason is not None:
+            key = ('redfid_edx_api_errors_total', endpoint, reason[:MAX_REASON_LENGTH])
+            shard[key] = shard.get(key, 0) + 1
+        self._observe(shard, 'redfid_edx_api_request_duration_seconds', endpoint, duration)
+        self._observe(shard, 'redfid_edx_api_db_queries', endpoint, queries)
+        if rows is not None:
+            self._observe(shard, 'redfid_edx_api_response_rows', endpoint, rows)
+
+    def collect(self):
+        """
+        Suma los shards de todos los hilos. Retorna (counters, histograms).
+        """
+        with self._lock:
+            shards = list(self._shards)
+        counters = {}
+        histograms = {}
+        for shard in shards:
+            for key, value in shard.copy().items():
+                if len(key) == 3:
+                    counters[key] = counters.get(key, 0) + value
+                    continue
+                buckets, total, count = value
+                if key not in histograms:
+                    histograms[key] = [[0] * len(buckets), 0, 0]
+                out = histograms[key]
+                out[0] = [a + b for a, b in zip(out[0], buckets)]
+                out[1] += total
+                out[2] += count
+        return counters, histograms
+
+    def export(self):
+        """
+        Retorna los agregados en formato de texto de Prometheus.
+        """
+        counters, histograms = self.collect()
+        lines = [
+            '# HELP redfid_edx_api_requests_total Solicitudes por endpoint y código de respuesta.',
+            '# TYPE redfid_edx_api_requests_total counter',
+        ]
+        for (name, endpoint, status), value in sorted(counters.items()):
+            if name == 'redfid_edx_api_requests_total':
+                lines.append('{}{{endpoint="{}",status="{}"}} {}'.format(name, _escape(endpoint), status, value))
+        lines += [
+            '# HELP redfid_edx_api_errors_total Respuestas de error por endpoint y motivo.',
+            '# TYPE redfid_edx_api_errors_total counter',
+        ]
+        for (name, endpoint, reason), value in sorted(counters.items()):
+            if name == 'redfid_edx_api_errors_total':
+                lines.append('{}{{endpoint="{}",reason="{}"}} {}'.format(name, _escape(endpoint), _escape(reason), value))
+        for name, description, buckets in HISTOGRAMS:
+            lines += ['# HELP {} {}'.format(name, description), '# TYPE {} histogram'.format(name)]
+            for (histogram_name, endpoint), (counts, total, count) in sorted(histograms.items()):
+                if histogram_name != name:
+                    continue
+                endpoint = _escape(endpoint)
+                cumulative = 0
+                for bound, bucket_count in zip(list(buckets) + ['+Inf'], counts):
+                    cumulative += bucket_count
+                    lines.append('{}_bucket{{endpoint="{}",le="{}"}} {}'.format(name, endpoint, bound, cumulative))
+                lines.append('{}_sum{{endpoint="{}"}} {}'.format(name, endpoint, total))
+                lines.append('{}_count{{endpoint="{}"}} {}'.format(name, endpoint, count))
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        with self._lock:
+            for shard in self._shards:
+                shard.clear()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
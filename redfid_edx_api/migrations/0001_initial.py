@@ -0,0 +1,30 @@
+from django.db import migrations, models
+import opaque_keys.edx.django.models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='XBlockAnswerSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('course_id', opaque_keys.edx.django.models.CourseKeyField(max_length=255)),
+                ('block_key', opaque_keys.edx.django.models.UsageKeyField(max_length=255)),
+                ('xblock_type', models.CharField(max_length=64)),
+                ('user_id', models.IntegerField()),
+                ('username', models.CharField(max_length=150)),
+                ('answer', models.TextField(default='null')),
+                ('modified', models.DateTimeField()),
+            ],
+            options={
+                'unique_together': {('user_id', 'block_key')},
+                'index_together': {('course_id', 'xblock_type', 'block_key'), ('block_key', 'id')},
+            },
+        ),
+    ]
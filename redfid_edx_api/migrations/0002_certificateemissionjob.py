@@ -0,0 +1,27 @@
+from django.db import migrations, models
+import opaque_keys.edx.django.models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('redfid_edx_api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CertificateEmissionJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_id', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('idempotency_key', models.CharField(max_length=255, unique=True)),
+                ('username', models.CharField(max_length=150)),
+                ('course_id', opaque_keys.edx.django.models.CourseKeyField(max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='pending', max_length=16)),
+                ('error', models.CharField(blank=True, default='', max_length=255)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('modified', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,81 @@
+from datetime import timedelta
+import uuid
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+from opaque_keys.edx.django.models import CourseKeyField, UsageKeyField
+
+
+class XBlockAnswerSnapshot(models.Model):
+    """
+    Copia desnormalizada de la respuesta de un usuario a un XBlock, extraída del campo state de StudentModule.
+    Se mantiene actualizada con la señal post_save de StudentModule (ver signals.py) y se puede poblar
+    con el comando backfill_xblock_answer_snapshots.
+    El campo answer guarda la respuesta ya serializada como JSON, para poder incluirla en las respuestas
+    de la API sin volver a decodificarla.
+    """
+    course_id = CourseKeyField(max_length=255)
+    block_key = UsageKeyField(max_length=255)
+    xblock_type = models.CharField(max_length=64)
+    user_id = models.IntegerField()
+    username = models.CharField(max_length=150)
+    answer = models.TextField(default="null")
+    modified = models.DateTimeField()
+
+    class Meta:
+        unique_together = (('user_id', 'block_key'),)
+        index_together = (
+            ('course_id', 'xblock_type', 'block_key'),
+            ('block_key', 'id'),
+        )
+
+    def __str__(self):
+        return "{} - {}".format(self.username, self.block_key)
+
+
+class CertificateEmissionJob(models.Model):
+    """
+    Solicitud de emisión asíncrona de un certificado, identificada por una idempotency_key entregada por el panel.
+    Los reintentos con la misma idempotency_key retornan el mismo trabajo, sin volver a emitir el certificado, y lo
+    vuelven a encolar si quedó sin procesar (ver is_claimable).
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    )
+
+    job_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    idempotency_key = models.CharField(max_length=255, unique=True)
+    username = models.CharField(max_length=150)
+    course_id = CourseKeyField(max_length=255)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    error = models.CharField(max_length=255, blank=True, default="")
+    created = models.DateTimeField(auto_now_add=True)
+    modified = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return "{} - {} - {}".format(self.username, self.course_id, self.status)
+
+    @classmethod
+    def claimable(cls):
+        """
+        Q de los trabajos que un worker puede tomar: los pendientes, y los que llevan más de
+        REDFID_EDX_API_CERTIFICATE_JOB_TIMEOUT segundos en running, cuyo worker se asume que murió.
+        """
+        stale = timezone.now() - timedelta(seconds=settings.REDFID_EDX_API_CERTIFICATE_JOB_TIMEOUT)
+        return models.Q(status=cls.PENDING) | models.Q(status=cls.RUNNING, modified__lt=stale)
+
+    def is_claimable(self):
+        """
+        Indica si el trabajo se debe volver a encolar: sigue pendiente (por ejemplo, porque falló el encolado) o
+        quedó en running más tiempo que REDFID_EDX_API_CERTIFICATE_JOB_TIMEOUT.
+        """
+        stale = timezone.now() - timedelta(seconds=settings.REDFID_EDX_API_CERTIFICATE_JOB_TIMEOUT)
+        return self.status == self.PENDING or (self.status == self.RUNNING and self.modified < stale)
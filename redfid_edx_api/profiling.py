@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+import cProfile
+from datetime import datetime
+from functools import wraps
+import json
+import logging
+import os
+import random
+import re
+import uuid
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'HTTP_X_REDFID_PROFILE'
+PROFILE_ID_PATTERN = re.compile(r'^[\w-]+$')
+REDACTED_KEYS = ('password',)
+MAX_BODY_LENGTH = 2000
+
+
+def profiling_enabled():
+    return getattr(settings, 'REDFID_EDX_API_PROFILING_ENABLED', False)
+
+
+def get_profiles_dir():
+    return settings.REDFID_EDX_API_PROFILING_DIR
+
+
+def get_jwt_claims(request):
+    """
+    Claims del JWT de la solicitud, o None si no tiene uno válido. JwtAuthentication deja el token sin decodificar
+    en request.auth; antes de la autenticación de DRF (en profile_view) el token se toma del header Authorization.
+    El token se decodifica y verifica con jwt_decode_handler de edx-drf-extensions.
+    """
+    token = getattr(request, 'auth', None)
+    if isinstance(token, dict):
+        return token
+    if not isinstance(token, str):
+        header = request.META.get('HTTP_AUTHORIZATION', '').split()
+        if len(header) != 2 or header[0].lower() not in ('jwt', 'bearer'):
+            return None
+        token = header[1]
+    try:
+        from edx_rest_framework_extensions.auth.jwt.decoder import jwt_decode_handler
+        return jwt_decode_handler(token)
+    except Exception:
+        return None
+
+
+def is_privileged(request):
+    """
+    Indica si quien hace la solicitud puede pedir perfiles y descargarlos: un superusuario, o un JWT con el
+    claim administrator.
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_superuser:
+        return True
+    claims = get_jwt_claims(request)
+    return isinstance(claims, dict) and claims.get('administrator') is True
+
+
+def get_trigger(request):
+    """
+    Retorna "header" si la solicitud pide un perfil (header X-Redfid-Profile: 1), "sample" si fue elegida con
+    probabilidad REDFID_EDX_API_PROFILING_SAMPLE_RATE, o None.
+    """
+    if request.META.get(PROFILE_HEADER) == '1':
+        return "header"
+    if random.random() < settings.REDFID_EDX_API_PROFILING_SAMPLE_RATE:
+        return "sample"
+    return None
+
+
+def _redact(data):
+    if isinstance(data, dict):
+        return {key: "***" if key in REDACTED_KEYS else _redact(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [_redact(value) for value in data]
+    return data
+
+
+def get_request_parameters(request):
+    """
+    Parámetros de la solicitud guardados junto al perfil: query string y cuerpo JSON, sin contraseñas y truncado.
+    """
+    try:
+        body = json.dumps(_redact(json.loads(request.body)))
+    except ValueError:
+        body = None
+    if body is not None and len(body) > MAX_BODY_LENGTH:
+        body = body[:MAX_BODY_LENGTH] + "..."
+    return {"query": request.META.get('QUERY_STRING', ''), "body": body}
+
+
+class Profile(object):
+    """
+    Perfil de una solicitud, con pyinstrument (profiler por muestreo) si está instalado, o con cProfile.
+    """
+
+    def __init__(self):
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            self.profiler = cProfile.Profile()
+            self.kind = "cprofile"
+        else:
+            self.profiler = Profiler()
+            self.kind = "pyinstrument"
+
+    def start(self):
+        if self.kind == "pyinstrument":
+            self.profiler.start()
+        else:
+            self.profiler.enable()
+
+    def stop(self):
+        if self.kind == "pyinstrument":
+            self.profiler.stop()
+        else:
+            self.profiler.disable()
+
+    def save(self, path):
+        """
+        Guarda el perfil en path, sin extensión. Retorna el nombre del archivo.
+        """
+        if self.kind == "pyinstrument":
+            filename = path + ".html"
+            with open(filename, 'w') as profile_file:
+                profile_file.write(self.profiler.output_html())
+        else:
+            filename = path + ".prof"
+            self.profiler.dump_stats(filename)
+        return os.path.basename(filename)
+
+
+def new_profile_id(endpoint):
+    return "{}-{}-{}".format(datetime.utcnow().strftime("%Y%m%dT%H%M%S"), endpoint, uuid.uuid4().hex[:8])
+
+
+def save_profile(profile, profile_id, request, endpoint, trigger, status_code):
+    """
+    Guarda el perfil y sus metadatos (endpoint, parámetros de la solicitud, código de respuesta) en
+    REDFID_EDX_API_PROFILING_DIR, y elimina los perfiles más antiguos sobre REDFID_EDX_API_PROFILING_MAX_FILES.
+    """
+    directory = get_profiles_dir()
+    os.makedirs(directory, exist_ok=True)
+    filename = profile.save(os.path.join(directory, profile_id))
+    metadata = {
+        "profile_id": profile_id,
+        "endpoint": endpoint,
+        "created": datetime.utcnow().isoformat(),
+        "trigger": trigger,
+        "profiler": profile.kind,
+        "filename": filename,
+        "status": status_code,
+        "method": request.method,
+        "parameters": get_request_parameters(request),
+    }
+    with open(os.path.join(directory, profile_id + ".json"), 'w') as metadata_file:
+        json.dump(metadata, metadata_file)
+    for old in list_profiles()[settings.REDFID_EDX_API_PROFILING_MAX_FILES:]:
+        delete_profile(old)
+
+
+def list_profiles():
+    """
+    Retorna los metadatos de los perfiles guardados, del más reciente al más antiguo.
+    """
+    directory = get_profiles_dir()
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in os.listdir(directory):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as metadata_file:
+                profiles.append(json.load(metadata_file))
+        except (OSError, ValueError):
+            continue
+    return sorted(profiles, key=lambda metadata: metadata["profile_id"], reverse=True)
+
+
+def get_profile(profile_id):
+    """
+    Retorna los metadatos de un perfil guardado, o None si no existe.
+    """
+    if not isinstance(profile_id, str) or not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    path = os.path.join(get_profiles_dir(), profile_id + ".json")
+    try:
+        with open(path) as metadata_file:
+            return json.load(metadata_file)
+    except (OSError, ValueError):
+        return None
+
+
+def get_profile_path(metadata):
+    """
+    Ruta del archivo de un perfil, o None si el nombre guardado en sus metadatos no es válido. Como los metadatos
+    se leen de un archivo del disco, solo se usa el nombre base y se verifica que la ruta quede dentro de
+    get_profiles_dir().
+    """
+    filename = metadata.get("filename")
+    if not isinstance(filename, str):
+        return None
+    directory = os.path.realpath(get_profiles_dir())
+    path = os.path.realpath(os.path.join(directory, os.path.basename(filename)))
+    if os.path.dirname(path) != directory:
+        return None
+    return path
+
+
+def delete_profile(metadata):
+    profile_id = metadata.get("profile_id")
+    paths = [get_profile_path(metadata)]
+    if isinstance(profile_id, str) and PROFILE_ID_PATTERN.match(profile_id):
+        paths.append(os.path.join(get_profiles_dir(), profile_id + ".json"))
+    for path in paths:
+        if path is None:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _iter_profiled(profile, content, finish):
+    """
+    Itera el contenido de una respuesta en streaming con el profiler activo, ya que las consultas y la
+    serialización ocurren mientras se genera. El perfil se guarda al terminar.
+    """
+    iterator = iter(content)
+    try:
+        while True:
+            try:
+                profile.start()
+            except ValueError:
+                active = False
+            else:
+                active = True
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                if active:
+                    profile.stop()
+            yield chunk
+    finally:
+        finish()
+
+
+def profile_view(view_func):
+    """
+    Decorador de las vistas (aplicado por instrumentation.instrument). Si el profiling está habilitado
+    (REDFID_EDX_API_PROFILING_ENABLED) y la solicitud lo pide o es elegida por muestreo, ejecuta la vista con un
+    profiler y guarda el perfil; en las respuestas en streaming el perfil incluye la generación del contenido.
+    Los perfiles pedidos por header solo se toman si quien los pide es privilegiado (ver is_privileged), lo que se
+    verifica antes de iniciar el profiler con el usuario de la sesión o el JWT del header Authorization; a ellos se
+    les retorna el id del perfil en el header X-Redfid-Profile-Id.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not profiling_enabled():
+            return view_func(request, *args, **kwargs)
+        trigger = get_trigger(request)
+        if trigger is None or (trigger == "header" and not is_privileged(request)):
+            return view_func(request, *args, **kwargs)
+        profile = Profile()
+        try:
+            profile.start()
+        except ValueError:
+            # Otro profiler ya está activo en este hilo.
+            return view_func(request, *args, **kwargs)
+        try:
+            response = view_func(request, *args, **kwargs)
+        finally:
+            profile.stop()
+        endpoint = request.resolver_match.url_name if request.resolver_match else view_func.__name__
+        profile_id = new_profile_id(endpoint)
+
+        def finish():
+            try:
+                save_profile(profile, profile_id, request, endpoint, trigger, response.status_code)
+            except Exception:
+                logger.exception("profile_view - error saving profile of {}".format(endpoint))
+                return False
+            return True
+
+        if response.streaming:
+            response.streaming_content = _iter_profiled(profile, response.streaming_content, finish)
+        elif not finish():
+            return response
+        if trigger == "header":
+            response['X-Redfid-Profile-Id'] = profile_id
+        return response
+    return wrapper
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+import logging
+import os
+import random
+import re
+import traceback
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+GUARD_FILES = {
+    os.path.join(PACKAGE_DIR, 'instrumentation.py'),
+    os.path.join(PACKAGE_DIR, 'query_guard.py'),
+}
+
+IN_LIST_PATTERN = re.compile(r'\bIN \((?:%s, )*%s\)', re.IGNORECASE)
+NUMBER_PATTERN = re.compile(r'\b\d+\b')
+STRING_PATTERN = re.compile(r"'(?:[^']|'')*'")
+SPACE_PATTERN = re.compile(r'\s+')
+TRANSACTION_PATTERN = re.compile(r'^\s*(SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK)\b', re.IGNORECASE)
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    Se lanza en modo estricto (REDFID_EDX_API_QUERY_GUARD_STRICT) en lugar de ejecutar la consulta que excede el
+    presupuesto de la solicitud, de modo que la transacción de la vista se deshace. Los manejadores que capturan
+    cualquier excepción para reportar un error por usuario u operación la relanzan, para que la solicitud falle.
+    """
+
+
+def get_query_budget(endpoint):
+    """
+    Presupuesto de consultas de un endpoint: REDFID_EDX_API_QUERY_BUDGETS[endpoint], o
+    REDFID_EDX_API_DEFAULT_QUERY_BUDGET si el endpoint no tiene uno propio.
+    """
+    return settings.REDFID_EDX_API_QUERY_BUDGETS.get(endpoint, settings.REDFID_EDX_API_DEFAULT_QUERY_BUDGET)
+
+
+def is_strict():
+    return settings.REDFID_EDX_API_QUERY_GUARD_STRICT
+
+
+def sample_query_details():
+    """
+    Indica si se guardan las huellas y los puntos de llamada de todas las consultas de la solicitud, lo que solo se
+    hace en una fracción REDFID_EDX_API_QUERY_GUARD_SAMPLE_RATE de las solicitudes (o siempre, en modo estricto).
+    En las demás solicitudes solo se guardan los de las consultas que exceden el presupuesto.
+    """
+    return is_strict() or random.random() < settings.REDFID_EDX_API_QUERY_GUARD_SAMPLE_RATE
+
+
+def fingerprint_sql(sql):
+    """
+    Huella de una consulta: el SQL con las listas IN, números y strings literales reemplazados, para agrupar
+    las consultas que solo difieren en sus parámetros.
+    """
+    sql = IN_LIST_PATTERN.sub('IN (...)', sql)
+    sql = STRING_PATTERN.sub('?', sql)
+    sql = NUMBER_PATTERN.sub('?', sql)
+    return SPACE_PATTERN.sub(' ', sql).strip()
+
+
+def get_call_site():
+    """
+    Punto del código del plugin que hizo la consulta en curso ("archivo:línea en función"), o el punto más interno
+    fuera de Django si la consulta no viene del plugin.
+    """
+    fallback = None
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename in GUARD_FILES:
+            continue
+        if frame.filename.startswith(PACKAGE_DIR):
+            return "{}:{} in {}".format(os.path.relpath(frame.filename, PACKAGE_DIR), frame.lineno, frame.name)
+        if fallback is None and '/django/' not in frame.filename:
+            fallback = "{}:{} in {}".format(frame.filename, frame.lineno, frame.name)
+    return fallback
+
+
+def check_slow_query(endpoint, sql, duration):
+    """
+    Registra en el log una consulta que demoró más de REDFID_EDX_API_SLOW_QUERY_MS milisegundos.
+    """
+    if duration * 1000 < settings.REDFID_EDX_API_SLOW_QUERY_MS:
+        return
+    logger.warning("redfid_edx_api slow query in %s: %.1f ms at %s: %s",
+                   endpoint, duration * 1000, get_call_site(), fingerprint_sql(sql))
+
+
+def is_transaction_statement(sql):
+    """
+    Indica si sql es una sentencia de control de transacción (savepoints y rollback), que el modo estricto nunca
+    bloquea para no dejar la transacción a medias.
+    """
+    return bool(TRANSACTION_PATTERN.match(sql))
+
+
+def report_query_budget(endpoint, queries, budget, details):
+    """
+    Registra en el log que una solicitud excedió el presupuesto de su endpoint, con las huellas de sus consultas,
+    su cantidad y sus puntos de llamada. Retorna el mensaje.
+    details es un diccionario huella -> [cantidad, conjunto de puntos de llamada].
+    """
+    lines = []
+    for fingerprint, (count, call_sites) in sorted(details.items(), key=lambda item: -item[1][0]):
+        lines.append("  {}x {}".format(count, fingerprint))
+        lines.extend("    at {}".format(call_site) for call_site in sorted(call_sites))
+    message = "redfid_edx_api query budget exceeded in {}: {} queries, budget {}".format(endpoint, queries, budget)
+    logger.warning("%s%s", message, "\n" + "\n".join(lines) if lines else "")
+    return message
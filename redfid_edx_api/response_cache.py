@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+from functools import wraps
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from opaque_keys import InvalidKeyError
+from opaque_keys.edx.keys import CourseKey
+
+from .streaming import get_stream_format
+from .utils import load_request_json
+
+
+RESPONSE_CACHE_KEY = "redfid_edx_api.response.{}.{}"
+VERSION_CACHE_KEY = "redfid_edx_api.response.version.{}"
+USERS_VERSION_CACHE_KEY = "redfid_edx_api.response.version.users"
+
+
+def response_cache_enabled():
+    return getattr(settings, 'REDFID_EDX_API_RESPONSE_CACHE_ENABLED', False)
+
+
+def get_response_cache():
+    return caches[settings.REDFID_EDX_API_RESPONSE_CACHE_ALIAS]
+
+
+def normalize_course_id(course_id):
+    """
+    Normaliza un course_id (CourseKey o string, con o sin el prefijo "course-v1:") para usarlo en las llaves de la cache.
+    """
+    if not isinstance(course_id, str):
+        return str(course_id)
+    for candidate in (course_id, "course-v1:" + course_id):
+        try:
+            return str(CourseKey.from_string(candidate))
+        except InvalidKeyError:
+            pass
+    return course_id
+
+
+def _increment_version(version_key):
+    if not response_cache_enabled():
+        return
+    cache = get_response_cache()
+    try:
+        cache.incr(version_key)
+    except ValueError:
+        cache.set(version_key, 1, None)
+
+
+def invalidate_course(course_id):
+    """
+    Invalida las respuestas en cache de un curso, incrementando su versión.
+    """
+    _increment_version(VERSION_CACHE_KEY.format(normalize_course_id(course_id)))
+
+
+def invalidate_users():
+    """
+    Invalida las respuestas en cache de todos los cursos, incrementando la versión de los usuarios. Se usa cuando
+    cambia el username de un usuario, que aparece en las respuestas de todos sus cursos.
+    """
+    _increment_version(USERS_VERSION_CACHE_KEY)
+
+
+def get_request_course_ids(data):
+    """
+    Retorna los course_id de una solicitud a un endpoint de lectura por curso, o None si no se puede cachear
+    (por ejemplo, si se pide un prefijo de course_id).
+    """
+    course_id = data.get('course_id')
+    if isinstance(course_id, str) and course_id:
+        return [course_id]
+    if isinstance(course_id, list) and course_id and all(isinstance(key, str) for key in course_id):
+        return course_id
+    return None
+
+
+def cache_course_response(view_func):
+    """
+    Decorador para el método post de los endpoints de lectura por curso. La respuesta se guarda en la cache de Django
+    (REDFID_EDX_API_RESPONSE_CACHE_ALIAS), con una llave formada por el endpoint, el cuerpo normalizado de la
+    solicitud (sin importar el orden de las llaves ni los espacios), la versión de cada curso, que se incrementa con
+    las señales de los modelos del curso, y la de los usuarios, que se incrementa al cambiar un username
+    (ver signals.py). Se guardan los bytes de la respuesta, que se retornan tal
+    cual. Solo se cachean las respuestas 200 que no son streaming.
+    """
+    @wraps(view_func)
+    def wrapper(self, request, *args, **kwargs):
+        if not response_cache_enabled() or get_stream_format(request):
+            return view_func(self, request, *args, **kwargs)
+        try:
+            data = load_request_json(request)
+        except json.JSONDecodeError:
+            return view_func(self, request, *args, **kwargs)
+        course_ids = get_request_course_ids(data) if isinstance(data, dict) else None
+        if not course_ids:
+            return view_func(self, request, *args, **kwargs)
+        cache = get_response_cache()
+        version_keys = sorted({VERSION_CACHE_KEY.format(normalize_course_id(course_id)) for course_id in course_ids})
+        version_keys.append(USERS_VERSION_CACHE_KEY)
+        versions = cache.get_many(version_keys)
+        fingerprint = json.dumps(
+            [data, [versions.get(version_key, 0) for version_key in version_keys]], sort_keys=True, separators=(',', ':')
+        )
+        key = RESPONSE_CACHE_KEY.format(
+            self.__class__.__name__, hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()
+        )
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+        response = view_func(self, request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            cache.set(key, (response.content, response['Content-Type']), settings.REDFID_EDX_API_RESPONSE_CACHE_TIMEOUT)
+        return response
+    return wrapper
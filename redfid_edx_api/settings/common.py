@@ -7,4 +7,91 @@ def plugin_settings(settings):
         "login_service_user",
         "ecommerce_worker",
         "discovery_worker",
-    ]
\ No newline at end of file
+    ]
+    # Si es True, GetXBlockUserData y GetXBlockCourseData leen las respuestas desde XBlockAnswerSnapshot, que se
+    # mantiene con señales de StudentModule. Al habilitarlo se debe ejecutar backfill_xblock_answer_snapshots.
+    settings.REDFID_EDX_API_USE_ANSWER_SNAPSHOTS = False
+
+    # Tamaño de los lotes usados por los endpoints masivos.
+    settings.REDFID_EDX_API_BULK_CHUNK_SIZE = 500
+
+    # Cache por hilo de los cursos del modulestore: cantidad máxima de cursos y segundos de vigencia.
+    settings.REDFID_EDX_API_COURSE_CACHE_SIZE = 32
+    settings.REDFID_EDX_API_COURSE_CACHE_TTL = 300
+
+    # Segundos que un trabajo de queue_user_certificate puede estar en running antes de considerar que su worker
+    # murió y volver a encolarlo en el siguiente reintento.
+    settings.REDFID_EDX_API_CERTIFICATE_JOB_TIMEOUT = 600
+
+    # Cantidad máxima de pares (username, course_id) aceptados por get_certificate_status.
+    settings.REDFID_EDX_API_MAX_CERTIFICATE_STATUS_PAIRS = 50000
+
+    # Respuestas en streaming (?stream=1 o Accept: application/x-ndjson): tamaño mínimo de cada bloque en bytes,
+    # y si se comprimen con gzip cuando el cliente lo acepta.
+    settings.REDFID_EDX_API_STREAM_CHUNK_SIZE = 65536
+    settings.REDFID_EDX_API_STREAM_GZIP = True
+
+    # Cache de respuestas de los endpoints de lectura por curso, invalidada por curso con señales de los modelos.
+    settings.REDFID_EDX_API_RESPONSE_CACHE_ENABLED = False
+    settings.REDFID_EDX_API_RESPONSE_CACHE_ALIAS = 'default'
+    settings.REDFID_EDX_API_RESPONSE_CACHE_TIMEOUT = 300
+
+    # Cache de la resolución username <-> user_id: tamaño y duración (en segundos) de la cache por proceso,
+    # y si se usa además el cache compartido de Django.
+    settings.REDFID_EDX_API_USER_CACHE_SIZE = 10000
+    settings.REDFID_EDX_API_USER_CACHE_TTL = 300
+    settings.REDFID_EDX_API_USER_CACHE_SHARED = False
+
+    # Endpoint batch/: cantidad máxima de operaciones por solicitud, y de hilos para las operaciones de lectura.
+    settings.REDFID_EDX_API_BATCH_MAX_OPERATIONS = 50
+    settings.REDFID_EDX_API_BATCH_WORKERS = 4
+
+    # Instrumentación de cada solicitud (consultas, tiempos de parseo, decodificación y serialización, bytes),
+    # registrada en el log y, si la pide un usuario staff, en el header Server-Timing.
+    settings.REDFID_EDX_API_INSTRUMENTATION_ENABLED = True
+
+    # Profiling de solicitudes: se activa por solicitud con el header X-Redfid-Profile: 1 (superusuarios o JWT de
+    # administrador) o por muestreo, y los perfiles se guardan en REDFID_EDX_API_PROFILING_DIR.
+    settings.REDFID_EDX_API_PROFILING_ENABLED = False
+    settings.REDFID_EDX_API_PROFILING_SAMPLE_RATE = 0.0
+    settings.REDFID_EDX_API_PROFILING_DIR = '/tmp/redfid_edx_api_profiles'
+    settings.REDFID_EDX_API_PROFILING_MAX_FILES = 100
+
+    # Presupuesto de consultas por endpoint (REDFID_EDX_API_QUERY_BUDGETS, o el presupuesto por defecto) y umbral de
+    # consultas lentas. Al exceder el presupuesto se registran las huellas y puntos de llamada de las consultas que
+    # lo exceden (y de todas en una fracción de las solicitudes). El modo estricto, pensado para
+    # tests y staging, lanza QueryBudgetExceeded en la consulta que excede el presupuesto, antes de ejecutarla.
+    settings.REDFID_EDX_API_DEFAULT_QUERY_BUDGET = 50
+    settings.REDFID_EDX_API_QUERY_BUDGETS = {
+        'batch': 1000,
+        'emit_course_certificates': 1000,
+        'enroll_users_into_course': 1000,
+        'unenroll_users_from_course': 1000,
+        'sync_course_roster': 1000,
+    }
+    settings.REDFID_EDX_API_SLOW_QUERY_MS = 500
+    settings.REDFID_EDX_API_QUERY_GUARD_SAMPLE_RATE = 0.01
+    settings.REDFID_EDX_API_QUERY_GUARD_STRICT = False
+
+    # Réplica de lectura para los endpoints de solo lectura: alias en DATABASES (si no existe, se usa la base de
+    # datos principal), y segundos durante los que un cliente lee de la principal después de una escritura (0 para
+    # desactivar).
+    settings.REDFID_EDX_API_READ_REPLICA_ALIAS = 'read_replica'
+    settings.REDFID_EDX_API_READ_REPLICA_STICKY_SECONDS = 0
+    if 'redfid_edx_api.db_routing.ReadReplicaRouter' not in getattr(settings, 'DATABASE_ROUTERS', []):
+        settings.DATABASE_ROUTERS = ['redfid_edx_api.db_routing.ReadReplicaRouter'] + list(getattr(settings, 'DATABASE_ROUTERS', []))
+
+    # Control de admisión de los endpoints costosos: solicitudes simultáneas por proceso y, opcionalmente, en todo el
+    # cluster (contadas en la cache REDFID_EDX_API_CONCURRENCY_CACHE_ALIAS). Si no hay cupo después de
+    # REDFID_EDX_API_CONCURRENCY_QUEUE_TIMEOUT segundos se retorna 429 con Retry-After.
+    settings.REDFID_EDX_API_CONCURRENCY_LIMITS = {
+        'get_iaa_course_data': 2,
+        'get_iterativexblock_course_data': 2,
+        'get_course_certificates': 2,
+        'get_xblock_course_data': 2,
+    }
+    settings.REDFID_EDX_API_CLUSTER_CONCURRENCY_LIMITS = {}
+    settings.REDFID_EDX_API_CONCURRENCY_CACHE_ALIAS = 'default'
+    settings.REDFID_EDX_API_CONCURRENCY_QUEUE_TIMEOUT = 5
+    settings.REDFID_EDX_API_CONCURRENCY_SLOT_TIMEOUT = 600
+    settings.REDFID_EDX_API_CONCURRENCY_RETRY_AFTER = 30
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models.signals import post_delete, post_save
+
+from .course_cache import course_cache
+from .models import XBlockAnswerSnapshot
+from .response_cache import invalidate_course, invalidate_users, response_cache_enabled
+from .snapshots import SNAPSHOT_XBLOCK_TYPES, get_snapshot_fields, snapshots_enabled
+from .user_cache import user_cache
+
+
+logger = logging.getLogger(__name__)
+
+PREVIOUS_USERNAME_ATTR = '_redfid_edx_api_previous_username'
+
+
+def update_xblock_answer_snapshot(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Receptor de post_save de StudentModule (registrado en apps.py).
+    Actualiza el XBlockAnswerSnapshot asociado a un StudentModule de un tipo de XBlock soportado, salvo que el
+    guardado no haya incluido el campo state, o que los snapshots no estén habilitados
+    (REDFID_EDX_API_USE_ANSWER_SNAPSHOTS; al habilitarlos se llenan con backfill_xblock_answer_snapshots).
+    Como se ejecuta en cada guardado de un estudiante, el caso común es un solo UPDATE; el snapshot solo se crea
+    si no existía. Todo ocurre en un savepoint, para que un error aquí no impida que se guarde el StudentModule
+    del estudiante.
+    """
+    if not snapshots_enabled() or instance.module_type not in SNAPSHOT_XBLOCK_TYPES:
+        return
+    if update_fields is not None and 'state' not in update_fields:
+        return
+    try:
+        with transaction.atomic():
+            fields = get_snapshot_fields(instance)
+            snapshots = XBlockAnswerSnapshot.objects.filter(user_id=instance.student_id, block_key=instance.module_state_key)
+            if not created and snapshots.update(**fields):
+                return
+            try:
+                with transaction.atomic():
+                    XBlockAnswerSnapshot.objects.create(
+                        user_id=instance.student_id, block_key=instance.module_state_key, **fields
+                    )
+            except IntegrityError:
+                snapshots.update(**fields)
+    except Exception:
+        logger.exception("update_xblock_answer_snapshot - error updating snapshot for StudentModule {}".format(instance.id))
+
+
+def delete_xblock_answer_snapshot(sender, instance, **kwargs):
+    """
+    Elimina el XBlockAnswerSnapshot asociado a un StudentModule eliminado, si los snapshots están habilitados.
+    Como update_xblock_answer_snapshot, se ejecuta en un savepoint y sus errores solo se registran en el log.
+    """
+    if not snapshots_enabled() or instance.module_type not in SNAPSHOT_XBLOCK_TYPES:
+        return
+    try:
+        with transaction.atomic():
+            XBlockAnswerSnapshot.objects.filter(user_id=instance.student_id, block_key=instance.module_state_key).delete()
+    except Exception:
+        logger.exception("delete_xblock_answer_snapshot - error deleting snapshot for StudentModule {}".format(instance.id))
+
+
+def remember_previous_username(sender, instance, update_fields=None, **kwargs):
+    """
+    Receptor de pre_save de User. Guarda en la instancia el username que tiene en la base de datos, para que los
+    receptores de post_save solo actúen si cambió (ver username_changed). Los usuarios nuevos y los guardados que no
+    incluyen el username (por ejemplo, el de last_login en cada inicio de sesión) no consultan la base de datos.
+    """
+    previous = None
+    if instance.pk is not None and (update_fields is None or 'username' in update_fields):
+        previous = sender._default_manager.filter(pk=instance.pk).values_list('username', flat=True).first()
+    setattr(instance, PREVIOUS_USERNAME_ATTR, previous)
+
+
+def username_changed(instance, created):
+    """
+    Indica si el guardado de un User cambió su username (ver remember_previous_username).
+    """
+    previous = getattr(instance, PREVIOUS_USERNAME_ATTR, None)
+    return not created and previous is not None and previous != instance.username
+
+
+def update_xblock_answer_snapshot_username(sender, instance, created, **kwargs):
+    """
+    Mantiene el username desnormalizado de XBlockAnswerSnapshot cuando un usuario cambia de username.
+    Los guardados que no cambian el username se ignoran, al igual que todos si los snapshots no están habilitados.
+    """
+    if not snapshots_enabled() or not username_changed(instance, created):
+        return
+    XBlockAnswerSnapshot.objects.filter(user_id=instance.id).exclude(username=instance.username).update(username=instance.username)
+
+
+def invalidate_course_cache(sender, course_key, **kwargs):
+    """
+    Receptor de course_published. Invalida el curso en la cache de cursos (ver course_cache.py).
+    """
+    course_cache.invalidate(course_key)
+
+
+def invalidate_user_cache(sender, instance, created, **kwargs):
+    """
+    Receptor de post_save de User. Invalida la resolución username <-> user_id del usuario (ver user_cache.py) y
+    las respuestas en cache (ver response_cache.py) solo si cambió su username; los registros y los demás
+    guardados no las afectan, ya que ambas caches invalidan todas sus entradas en el cluster.
+    """
+    if not username_changed(instance, created):
+        return
+    user_cache.invalidate(instance.id, instance.username)
+    invalidate_users()
+
+
+def invalidate_deleted_user_cache(sender, instance, **kwargs):
+    """
+    Receptor de post_delete de User. Invalida la resolución username <-> user_id del usuario eliminado y las
+    respuestas en cache.
+    """
+    user_cache.invalidate(instance.id, instance.username)
+    invalidate_users()
+
+
+def invalidate_course_response_cache(sender, instance, **kwargs):
+    """
+    Receptor de post_save y post_delete de StudentModule, GeneratedCertificate y CourseEnrollment.
+    Invalida las respuestas en cache del curso (ver response_cache.py).
+    """
+    invalidate_course(instance.course_id)
+
+
+def invalidate_xblock_response_cache(sender, instance, **kwargs):
+    """
+    Receptor de post_save y post_delete de los modelos de IAAXBlock e IterativeXBlock.
+    Invalida las respuestas en cache del curso (ver response_cache.py). Si la cache está deshabilitada no se hace
+    nada, para no cargar la actividad o la etapa de cada respuesta que guarda un estudiante.
+    """
+    if not response_cache_enabled():
+        return
+    try:
+        if hasattr(instance, 'id_course'):
+            course_id = instance.id_course
+        elif hasattr(instance, 'activity'):
+            course_id = instance.activity.id_course
+        else:
+            course_id = instance.stage.activity.id_course
+    except Exception:
+        logger.exception("invalidate_xblock_response_cache - could not get course of {}".format(instance))
+        return
+    invalidate_course(course_id)
+
+
+def connect_optional_xblock_signals():
+    """
+    Conecta invalidate_xblock_response_cache a los modelos de IAAXBlock e IterativeXBlock, si están instalados.
+    No se registran en apps.py porque son dependencias opcionales.
+    """
+    models = []
+    try:
+        from iaaxblock.models import IAAActivity, IAAStage, IAASubmission
+        models += [IAAActivity, IAAStage, IAASubmission]
+    except ImportError:
+        pass
+    try:
+        from iterativexblock.models import IterativeXBlockQuestion, IterativeXBlockAnswer
+        models += [IterativeXBlockQuestion, IterativeXBlockAnswer]
+    except ImportError:
+        pass
+    for model in models:
+        post_save.connect(invalidate_xblock_response_cache, sender=model, dispatch_uid="redfid_edx_api.{}.post_save".format(model.__name__))
+        post_delete.connect(invalidate_xblock_response_cache, sender=model, dispatch_uid="redfid_edx_api.{}.post_delete".format(model.__name__))
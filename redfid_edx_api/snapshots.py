@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+import json
+
+from django.conf import settings
+
+from .instrumentation import timer
+
+
+SNAPSHOT_XBLOCK_TYPES = ['iterativexblock', 'iaaxblock', 'freetextresponse', 'problem']
+
+
+def snapshots_enabled():
+    """
+    Indica si GetXBlockUserData y GetXBlockCourseData deben leer las respuestas desde XBlockAnswerSnapshot
+    en vez de decodificar el state de StudentModule.
+    """
+    return getattr(settings, 'REDFID_EDX_API_USE_ANSWER_SNAPSHOTS', False)
+
+
+def get_answer_from_state(xblock_type, state):
+    """
+    Extrae la respuesta del usuario desde el state (JSON) de un StudentModule, según el tipo de XBlock.
+    """
+    with timer('decode'):
+        state = json.loads(state) if state else {}
+    if xblock_type == 'freetextresponse':
+        return state.get('student_answer')
+    elif xblock_type in ('iterativexblock', 'problem'):
+        return state.get('student_answers')
+    return None
+
+
+def get_snapshot_fields(student_module):
+    """
+    Construye los campos de XBlockAnswerSnapshot a partir de un StudentModule. El username se toma del usuario
+    si ya está cargado (select_related), o de la cache de usuarios, para no consultar el usuario en cada guardado.
+    """
+    from .user_cache import resolve_username
+    if student_module._meta.get_field('student').is_cached(student_module):
+        username = student_module.student.username
+    else:
+        username = resolve_username(student_module.student_id)
+    return {
+        "course_id": student_module.course_id,
+        "xblock_type": student_module.module_type,
+        "username": username,
+        "answer": json.dumps(get_answer_from_state(student_module.module_type, student_module.state)),
+        "modified": student_module.modified,
+    }
+
+
+def get_user_snapshot_answers(user_id, block_keys):
+    """
+    Retorna un diccionario block_key -> respuesta serializada como JSON, para las respuestas de un usuario.
+    """
+    from .models import XBlockAnswerSnapshot
+    rows = XBlockAnswerSnapshot.objects.filter(
+        user_id=user_id, block_key__in=block_keys
+    ).values_list('block_key', 'answer')
+    return {str(block_key): answer for block_key, answer in rows}
+
+
+def iter_course_snapshot_answers(block_keys=None, course_key=None, xblock_type=None):
+    """
+    Itera las filas (block_key, username, answer) de XBlockAnswerSnapshot, ordenadas por block_key.
+    Se filtra por una lista de block_keys, o bien por curso y tipo de XBlock.
+    """
+    from .models import XBlockAnswerSnapshot
+    if block_keys is not None:
+        snapshots = XBlockAnswerSnapshot.objects.filter(block_key__in=block_keys)
+    else:
+        snapshots = XBlockAnswerSnapshot.objects.filter(course_id=course_key, xblock_type=xblock_type)
+    rows = snapshots.order_by('block_key', 'id').values_list('block_key', 'username', 'answer').iterator()
+    for block_key, username, answer in rows:
+        yield str(block_key), username, answer
+
+
+def dump_answer(answer):
+    """
+    Serializa {"answer": ...} usando la respuesta ya serializada del snapshot.
+    """
+    return '{"answer": %s}' % answer
+
+
+def dump_block_answers(id_xblock, answers):
+    """
+    Serializa {"id_xblock": ..., "answers": [...]} usando las respuestas ya serializadas del snapshot.
+    answers es una lista de pares (username, answer).
+    """
+    return '{"id_xblock": %s, "answers": [%s]}' % (
+        json.dumps(id_xblock),
+        ", ".join('{"username": %s, "answer": %s}' % (json.dumps(username), answer) for username, answer in answers),
+    )
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+import json
+import zlib
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+
+from .instrumentation import count_rows, timer
+
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+
+class RawJSON(str):
+    """
+    Fila que ya está serializada como JSON (por ejemplo, las respuestas de XBlockAnswerSnapshot).
+    Se escribe en la respuesta tal cual, sin volver a serializarla.
+    """
+
+
+def dump_row(row):
+    if isinstance(row, RawJSON):
+        return str(row)
+    with timer('serialize'):
+        return json.dumps(row, cls=DjangoJSONEncoder)
+
+
+def get_stream_format(request):
+    """
+    Retorna "ndjson" si la solicitud pide NDJSON (header Accept: application/x-ndjson), "json" si pide la lista
+    JSON en streaming (?stream=1), o None si la respuesta no debe ser streaming.
+    """
+    if NDJSON_CONTENT_TYPE in request.META.get('HTTP_ACCEPT', ''):
+        return "ndjson"
+    if request.GET.get('stream') == "1":
+        return "json"
+    return None
+
+
+def _iter_json_chunks(rows, stream_format):
+    """
+    Serializa las filas como una lista JSON o como NDJSON, agrupando el resultado en bloques de al menos
+    REDFID_EDX_API_STREAM_CHUNK_SIZE bytes.
+    """
+    chunk_size = settings.REDFID_EDX_API_STREAM_CHUNK_SIZE
+    buffer = []
+    buffered = 0
+    if stream_format == "json":
+        buffer.append("[")
+    first = True
+    count = 0
+    for row in rows:
+        count += 1
+        data = dump_row(row)
+        if stream_format == "ndjson":
+            data += "\n"
+        elif not first:
+            data = ", " + data
+        first = False
+        buffer.append(data)
+        buffered += len(data)
+        if buffered >= chunk_size:
+            yield "".join(buffer).encode('utf-8')
+            buffer = []
+            buffered = 0
+    count_rows(count)
+    if stream_format == "json":
+        buffer.append("]")
+    if buffer:
+        yield "".join(buffer).encode('utf-8')
+
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def list_response(request, rows):
+    """
+    Construye la respuesta de un endpoint que retorna una lista, a partir de un generador de filas.
+    Sin streaming, se retorna la misma lista JSON que antes. Con ?stream=1 o Accept: application/x-ndjson, las filas
+    se serializan a medida que se generan, en una StreamingHttpResponse, comprimida con gzip si el cliente lo acepta.
+    """
+    stream_format = get_stream_format(request)
+    if stream_format is None:
+        rows = list(rows)
+        count_rows(len(rows))
+        if any(isinstance(row, RawJSON) for row in rows):
+            return HttpResponse("[" + ", ".join(dump_row(row) for row in rows) + "]", content_type="application/json")
+        with timer('serialize'):
+            return JsonResponse(rows, safe=False)
+    chunks = _iter_json_chunks(rows, stream_format)
+    use_gzip = settings.REDFID_EDX_API_STREAM_GZIP and 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+    if use_gzip:
+        chunks = _gzip_chunks(chunks)
+    response = StreamingHttpResponse(
+        chunks,
+        content_type=NDJSON_CONTENT_TYPE if stream_format == "ndjson" else "application/json",
+    )
+    if use_gzip:
+        response['Content-Encoding'] = 'gzip'
+    response['Vary'] = 'Accept, Accept-Encoding'
+    return response
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+import logging
+
+from celery import shared_task
+from django.contrib.auth.models import User
+from django.utils import timezone
+from lms.djangoapps.certificates.queue import XQueueCertInterface
+
+from .certificates import emit_certificate
+from .course_cache import get_course
+from .models import CertificateEmissionJob
+
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def emit_certificate_job(job_id):
+    """
+    Procesa un CertificateEmissionJob pendiente, o uno que quedó en running porque su worker murió (ver
+    CertificateEmissionJob.claimable). Solo el primer worker que lo marca como running lo procesa, de modo que un
+    trabajo encolado más de una vez no emite el certificado dos veces.
+    """
+    claimed = CertificateEmissionJob.objects.filter(
+        CertificateEmissionJob.claimable(), job_id=job_id
+    ).update(status=CertificateEmissionJob.RUNNING, modified=timezone.now())
+    if not claimed:
+        return
+    job = CertificateEmissionJob.objects.get(job_id=job_id)
+    job.status = CertificateEmissionJob.FAILED
+    try:
+        user = User.objects.get(username=job.username)
+    except User.DoesNotExist:
+        job.error = "User not found"
+        job.save(update_fields=['status', 'error', 'modified'])
+        return
+    course = get_course(job.course_id)
+    if course is None:
+        job.error = "Course not found"
+        job.save(update_fields=['status', 'error', 'modified'])
+        return
+    try:
+        emit_certificate(XQueueCertInterface(), user, job.course_id, course)
+    except Exception:
+        logger.exception("emit_certificate_job - error emitting certificate for job {}".format(job_id))
+        job.error = "Error emitting certificate"
+        job.save(update_fields=['status', 'error', 'modified'])
+        return
+    job.status = CertificateEmissionJob.SUCCEEDED
+    job.save(update_fields=['status', 'modified'])
@@ -1,5 +1,13 @@
+import gzip
+import itertools
 import json
+from io import StringIO
+import os
 import sys
+import tempfile
+import threading
+import time
+import tracemalloc
 from contextlib import contextmanager
 from types import ModuleType
 from unittest.mock import patch
@@ -7,16 +15,35 @@ from unittest.mock import patch
 from common.djangoapps.student.models import CourseEnrollment, UserProfile
 from common.djangoapps.student.tests.factories import UserFactory, CourseEnrollmentFactory
 from django.conf import settings
-from django.contrib.auth.models import User
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.db.utils import IntegrityError
-from django.test import Client
+from django.test import Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from lms.djangoapps.certificates.models import GeneratedCertificate
 from lms.djangoapps.courseware.models import StudentModule
+from opaque_keys.edx.keys import CourseKey
+from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
 from social_django.models import UserSocialAuth
 from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase, TEST_DATA_SPLIT_MODULESTORE
+from xmodule.modulestore.django import modulestore
 from xmodule.modulestore.tests.factories import CourseFactory
 
+from redfid_edx_api import admission, db_routing
+from redfid_edx_api.course_cache import course_cache
+from redfid_edx_api.instrumentation import count_rows
+from redfid_edx_api.metrics import registry as metrics_registry
+from redfid_edx_api.profiling import get_profile, is_privileged
+from redfid_edx_api.models import CertificateEmissionJob, XBlockAnswerSnapshot
+from redfid_edx_api.query_guard import QueryBudgetExceeded
+from redfid_edx_api.response_cache import VERSION_CACHE_KEY as RESPONSE_CACHE_VERSION_KEY
+from redfid_edx_api.user_cache import VERSION_CACHE_KEY as USER_CACHE_VERSION_KEY, resolve_user_id, resolve_username, user_cache
+from redfid_edx_api.utils import iter_groups_in_order
+
 
 # --- Helpers for faking optional XBlock packages (iaaxblock, iterativexblock) ---
 #
@@ -88,16 +115,22 @@ class FakeQuerySet(list):
 
 
 class FakeManager(object):
+    # Every query started from a fake manager counts as one database query in the benchmarks.
+    queries = 0
+
     def __init__(self, instances):
         self._qs = FakeQuerySet(instances)
 
     def filter(self, **kwargs):
+        FakeManager.queries += 1
         return self._qs.filter(**kwargs)
 
     def all(self):
+        FakeManager.queries += 1
         return self._qs.all()
 
     def get(self, **kwargs):
+        FakeManager.queries += 1
         return self._qs.get(**kwargs)
 
 
@@ -109,15 +142,21 @@ def fake_model(instances):
     return cls
 
 
+fake_ids = itertools.count(1)
+
+
 class FakeIAAActivity(object):
     def __init__(self, id_course, activity_name):
+        self.id = next(fake_ids)
         self.id_course = id_course
         self.activity_name = activity_name
 
 
 class FakeIAAStage(object):
     def __init__(self, activity, stage_label, stage_number):
+        self.id = next(fake_ids)
         self.activity = activity
+        self.activity_id = activity.id
         self.stage_label = stage_label
         self.stage_number = stage_number
 
@@ -126,6 +165,7 @@ class FakeIAASubmission(object):
     def __init__(self, id_student, stage, submission, submission_time):
         self.id_student = id_student
         self.stage = stage
+        self.stage_id = stage.id
         self.submission = submission
         self.submission_time = submission_time
 
@@ -191,6 +231,8 @@ class TestRedfidEdxApi(ModuleStoreTestCase):
         self.student1 = UserFactory(username='student1', password='12345', email='student1@edx.org')
         self.student2 = UserFactory(username='student2', password='12345', email='student2@edx.org')
         CourseEnrollmentFactory(user=self.student1, course_id=self.course1.id)
+        course_cache.clear()
+        user_cache.clear()
 
     # -- request helpers --
 
@@ -231,16 +273,21 @@ class TestRedfidEdxApi(ModuleStoreTestCase):
     def test_endpoints_require_authentication(self):
         response = self.non_auth_client.get(reverse('redfid_edx_api:get_users'))
         self.assertEqual(response.status_code, 401)
+        response = self.non_auth_client.get(reverse('redfid_edx_api:metrics'))
+        self.assertEqual(response.status_code, 401)
 
         post_endpoints = [
             'create_user', 'edit_user', 'suspend_or_activate_user',
             'change_user_password', 'delete_user', 'ensure_user_has_redfid_social_auth',
             'get_iaa_user_data', 'get_iaa_course_data',
             'get_iterativexblock_user_data', 'get_iterativexblock_course_data',
-            'get_user_certificates', 'get_course_certificates',
-            'emit_user_certificate', 'revoke_user_certificate',
+            'get_user_certificates', 'get_course_certificates', 'get_certificate_status',
+            'emit_user_certificate', 'revoke_user_certificate', 'emit_course_certificates',
+            'queue_user_certificate', 'get_certificate_emission_job', 'revoke_course_certificates',
             'get_xblock_user_data', 'get_xblock_course_data',
             'enroll_user_into_course', 'unenroll_user_from_course',
+            'enroll_users_into_course', 'unenroll_users_from_course', 'sync_course_roster',
+            'batch',
         ]
         for name in post_endpoints:
             response = self.non_auth_client.post(
@@ -356,6 +403,8 @@ class TestRedfidEdxApi(ModuleStoreTestCase):
             })
         self.assertEqual(response.status_code, 400)
         self.assertEqual(response.content, b'UserSocialAuth already exists')
+        # The user and its profile are rolled back with the failed request.
+        self.assertFalse(User.objects.filter(username='socialauthclash').exists())
 
     # ------------------------------------------------------------------
     # EditRedfidUser
@@ -438,6 +487,32 @@ class TestRedfidEdxApi(ModuleStoreTestCase):
         })
         self.assertEqual(response.status_code, 400)
         self.assertEqual(response.content, b'UserProfile not found')
+        self.student1.refresh_from_db()
+        self.assertEqual(self.student1.email, 'student1@edx.org')
+
+    def test_edit_user_only_writes_changed_fields(self):
+        data = {
+            'username': 'student1',
+            'email': 'student1-new@example.com',
+            'first_name': 'Student',
+            'last_name': 'One',
+            'is_staff': False,
+            'is_superuser': False,
+        }
+        self.assertEqual(self._post('edit_user', data).status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            response = self._post('edit_user', data)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE')])
+
+        with CaptureQueriesContext(connection) as queries:
+            self._post('edit_user', dict(data, first_name='Other'))
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 2)
+        self.assertNotIn('email', updates[0])
+        self.student1.refresh_from_db()
+        self.assertEqual(self.student1.first_name, 'Other')
+        self.assertEqual(UserProfile.objects.get(user=self.student1).name, 'Other One')
 
     # ------------------------------------------------------------------
     # SuspendOrActivateRedfidUser
@@ -470,6 +545,12 @@ class TestRedfidEdxApi(ModuleStoreTestCase):
         self.student1.refresh_from_db()
         self.assertFalse(self.student1.is_active)
 
+    def test_suspend_unchanged_skips_write(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self._post('suspend_or_activate_user', {'username': 'student1', 'is_active': True})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE')])
+
     def test_suspend_success_activate(self):
         self.student1.is_active = False
         self.student1.save()
@@ -798,6 +879,127 @@ class TestRedfidEdxApi(ModuleStoreTestCase):
         self.assertEqual(len(data), 1)
         self.assertEqual(data[0]['username'], 'student1')
 
+    def test_get_course_certificates_multiple_courses(self):
+        # Course publish signals are disabled in ModuleStoreTestCase, so CourseOverviews are built explicitly.
+        CourseOverview.get_from_id(self.course1.id)
+        CourseOverview.get_from_id(self.course2.id)
+        GeneratedCertificate.objects.create(user=self.student1, course_id=self.course1.id, verify_uuid='uuid-m1', key='key-m1')
+        GeneratedCertificate.objects.create(user=self.student2, course_id=self.course2.id, verify_uuid='uuid-m2', key='key-m2')
+        response = self._post('get_course_certificates', {'course_id': [str(self.course2.id), str(self.course1.id)]})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([course['course_id'] for course in data], [str(self.course2.id), str(self.course1.id)])
+        self.assertEqual(data[0]['display_name'], 'Sample course 2')
+        self.assertIn('start', data[0])
+        self.assertEqual(data[0]['certificates'], [{
+            'username': 'student2', 'course_id': str(self.course2.id), 'verify_uuid': 'uuid-m2', 'key': 'key-m2',
+        }])
+        self.assertEqual(data[1]['certificates'][0]['username'], 'student1')
+
+        response = self._post('get_course_certificates', {'course_id': [str(self.course1.id), 'bad!!']})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.content, b'Course not found')
+
+    def test_get_course_certificates_course_prefix(self):
+        other_course = CourseFactory.create(org='other', course='200', run='2020', display_name='Other course')
+        for course_key in (self.course1.id, self.course2.id, other_course.id):
+            CourseOverview.get_from_id(course_key)
+        GeneratedCertificate.objects.create(user=self.student1, course_id=self.course1.id, verify_uuid='uuid-o1', key='key-o1')
+        GeneratedCertificate.objects.create(user=self.student1, course_id=other_course.id, verify_uuid='uuid-o2', key='key-o2')
+        response = self._post('get_course_certificates', {'course_prefix': 'course-v1:mss+'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(sorted(course['course_id'] for course in data), sorted([str(self.course1.id), str(self.course2.id)]))
+        course1 = next(course for course in data if course['course_id'] == str(self.course1.id))
+        self.assertEqual(course1['display_name'], 'Sample course 1')
+        self.assertEqual(len(course1['certificates']), 1)
+
+        response = self._post('get_course_certificates', {'course_prefix': ['x']})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.content, b'Invalid course_prefix')
+
+    def test_get_course_certificates_constant_queries(self):
+        for i in range(5):
+            user = UserFactory(username='certuser%d' % i)
+            GeneratedCertificate.objects.create(
+                user=user, course_id=self.course1.id, verify_uuid='uuid-c%d' % i, key='key-c%d' % i,
+            )
+        with CaptureQueriesContext(connection) as ctx:
+            response = self._post('get_course_certificates', {'course_id': str(self.course1.id)})
+        certificate_queries = [q for q in ctx.captured_queries if 'certificates_generatedcertificate' in q['sql']]
+        self.assertEqual(len(certificate_queries), 1)
+        self.assertEqual(len(response.json()), 5)
+        self.assertEqual(response.json()[0], {
+            'username': 'certuser0', 'course_id': str(self.course1.id), 'verify_uuid': 'uuid-c0', 'key': 'key-c0',
+        })
+
+    def test_get_course_certificates_keyset_pagination(self):
+        for i in range(3):
+            user = UserFactory(username='pageuser%d' % i)
+            GeneratedCertificate.objects.create(
+                user=user, course_id=self.course1.id, verify_uuid='uuid-p%d' % i, key='key-p%d' % i,
+            )
+        response = self._post('get_course_certificates', {'course_id': str(self.course1.id), 'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        first_page = response.json()
+        self.assertEqual([c['username'] for c in first_page['results']], ['pageuser0', 'pageuser1'])
+        self.assertIsNotNone(first_page['next_after'])
+        response = self._post('get_course_certificates', {
+            'course_id': str(self.course1.id), 'page_size': 2, 'after': first_page['next_after'],
+        })
+        second_page = response.json()
+        self.assertEqual([c['username'] for c in second_page['results']], ['pageuser2'])
+        self.assertIsNone(second_page['next_after'])
+
+        response = self._post('get_course_certificates', {'course_id': str(self.course1.id), 'page_size': 0})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.content, b'Invalid page_size')
+        response = self._post('get_user_certificates', {'username': 'pageuser0', 'after': 'x'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.content, b'Invalid after')
+
+    def test_get_certificate_status_validation(self):
+        response = self._post_raw('get_certificate_status', 'not-json')
+        self.assertEqual(response.content, b'Invalid JSON data')
+        response = self._post('get_certificate_status', {})
+        self.assertEqual(response.content, b'Missing pairs')
+        response = self._post('get_certificate_status', {'pairs': [{'username': 'student1'}]})
+        self.assertEqual(response.content, b'Invalid pairs')
+        response = self._post('get_certificate_status', {'pairs': [{'username': 'student1', 'course_id': 'bad!!'}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.content, b'Invalid course_id')
+        with override_settings(REDFID_EDX_API_MAX_CERTIFICATE_STATUS_PAIRS=1):
+            response = self._post('get_certificate_status', {'pairs': [
+                {'username': 'student1', 'course_id': str(self.course1.id)},
+                {'username': 'student2', 'course_id': str(self.course1.id)},
+            ]})
+        self.assertEqual(response.content, b'Invalid pairs')
+
+    def test_get_certificate_status_success(self):
+        GeneratedCertificate.objects.create(
+            user=self.student1, course_id=self.course1.id, verify_uuid='uuid-s1', key='key-s1', status='downloadable',
+        )
+        GeneratedCertificate.objects.create(
+            user=self.student2, course_id=self.course2.id, verify_uuid='uuid-s2', key='key-s2', status='downloadable',
+        )
+        response = self._post('get_certificate_status', {'pairs': [
+            {'username': 'student1', 'course_id': str(self.course1.id)},
+            {'username': 'student1', 'course_id': str(self.course2.id)},
+            {'username': 'student2', 'course_id': str(self.course2.id)},
+            {'username': 'ghost', 'course_id': str(self.course1.id)},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [
+            {'username': 'student1', 'course_id': str(self.course1.id), 'status': 'downloadable',
+             'verify_uuid': 'uuid-s1', 'key': 'key-s1'},
+            {'username': 'student1', 'course_id': str(self.course2.id), 'status': None,
+             'verify_uuid': None, 'key': None},
+            {'username': 'student2', 'course_id': str(self.course2.id), 'status': 'downloadable',
+             'verify_uuid': 'uuid-s2', 'key': 'key-s2'},
+            {'username': 'ghost', 'course_id': str(self.course1.id), 'status': None,
+             'verify_uuid': None, 'key': None},
+        ])
+
     def test_emit_certificate_invalid_json(self):
         response = self._post_raw('emit_user_certificate', 'not-json')
         self.assertEqual(response.status_code, 400)
@@ -834,6 +1036,158 @@ class TestRedfidEdxApi(ModuleStoreTestCase):
         _, kwargs = MockXQueue.return_value.add_cert.call_args
         self.assertEqual(kwargs.get('forced_grade'), 'Aprobado')
 
+    def test_emit_course_certificates_validation(self):
+        response = self._post_raw('emit_course_certificates', 'not-json')
+        self.assertEqual(response.content, b'Invalid JSON data')
+        response = self._post('emit_course_certificates', {'course_id': str(self.course1.id)})
+        self.assertEqual(response.content, b'Missing usernames')
+        response = self._post('emit_course_certificates', {'usernames': 'student1', 'course_id': str(self.course1.id)})
+        self.assertEqual(response.content, b'Invalid usernames')
+        response = self._post('emit_course_certificates', {'usernames': ['student1']})
+        self.assertEqual(response.content, b'Missing course_id')
+        response = self._post('emit_course_certificates', {'usernames': ['student1'], 'course_id': 'bad!!'})
+        self.assertEqual(response.content, b'Invalid course_id')
+        response = self._post('emit_course_certificates', {'usernames': ['student1'], 'course_id': 'course-v1:mss+999+2020'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.content, b'Course not found')
+
+    def test_emit_course_certificates_success(self):
+        with patch('redfid_edx_api.views.XQueueCertInterface') as MockXQueue:
+            response = self._post('emit_course_certificates', {
+                'usernames': ['student1', 'ghost', 'student2'], 'course_id': str(self.course1.id),
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [
+            {'username': 'student1', 'status': 'emitted'},
+            {'username': 'ghost', 'status': 'error', 'reason': 'User not found'},
+            {'username': 'student2', 'status': 'emitted'},
+        ])
+        MockXQueue.assert_called_once()
+        self.assertEqual(MockXQueue.return_value.add_cert.call_count, 2)
+        emitted_users = set()
+        for args, kwargs in MockXQueue.return_value.add_cert.call_args_list:
+            emitted_users.add(args[0].username)
+            self.assertEqual(kwargs.get('forced_grade'), 'Aprobado')
+        self.assertEqual(emitted_users, {'student1', 'student2'})
+
+    def test_emit_course_certificates_error(self):
+        with patch('redfid_edx_api.views.XQueueCertInterface') as MockXQueue:
+            MockXQueue.return_value.add_cert.side_effect = Exception('boom')
+            response = self._post('emit_course_certificates', {
+                'usernames': ['student1'], 'course_id': str(self.course1.id),
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [
+            {'username': 'student1', 'status': 'error', 'reason': 'Error emitting certificate'},
+        ])
+
+    def test_emit_certificate_course_cache(self):
+        store = modulestore()
+        payload = {'username': 'student1', 'course_id': str(self.course1.id)}
+        with patch('redfid_edx_api.views.XQueueCertInterface'), \
+                patch.object(store, 'get_course', wraps=store.get_course) as mock_get_course:
+            self._post('emit_user_certificate', payload)
+            self._post('emit_course_certificates', {'usernames': ['student1'], 'course_id': str(self.course1.id)})
+            self.assertEqual(mock_get_course.call_count, 1)
+
+            course_cache.invalidate(self.course1.id)
+            self._post('emit_user_certificate', payload)
+            self.assertEqual(mock_get_course.call_count, 2)
+
+            with override_settings(REDFID_EDX_API_COURSE_CACHE_TTL=0):
+                self._post('emit_user_certificate', payload)
+                self._post('emit_user_certificate', payload)
+            self.assertEqual(mock_get_course.call_count, 4)
+
+    def test_course_cache_is_per_thread(self):
+        course = course_cache.get_course(self.course1.id)
+        self.assertIs(course_cache.get_course(self.course1.id), course)
+        other = []
+        thread = threading.Thread(target=lambda: other.append(course_cache.get_course(self.course1.id)))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], course)
+
+    def test_queue_certificate_validation(self):
+        response = self._post_raw('queue_user_certificate', 'not-json')
+        self.assertEqual(response.content, b'Invalid JSON data')
+        response = self._post('queue_user_certificate', {'username': 'student1', 'course_id': str(self.course1.id)})
+        self.assertEqual(response.content, b'Missing idempotency_key')
+        response = self._post('queue_user_certificate', {'idempotency_key': 'k', 'course_id': str(self.course1.id)})
+        self.assertEqual(response.content, b'Missing username')
+        response = self._post('queue_user_certificate', {'idempotency_key': 'k', 'username': 'student1'})
+        self.assertEqual(response.content, b'Missing course_id')
+        response = self._post('queue_user_certificate', {'idempotency_key': 'k', 'username': 'student1', 'course_id': 'bad!!'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.content, b'Invalid course_id')
+
+    def test_queue_certificate_is_idempotent(self):
+        payload = {'idempotency_key': 'emit-1', 'username': 'student1', 'course_id': str(self.course1.id)}
+        with patch('django.db.transaction.on_commit', side_effect=lambda func: func()), \
+                patch('redfid_edx_api.tasks.XQueueCertInterface') as MockXQueue:
+            response = self._post('queue_user_certificate', payload)
+            self.assertEqual(response.status_code, 200)
+            job_id = response.json()['job_id']
+            retry = self._post('queue_user_certificate', payload)
+        self.assertEqual(retry.json(), {'job_id': job_id, 'status': 'succeeded'})
+        MockXQueue.return_value.add_cert.assert_called_once()
+        _, kwargs = MockXQueue.return_value.add_cert.call_args
+        self.assertEqual(kwargs.get('forced_grade'), 'Aprobado')
+
+        response = self._post('get_certificate_emission_job', {'job_id': job_id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'job_id': job_id, 'username': 'student1', 'course_id': str(self.course1.id),
+            'status': 'succeeded', 'error': '',
+        })
+
+        response = self._post('queue_user_certificate', dict(payload, username='student2'))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.content, b'Idempotency key already used')
+
+    def test_queue_certificate_header_key_and_failure(self):
+        with patch('django.db.transaction.on_commit', side_effect=lambda func: func()):
+            response = self.auth_client.post(
+                reverse('redfid_edx_api:queue_user_certificate'),
+                content_type='application/json',
+                data=json.dumps({'username': 'ghost', 'course_id': str(self.course1.id)}),
+                HTTP_IDEMPOTENCY_KEY='emit-2',
+            )
+        self.assertEqual(response.status_code, 200)
+        job = CertificateEmissionJob.objects.get(idempotency_key='emit-2')
+        self.assertEqual(job.status, CertificateEmissionJob.FAILED)
+        self.assertEqual(job.error, 'User not found')
+
+    def test_queue_certificate_reenqueues_stuck_jobs(self):
+        payload = {'idempotency_key': 'emit-3', 'username': 'student1', 'course_id': str(self.course1.id)}
+        # The broker is down: the job is created but never enqueued.
+        with patch('redfid_edx_api.tasks.emit_certificate_job.delay', side_effect=Exception('broker down')), \
+                patch('django.db.transaction.on_commit', side_effect=lambda func: func()):
+            with self.assertRaises(Exception):
+                self._post('queue_user_certificate', payload)
+        job = CertificateEmissionJob.objects.get(idempotency_key='emit-3')
+        self.assertEqual(job.status, CertificateEmissionJob.PENDING)
+        with patch('django.db.transaction.on_commit', side_effect=lambda func: func()), \
+                patch('redfid_edx_api.tasks.XQueueCertInterface') as MockXQueue:
+            self.assertEqual(self._post('queue_user_certificate', payload).json()['status'], 'pending')
+            MockXQueue.return_value.add_cert.assert_called_once()
+
+            # A worker died after claiming the job: it is re-enqueued only once it is stale.
+            CertificateEmissionJob.objects.filter(id=job.id).update(status=CertificateEmissionJob.RUNNING)
+            self._post('queue_user_certificate', payload)
+            MockXQueue.return_value.add_cert.assert_called_once()
+            with override_settings(REDFID_EDX_API_CERTIFICATE_JOB_TIMEOUT=-1):
+                self._post('queue_user_certificate', payload)
+            self.assertEqual(MockXQueue.return_value.add_cert.call_count, 2)
+        self.assertEqual(CertificateEmissionJob.objects.get(id=job.id).status, CertificateEmissionJob.SUCCEEDED)
+
+    def test_get_certificate_emission_job_not_found(self):
+        response = self._post('get_certificate_emission_job', {})
+        self.assertEqual(response.content, b'Missing job_id')
+        response = self._post('get_certificate_emission_job', {'job_id': 'not-a-uuid'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.content, b'Job not found')
+
     def test_revoke_certificate_invalid_json(self):
         response = self._post_raw('revoke_user_certificate', 'not-json')
         self.assertEqual(response.status_code, 400)
@@ -878,6 +1232,43 @@ class TestRedfidEdxApi(ModuleStoreTestCase):
         self.assertFalse(GeneratedCertificate.objects.filter(
             user=self.student1, course_id=self.course1.id).exists())
 
+    def test_revoke_course_certificates_validation(self):
+        response = self._post_raw('revoke_course_certificates', 'not-json')
+        self.assertEqual(response.content, b'Invalid JSON data')
+        response = self._post('revoke_course_certificates', {'course_id': str(self.course1.id)})
+        self.assertEqual(response.content, b'Missing usernames')
+        response = self._post('revoke_course_certificates', {'usernames': 'student1', 'course_id': str(self.course1.id)})
+        self.assertEqual(response.content, b'Invalid usernames')
+        response = self._post('revoke_course_certificates', {'usernames': 'all'})
+        self.assertEqual(response.content, b'Missing course_id')
+        response = self._post('revoke_course_certificates', {'usernames': 'all', 'course_id': 'bad!!'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.content, b'Invalid course_id')
+
+    def test_revoke_course_certificates_usernames(self):
+        GeneratedCertificate.objects.create(user=self.student1, course_id=self.course1.id, verify_uuid='uuid-4', key='key-4')
+        GeneratedCertificate.objects.create(user=self.student1, course_id=self.course2.id, verify_uuid='uuid-5', key='key-5')
+        response = self._post('revoke_course_certificates', {
+            'usernames': ['student1', 'student2', 'ghost'], 'course_id': str(self.course1.id),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'course_id': str(self.course1.id), 'revoked': ['student1'], 'absent': ['student2', 'ghost'],
+        })
+        self.assertFalse(GeneratedCertificate.objects.filter(course_id=self.course1.id).exists())
+        self.assertTrue(GeneratedCertificate.objects.filter(course_id=self.course2.id).exists())
+
+    def test_revoke_course_certificates_all(self):
+        GeneratedCertificate.objects.create(user=self.student1, course_id=self.course1.id, verify_uuid='uuid-6', key='key-6')
+        GeneratedCertificate.objects.create(user=self.student2, course_id=self.course1.id, verify_uuid='uuid-7', key='key-7')
+        GeneratedCertificate.objects.create(user=self.student1, course_id=self.course2.id, verify_uuid='uuid-8', key='key-8')
+        response = self._post('revoke_course_certificates', {'usernames': 'all', 'course_id': str(self.course1.id)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(response.json()['revoked']), ['student1', 'student2'])
+        self.assertEqual(response.json()['absent'], [])
+        self.assertFalse(GeneratedCertificate.objects.filter(course_id=self.course1.id).exists())
+        self.assertEqual(GeneratedCertificate.objects.filter(course_id=self.course2.id).count(), 1)
+
     # ------------------------------------------------------------------
     # GetXBlockUserData / GetXBlockCourseData
     # ------------------------------------------------------------------
@@ -1015,6 +1406,337 @@ class TestRedfidEdxApi(ModuleStoreTestCase):
         self.assertEqual(data[0]['answers'][0]['answer'], {'a': '1'})
         self.assertEqual(data[1]['answers'], [])
 
+    def test_get_xblock_course_data_keeps_requested_order(self):
+        self._make_student_module(
+            self.student1, self.course1.id, 'problem', 'p1', {'student_answers': {'a': '1'}},
+        )
+        self._make_student_module(
+            self.student2, self.course1.id, 'problem', 'p2', {'student_answers': {'a': '2'}},
+        )
+        response = self._post('get_xblock_course_data', {
+            'id_xblock': ['p2', 'p3', 'p1', 'p2'], 'course_id': str(self.course1.id), 'xblock_type': 'problem',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(block['id_xblock'], [answer['username'] for answer in block['answers']]) for block in response.json()],
+            [('p2', ['student2']), ('p3', []), ('p1', ['student1']), ('p2', ['student2'])],
+        )
+
+    def test_iter_groups_in_order(self):
+        groups = [('a', iter([1, 2])), ('b', iter([3])), ('d', iter([4]))]
+        self.assertEqual(
+            list(iter_groups_in_order(['d', 'c', 'a', 'd', 'b'], iter(groups))),
+            [('d', [4]), ('c', []), ('a', [1, 2]), ('d', [4]), ('b', [3])],
+        )
+
+    def test_get_xblock_course_data_all_blocks(self):
+        self._make_student_module(
+            self.student1, self.course1.id, 'problem', 'p1', {'student_answers': {'a': '1'}},
+        )
+        self._make_student_module(
+            self.student2, self.course1.id, 'problem', 'p1', {'student_answers': {'a': '3'}},
+        )
+        self._make_student_module(
+            self.student1, self.course1.id, 'problem', 'p2', {'student_answers': {'a': '2'}},
+        )
+        # Different type and different course must not be picked up.
+        self._make_student_module(
+            self.student1, self.course1.id, 'freetextresponse', 'ftr1', {'student_answer': 'x'},
+        )
+        self._make_student_module(
+            self.student1, self.course2.id, 'problem', 'p9', {'student_answers': {'a': '9'}},
+        )
+        response = self._post('get_xblock_course_data', {
+            'id_xblock': '*', 'course_id': str(self.course1.id), 'xblock_type': 'problem',
+        })
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([block['id_xblock'] for block in data], ['p1', 'p2'])
+        self.assertEqual(
+            sorted(a['username'] for a in data[0]['answers']), ['student1', 'student2'],
+        )
+        self.assertEqual(data[1]['answers'], [{'username': 'student1', 'answer': {'a': '2'}}])
+
+    def test_get_xblock_course_data_all_blocks_empty(self):
+        response = self._post('get_xblock_course_data', {
+            'id_xblock': '*', 'course_id': str(self.course1.id), 'xblock_type': 'freetextresponse',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [])
+
+    # ------------------------------------------------------------------
+    # XBlockAnswerSnapshot
+    # ------------------------------------------------------------------
+
+    @override_settings(REDFID_EDX_API_USE_ANSWER_SNAPSHOTS=True)
+    def test_answer_snapshot_follows_student_module(self):
+        module = self._make_student_module(
+            self.student1, self.course1.id, 'problem', 'p1', {'student_answers': {'a': '1'}},
+        )
+        snapshot = XBlockAnswerSnapshot.objects.get(user_id=self.student1.id, block_key=module.module_state_key)
+        self.assertEqual(snapshot.username, 'student1')
+        self.assertEqual(snapshot.xblock_type, 'problem')
+        self.assertEqual(json.loads(snapshot.answer), {'a': '1'})
+
+        module.state = json.dumps({'student_answers': {'a': '2'}})
+        module.save()
+        snapshot.refresh_from_db()
+        self.assertEqual(json.loads(snapshot.answer), {'a': '2'})
+
+        self.student1.username = 'student1-renamed'
+        self.student1.save()
+        snapshot.refresh_from_db()
+        self.assertEqual(snapshot.username, 'student1-renamed')
+
+        module.delete()
+        self.assertFalse(XBlockAnswerSnapshot.objects.filter(id=snapshot.id).exists())
+
+    @override_settings(REDFID_EDX_API_USE_ANSWER_SNAPSHOTS=True)
+    def test_answer_snapshot_skips_unrelated_saves(self):
+        module = self._make_student_module(
+            self.student1, self.course1.id, 'problem', 'p1', {'student_answers': {'a': '1'}},
+        )
+        module = StudentModule.objects.get(id=module.id)
+        module.state = json.dumps({'student_answers': {'a': '2'}})
+        with CaptureQueriesContext(connection) as queries:
+            module.save(update_fields=['modified'])
+        self.assertFalse([query for query in queries if 'xblockanswersnapshot' in query['sql'].lower()])
+
+        # A state save is a single UPDATE of the snapshot, without loading the student.
+        resolve_username(self.student1.id)
+        with CaptureQueriesContext(connection) as queries:
+            module.save()
+        snapshot_queries = [query['sql'] for query in queries if 'xblockanswersnapshot' in query['sql'].lower()]
+        self.assertEqual(len(snapshot_queries), 1)
+        self.assertTrue(snapshot_queries[0].startswith('UPDATE'))
+        self.assertFalse([query for query in queries if 'FROM "auth_user"' in query['sql']])
+        snapshot = XBlockAnswerSnapshot.objects.get(user_id=self.student1.id, block_key=module.module_state_key)
+        self.assertEqual(json.loads(snapshot.answer), {'a': '2'})
+
+        with CaptureQueriesContext(connection) as queries:
+            self.student1.save(update_fields=['last_login'])
+        self.assertFalse([query for query in queries if 'xblockanswersnapshot' in query['sql'].lower()])
+
+    def test_answer_snapshot_disabled(self):
+        with CaptureQueriesContext(connection) as queries:
+            module = self._make_student_module(
+                self.student1, self.course1.id, 'problem', 'p1', {'student_answers': {'a': '1'}},
+            )
+            module.delete()
+        self.assertFalse([query for query in queries if 'xblockanswersnapshot' in query['sql'].lower()])
+
+    def test_answer_snapshot_backfill_command(self):
+        self._make_student_module(
+            self.student1, self.course1.id, 'freetextresponse', 'ftr1', {'student_answer': 'hello'},
+        )
+        self._make_student_module(
+            self.student1, self.course1.id, 'problem', 'p1', {'student_answers': {'a': '1'}},
+        )
+        XBlockAnswerSnapshot.objects.all().delete()
+        XBlockAnswerSnapshot.objects.create(
+            course_id=self.course1.id,
+            block_key=StudentModule.objects.get(module_type='problem').module_state_key,
+            xblock_type='problem', user_id=self.student1.id, username='stale', answer='null',
+            modified=StudentModule.objects.get(module_type='problem').modified,
+        )
+        call_command('backfill_xblock_answer_snapshots', '--course-id', str(self.course1.id), '--batch-size', '1')
+        self.assertEqual(XBlockAnswerSnapshot.objects.count(), 2)
+        answers = {s.xblock_type: (s.username, json.loads(s.answer)) for s in XBlockAnswerSnapshot.objects.all()}
+        self.assertEqual(answers['freetextresponse'], ('student1', 'hello'))
+        self.assertEqual(answers['problem'], ('student1', {'a': '1'}))
+
+    @override_settings(REDFID_EDX_API_USE_ANSWER_SNAPSHOTS=True)
+    def test_get_xblock_user_data_from_snapshots(self):
+        self._make_student_module(
+            self.student1, self.course1.id, 'problem', 'p1', {'student_answers': {'a': '1'}},
+        )
+        response = self._post('get_xblock_user_data', {
+            'username': 'student1', 'id_xblock': ['p1', 'p2'], 'course_id': str(self.course1.id),
+            'xblock_type': 'problem',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [{'answer': {'a': '1'}}, {'answer': None}])
+
+        response = self._post('get_xblock_user_data', {
+            'username': 'student1', 'id_xblock': 'p1', 'course_id': str(self.course1.id),
+            'xblock_type': 'problem',
+        })
+        self.assertEqual(response.json(), {'answer': {'a': '1'}})
+
+    @override_settings(REDFID_EDX_API_USE_ANSWER_SNAPSHOTS=True)
+    def test_get_xblock_course_data_from_snapshots(self):
+        self._make_student_module(
+            self.student1, self.course1.id, 'problem', 'p1', {'student_answers': {'a': '1'}},
+        )
+        self._make_student_module(
+            self.student2, self.course1.id, 'problem', 'p2', {'student_answers': {'a': '2'}},
+        )
+        response = self._post('get_xblock_course_data', {
+            'id_xblock': ['p2', 'p3'], 'course_id': str(self.course1.id), 'xblock_type': 'problem',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [
+            {'id_xblock': 'p2', 'answers': [{'username': 'student2', 'answer': {'a': '2'}}]},
+            {'id_xblock': 'p3', 'answers': []},
+        ])
+
+        response = self._post('get_xblock_course_data', {
+            'id_xblock': '*', 'course_id': str(self.course1.id), 'xblock_type': 'problem',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [
+            {'id_xblock': 'p1', 'answers': [{'username': 'student1', 'answer': {'a': '1'}}]},
+            {'id_xblock': 'p2', 'answers': [{'username': 'student2', 'answer': {'a': '2'}}]},
+        ])
+
+    # ------------------------------------------------------------------
+    # Streaming list responses (?stream=1 / Accept: application/x-ndjson)
+    # ------------------------------------------------------------------
+
+    @override_settings(REDFID_EDX_API_STREAM_CHUNK_SIZE=10)
+    def test_get_users_stream_json(self):
+        expected = self.auth_client.get(reverse('redfid_edx_api:get_users')).json()
+        response = self.auth_client.get(reverse('redfid_edx_api:get_users') + '?stream=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        chunks = list(response.streaming_content)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(json.loads(b''.join(chunks)), expected)
+
+    def test_get_course_certificates_stream_ndjson(self):
+        GeneratedCertificate.objects.create(user=self.student1, course_id=self.course1.id, verify_uuid='uuid-n1', key='key-n1')
+        GeneratedCertificate.objects.create(user=self.student2, course_id=self.course1.id, verify_uuid='uuid-n2', key='key-n2')
+        response = self.auth_client.post(
+            reverse('redfid_edx_api:get_course_certificates'),
+            content_type='application/json',
+            data=json.dumps({'course_id': str(self.course1.id)}),
+            HTTP_ACCEPT='application/x-ndjson',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line)['username'] for line in lines], ['student1', 'student2'])
+
+    def test_get_xblock_course_data_stream_gzip(self):
+        self._make_student_module(
+            self.student1, self.course1.id, 'problem', 'p1', {'student_answers': {'a': '1'}},
+        )
+        response = self.auth_client.post(
+            reverse('redfid_edx_api:get_xblock_course_data') + '?stream=1',
+            content_type='application/json',
+            data=json.dumps({'id_xblock': '*', 'course_id': str(self.course1.id), 'xblock_type': 'problem'}),
+            HTTP_ACCEPT_ENCODING='gzip',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        data = json.loads(gzip.decompress(b''.join(response.streaming_content)))
+        self.assertEqual(data, [{'id_xblock': 'p1', 'answers': [{'username': 'student1', 'answer': {'a': '1'}}]}])
+
+    def test_stream_empty_list(self):
+        response = self.auth_client.post(
+            reverse('redfid_edx_api:get_user_certificates') + '?stream=1',
+            content_type='application/json',
+            data=json.dumps({'username': 'student1'}),
+        )
+        self.assertEqual(b''.join(response.streaming_content), b'[]')
+
+    # ------------------------------------------------------------------
+    # User cache
+    # ------------------------------------------------------------------
+
+    def test_user_cache_resolve_many(self):
+        with self.assertNumQueries(1):
+            user_ids = user_cache.resolve_many_user_ids(['student1', 'student2', 'missing'])
+        self.assertEqual(user_ids, {'student1': self.student1.id, 'student2': self.student2.id})
+        with self.assertNumQueries(0):
+            usernames = user_cache.resolve_many_usernames([self.student1.id, self.student2.id])
+        self.assertEqual(usernames, {self.student1.id: 'student1', self.student2.id: 'student2'})
+
+    def test_user_cache_invalidated_on_username_change_and_delete(self):
+        self.assertEqual(resolve_user_id('student1'), self.student1.id)
+        self.student1.username = 'renamed'
+        self.student1.save()
+        self.assertIsNone(resolve_user_id('student1'))
+        self.assertEqual(resolve_username(self.student1.id), 'renamed')
+        user_id = self.student1.id
+        self.student1.delete()
+        self.assertIsNone(resolve_username(user_id))
+
+    def test_user_cache_invalidated_from_other_process(self):
+        caches['default'].clear()
+        self.assertEqual(resolve_user_id('student1'), self.student1.id)
+        # A login only saves last_login, which does not change the username <-> user_id mapping.
+        self.student1.save(update_fields=['last_login'])
+        self.assertIsNone(caches['default'].get(USER_CACHE_VERSION_KEY))
+        # Neither do registrations nor full saves that keep the username.
+        UserFactory(username='newcomer')
+        self.student1.first_name = 'Changed'
+        self.student1.save()
+        self.assertIsNone(caches['default'].get(USER_CACHE_VERSION_KEY))
+        # Another process renames the user: the row changes without signals in this process, and only the
+        # shared version is bumped.
+        User.objects.filter(id=self.student1.id).update(username='renamed')
+        caches['default'].set(USER_CACHE_VERSION_KEY, 1, None)
+        self.assertIsNone(resolve_user_id('student1'))
+        self.assertEqual(resolve_username(self.student1.id), 'renamed')
+
+    @override_settings(REDFID_EDX_API_USER_CACHE_SHARED=True)
+    def test_user_cache_shared_tier(self):
+        caches['default'].clear()
+        self.assertEqual(resolve_user_id('student1'), self.student1.id)
+        user_cache.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_username(self.student1.id), 'student1')
+
+    # ------------------------------------------------------------------
+    # Response cache
+    # ------------------------------------------------------------------
+
+    @override_settings(REDFID_EDX_API_RESPONSE_CACHE_ENABLED=True)
+    def test_course_certificates_response_cache(self):
+        caches['default'].clear()
+        GeneratedCertificate.objects.create(user=self.student1, course_id=self.course1.id, verify_uuid='uuid-c1', key='key-c1')
+        payload = {'course_id': str(self.course1.id)}
+        first = self._post('get_course_certificates', payload)
+        with CaptureQueriesContext(connection) as queries:
+            second = self._post('get_course_certificates', payload)
+        self.assertEqual(second.json(), first.json())
+        self.assertFalse([q for q in queries.captured_queries if 'certificates_generatedcertificate' in q['sql']])
+        # The body is normalized: whitespace does not change the cache key.
+        with CaptureQueriesContext(connection) as queries:
+            self._post_raw('get_course_certificates', '{ "course_id" :  "%s" }' % self.course1.id)
+        self.assertFalse([q for q in queries.captured_queries if 'certificates_generatedcertificate' in q['sql']])
+        GeneratedCertificate.objects.create(user=self.student2, course_id=self.course1.id, verify_uuid='uuid-c2', key='key-c2')
+        third = self._post('get_course_certificates', payload)
+        self.assertEqual([c['username'] for c in third.json()], ['student1', 'student2'])
+
+    @override_settings(REDFID_EDX_API_RESPONSE_CACHE_ENABLED=True)
+    def test_response_cache_invalidated_by_renames_and_enrollments(self):
+        caches['default'].clear()
+        GeneratedCertificate.objects.create(user=self.student1, course_id=self.course1.id, verify_uuid='uuid-r1', key='key-r1')
+        payload = {'course_id': str(self.course1.id)}
+        self.assertEqual([c['username'] for c in self._post('get_course_certificates', payload).json()], ['student1'])
+        self.student1.username = 'student1renamed'
+        self.student1.save(update_fields=['username'])
+        self.assertEqual(
+            [c['username'] for c in self._post('get_course_certificates', payload).json()], ['student1renamed'],
+        )
+        version_key = RESPONSE_CACHE_VERSION_KEY.format(str(self.course2.id))
+        version = caches['default'].get(version_key, 0)
+        CourseEnrollmentFactory(user=self.student2, course_id=self.course2.id)
+        self.assertGreater(caches['default'].get(version_key, 0), version)
+
+    @override_settings(REDFID_EDX_API_RESPONSE_CACHE_ENABLED=True)
+    def test_xblock_course_data_response_cache(self):
+        caches['default'].clear()
+        payload = {'id_xblock': '*', 'course_id': str(self.course1.id), 'xblock_type': 'problem'}
+        self.assertEqual(self._post('get_xblock_course_data', payload).json(), [])
+        self._make_student_module(
+            self.student1, self.course1.id, 'problem', 'p1', {'student_answers': {'a': '1'}},
+        )
+        data = self._post('get_xblock_course_data', payload).json()
+        self.assertEqual(data, [{'id_xblock': 'p1', 'answers': [{'username': 'student1', 'answer': {'a': '1'}}]}])
+
     # ------------------------------------------------------------------
     # EnrollUserIntoCourse / UnenrollUserFromCourse
     # ------------------------------------------------------------------
@@ -1062,6 +1784,45 @@ class TestRedfidEdxApi(ModuleStoreTestCase):
         self.assertEqual(response.status_code, 400)
         self.assertEqual(response.content, b'Error enrolling user in course')
 
+    def test_enroll_users_validation(self):
+        response = self._post_raw('enroll_users_into_course', 'not-json')
+        self.assertEqual(response.content, b'Invalid JSON data')
+        response = self._post('enroll_users_into_course', {'course_id': str(self.course2.id)})
+        self.assertEqual(response.content, b'Missing usernames')
+        response = self._post('enroll_users_into_course', {'usernames': 'student1', 'course_id': str(self.course2.id)})
+        self.assertEqual(response.content, b'Invalid usernames')
+        response = self._post('enroll_users_into_course', {'usernames': ['student1']})
+        self.assertEqual(response.content, b'Missing course_id')
+        response = self._post('enroll_users_into_course', {'usernames': ['student1'], 'course_id': 'bad!!'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.content, b'Invalid course_id')
+
+    def test_enroll_users_success(self):
+        response = self._post('enroll_users_into_course', {
+            'usernames': ['student1', 'ghost', 'student2', 'student1'], 'course_id': str(self.course2.id),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'course_id': str(self.course2.id),
+            'results': [
+                {'username': 'student1', 'status': 'enrolled'},
+                {'username': 'ghost', 'status': 'error', 'reason': 'User not found'},
+                {'username': 'student2', 'status': 'enrolled'},
+            ],
+        })
+        self.assertTrue(CourseEnrollment.is_enrolled(self.student1, self.course2.id))
+        self.assertTrue(CourseEnrollment.is_enrolled(self.student2, self.course2.id))
+
+    def test_enroll_users_error(self):
+        with patch('lms.djangoapps.instructor.enrollment.enroll_email', side_effect=Exception('boom')):
+            response = self._post('enroll_users_into_course', {
+                'usernames': ['student2'], 'course_id': str(self.course2.id),
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [
+            {'username': 'student2', 'status': 'error', 'reason': 'Error enrolling user in course'},
+        ])
+
     def test_unenroll_invalid_json(self):
         response = self._post_raw('unenroll_user_from_course', 'not-json')
         self.assertEqual(response.status_code, 400)
@@ -1105,3 +1866,728 @@ class TestRedfidEdxApi(ModuleStoreTestCase):
             })
         self.assertEqual(response.status_code, 400)
         self.assertEqual(response.content, b'Error unenrolling user from course')
+
+    def test_unenroll_users_validation(self):
+        response = self._post_raw('unenroll_users_from_course', 'not-json')
+        self.assertEqual(response.content, b'Invalid JSON data')
+        response = self._post('unenroll_users_from_course', {'course_id': str(self.course1.id)})
+        self.assertEqual(response.content, b'Missing usernames')
+        response = self._post('unenroll_users_from_course', {'usernames': [1], 'course_id': str(self.course1.id)})
+        self.assertEqual(response.content, b'Invalid usernames')
+        response = self._post('unenroll_users_from_course', {'usernames': ['student1']})
+        self.assertEqual(response.content, b'Missing course_id')
+        response = self._post('unenroll_users_from_course', {'usernames': ['student1'], 'course_id': 'bad!!'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.content, b'Invalid course_id')
+
+    def test_unenroll_users_success(self):
+        CourseEnrollmentFactory(user=self.student2, course_id=self.course1.id)
+        response = self._post('unenroll_users_from_course', {
+            'usernames': ['student1', 'student2', 'ghost'], 'course_id': str(self.course1.id),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [
+            {'username': 'student1', 'status': 'unenrolled'},
+            {'username': 'student2', 'status': 'unenrolled'},
+            {'username': 'ghost', 'status': 'error', 'reason': 'User not found'},
+        ])
+        self.assertFalse(CourseEnrollment.is_enrolled(self.student1, self.course1.id))
+        self.assertFalse(CourseEnrollment.is_enrolled(self.student2, self.course1.id))
+
+    def test_unenroll_users_error(self):
+        with patch('lms.djangoapps.instructor.enrollment.unenroll_email', side_effect=Exception('boom')):
+            response = self._post('unenroll_users_from_course', {
+                'usernames': ['student1'], 'course_id': str(self.course1.id),
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [
+            {'username': 'student1', 'status': 'error', 'reason': 'Error unenrolling user from course'},
+        ])
+        self.assertTrue(CourseEnrollment.is_enrolled(self.student1, self.course1.id))
+
+    def test_sync_course_roster_validation(self):
+        response = self._post_raw('sync_course_roster', 'not-json')
+        self.assertEqual(response.content, b'Invalid JSON data')
+        response = self._post('sync_course_roster', {'course_id': str(self.course1.id)})
+        self.assertEqual(response.content, b'Missing usernames')
+        response = self._post('sync_course_roster', {'usernames': 'student1', 'course_id': str(self.course1.id)})
+        self.assertEqual(response.content, b'Invalid usernames')
+        response = self._post('sync_course_roster', {'usernames': []})
+        self.assertEqual(response.content, b'Missing course_id')
+        response = self._post('sync_course_roster', {'usernames': [], 'course_id': 'bad!!'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.content, b'Invalid course_id')
+
+    def test_sync_course_roster_success(self):
+        student3 = UserFactory(username='student3', password='12345', email='student3@edx.org')
+        CourseEnrollmentFactory(user=student3, course_id=self.course1.id)
+        response = self._post('sync_course_roster', {
+            'usernames': ['student1', 'student2', 'ghost'], 'course_id': str(self.course1.id),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'course_id': str(self.course1.id),
+            'enrolled': ['student2'],
+            'unenrolled': ['student3'],
+            'unchanged': 1,
+            'errors': [{'username': 'ghost', 'status': 'error', 'reason': 'User not found'}],
+        })
+        self.assertTrue(CourseEnrollment.is_enrolled(self.student1, self.course1.id))
+        self.assertTrue(CourseEnrollment.is_enrolled(self.student2, self.course1.id))
+        self.assertFalse(CourseEnrollment.is_enrolled(student3, self.course1.id))
+
+    def test_sync_course_roster_no_changes(self):
+        with patch('lms.djangoapps.instructor.enrollment.enroll_email') as mock_enroll, \
+                patch('lms.djangoapps.instructor.enrollment.unenroll_email') as mock_unenroll:
+            response = self._post('sync_course_roster', {
+                'usernames': ['student1'], 'course_id': str(self.course1.id),
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['unchanged'], 1)
+        mock_enroll.assert_not_called()
+        mock_unenroll.assert_not_called()
+
+    def test_load_test_command(self):
+        out = StringIO()
+        call_command(
+            'load_test_panel_endpoints', '--course-id', str(self.course1.id), '--users', '5', '--blocks', '4',
+            '--answer-rate', '1', '--requests', '12', '--concurrency', '1', '--host', 'testserver',
+            '--mix', 'get_user_certificates=1,get_xblock_course_data=1,edit_user=1', '--allow-destructive',
+            '--output', os.devnull, stdout=out,
+        )
+        self.assertEqual(User.objects.filter(username__startswith='loadtest_').count(), 5)
+        self.assertEqual(UserProfile.objects.filter(user__username__startswith='loadtest_').count(), 5)
+        self.assertEqual(UserSocialAuth.objects.filter(provider='redfid', user__username__startswith='loadtest_').count(), 5)
+        self.assertEqual(CourseEnrollment.objects.filter(course_id=self.course1.id, user__username__startswith='loadtest_').count(), 5)
+        self.assertEqual(StudentModule.objects.filter(student__username__startswith='loadtest_').count(), 20)
+        # The user that authenticates the requests is removed when the run finishes.
+        self.assertFalse(User.objects.filter(username__startswith='loadtest_client_').exists())
+        report = out.getvalue()
+        self.assertIn('concurrency=1 requests=12', report)
+        for line in report.splitlines():
+            if line.strip().startswith(('get_', 'edit_user', '*')):
+                self.assertEqual(line.split()[2], '0', line)
+
+    def test_load_test_command_requires_allow_destructive(self):
+        with self.assertRaises(CommandError):
+            call_command(
+                'load_test_panel_endpoints', '--course-id', str(self.course1.id), '--skip-seed',
+                '--mix', 'get_user_certificates=1,sync_course_roster=1', stdout=StringIO(),
+            )
+
+    # ------------------------------------------------------------------
+    # Query guard
+    # ------------------------------------------------------------------
+
+    @override_settings(REDFID_EDX_API_QUERY_BUDGETS={'get_user_certificates': 0}, REDFID_EDX_API_QUERY_GUARD_SAMPLE_RATE=0)
+    def test_query_budget_exceeded_logs_fingerprints(self):
+        # Fingerprints and call sites are logged even when the request was not sampled.
+        GeneratedCertificate.objects.create(user=self.student1, course_id=self.course1.id, verify_uuid='uuid-q1', key='key-q1')
+        with self.assertLogs('redfid_edx_api.query_guard', level='WARNING') as logs:
+            response = self._post('get_user_certificates', {'username': 'student1'})
+        self.assertEqual(response.status_code, 200)
+        output = '\n'.join(logs.output)
+        self.assertIn('query budget exceeded in get_user_certificates', output)
+        self.assertIn('certificates_generatedcertificate', output)
+        self.assertIn('in iter_certificates', output)
+
+    @override_settings(REDFID_EDX_API_QUERY_BUDGETS={'get_users': 0}, REDFID_EDX_API_QUERY_GUARD_STRICT=True)
+    def test_query_budget_strict_mode(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.auth_client.get(reverse('redfid_edx_api:get_users'))
+
+    def test_query_budget_strict_mode_rolls_back_writes(self):
+        payload = {
+            'user_id': 'redfid-uuid-budget', 'username': 'budgetuser', 'password': 'pw12345', 'email': 'budget@example.com',
+            'first_name': 'Budget', 'last_name': 'User', 'is_staff': False, 'is_superuser': False,
+        }
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self._post('create_user', payload).status_code, 200)
+        user_insert = next(
+            index for index, query in enumerate(queries.captured_queries) if query['sql'].startswith(('INSERT INTO "auth_user" ', 'INSERT INTO `auth_user` '))
+        )
+        User.objects.filter(username='budgetuser').delete()
+        # The budget allows the User INSERT; the next query raises inside the view's transaction.
+        with override_settings(
+            REDFID_EDX_API_QUERY_BUDGETS={'create_user': user_insert + 1}, REDFID_EDX_API_QUERY_GUARD_STRICT=True,
+        ):
+            with self.assertRaises(QueryBudgetExceeded):
+                self._post('create_user', payload)
+        self.assertFalse(User.objects.filter(username='budgetuser').exists())
+
+    def test_query_budget_strict_mode_bulk_endpoints(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self._post('enroll_users_into_course', {'usernames': ['student2'], 'course_id': str(self.course2.id)})
+        self.assertEqual(response.json()['results'], [{'username': 'student2', 'status': 'enrolled'}])
+        # The overrun happens while enrolling, inside the per-user handler, and must fail the whole request.
+        budget = len(queries) // 2
+        payload = {'usernames': ['student1'], 'course_id': str(self.course2.id)}
+        with override_settings(
+            REDFID_EDX_API_QUERY_BUDGETS={'enroll_users_into_course': budget, 'batch': budget},
+            REDFID_EDX_API_QUERY_GUARD_STRICT=True,
+        ):
+            with self.assertRaises(QueryBudgetExceeded):
+                self._post('enroll_users_into_course', payload)
+            with self.assertRaises(QueryBudgetExceeded):
+                self._post('batch', {'operations': [{'endpoint': 'enroll_users_into_course', 'body': payload}]})
+        self.assertFalse(CourseEnrollment.is_enrolled(self.student1, self.course2.id))
+
+    @override_settings(REDFID_EDX_API_SLOW_QUERY_MS=0)
+    def test_slow_query_logged(self):
+        with self.assertLogs('redfid_edx_api.query_guard', level='WARNING') as logs:
+            self._post('get_user_certificates', {'username': 'student1'})
+        self.assertIn('slow query in get_user_certificates', '\n'.join(logs.output))
+
+    # ------------------------------------------------------------------
+    # Profiling
+    # ------------------------------------------------------------------
+
+    def test_profiling(self):
+        UserFactory(username='apisuper', password='12345', email='apisuper@edx.org', is_superuser=True)
+        super_client = Client()
+        super_client.login(username='apisuper', password='12345')
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            REDFID_EDX_API_PROFILING_ENABLED=True, REDFID_EDX_API_PROFILING_DIR=directory,
+        ):
+            # Staff users that are not superusers can't request profiles.
+            response = self.auth_client.get(reverse('redfid_edx_api:get_users'), HTTP_X_REDFID_PROFILE='1')
+            self.assertNotIn('X-Redfid-Profile-Id', response)
+            self.assertEqual(self.auth_client.get(reverse('redfid_edx_api:list_profiles')).status_code, 403)
+
+            response = super_client.post(
+                reverse('redfid_edx_api:change_user_password'),
+                content_type='application/json',
+                data=json.dumps({'username': 'student1', 'password': 'secret-password'}),
+                HTTP_X_REDFID_PROFILE='1',
+            )
+            profile_id = response['X-Redfid-Profile-Id']
+            profiles = super_client.get(reverse('redfid_edx_api:list_profiles')).json()
+            self.assertEqual([profile['profile_id'] for profile in profiles], [profile_id])
+            self.assertEqual(profiles[0]['endpoint'], 'change_user_password')
+            self.assertNotIn('secret-password', profiles[0]['parameters']['body'])
+
+            response = super_client.post(
+                reverse('redfid_edx_api:download_profile'),
+                content_type='application/json',
+                data=json.dumps({'profile_id': profile_id}),
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(b''.join(response.streaming_content))
+            response = super_client.post(
+                reverse('redfid_edx_api:download_profile'),
+                content_type='application/json',
+                data=json.dumps({'profile_id': '../' + profile_id}),
+            )
+            self.assertEqual(response.content, b'Profile not found')
+
+            # A tampered sidecar can't point the download outside the profiles directory.
+            with open(os.path.join(directory, profile_id + '.json')) as metadata_file:
+                metadata = json.load(metadata_file)
+            for filename in ('/etc/passwd', '../../etc/passwd'):
+                with open(os.path.join(directory, profile_id + '.json'), 'w') as metadata_file:
+                    json.dump(dict(metadata, filename=filename), metadata_file)
+                response = super_client.post(
+                    reverse('redfid_edx_api:download_profile'),
+                    content_type='application/json',
+                    data=json.dumps({'profile_id': profile_id}),
+                )
+                self.assertEqual(response.content, b'Profile not found')
+            with open(os.path.join(directory, profile_id + '.json'), 'w') as metadata_file:
+                json.dump(metadata, metadata_file)
+
+            with override_settings(REDFID_EDX_API_PROFILING_SAMPLE_RATE=1.0):
+                self._post('get_user_certificates', {'username': 'student1'})
+            self.assertEqual(len(super_client.get(reverse('redfid_edx_api:list_profiles')).json()), 2)
+
+            # Streaming responses are profiled until the content is fully generated.
+            response = super_client.get(reverse('redfid_edx_api:get_users') + '?stream=1', HTTP_X_REDFID_PROFILE='1')
+            profile_id = response['X-Redfid-Profile-Id']
+            self.assertIsNone(get_profile(profile_id))
+            self.assertTrue(b''.join(response.streaming_content))
+            self.assertEqual(get_profile(profile_id)['endpoint'], 'get_users')
+
+    def test_profiling_privileged_jwt(self):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION='JWT token')
+        request.user = AnonymousUser()
+        decoder = 'edx_rest_framework_extensions.auth.jwt.decoder.jwt_decode_handler'
+        with patch(decoder, return_value={'administrator': True}) as decode:
+            self.assertTrue(is_privileged(request))
+        decode.assert_called_once_with('token')
+        with patch(decoder, return_value={'administrator': False}):
+            self.assertFalse(is_privileged(request))
+        with patch(decoder, side_effect=Exception('invalid token')):
+            self.assertFalse(is_privileged(request))
+        # After DRF authentication, JwtAuthentication leaves the raw token in request.auth.
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        request.auth = 'token'
+        with patch(decoder, return_value={'administrator': True}):
+            self.assertTrue(is_privileged(request))
+
+    # ------------------------------------------------------------------
+    # Admission control
+    # ------------------------------------------------------------------
+
+    @override_settings(
+        REDFID_EDX_API_CONCURRENCY_LIMITS={'get_xblock_course_data': 1},
+        REDFID_EDX_API_CONCURRENCY_QUEUE_TIMEOUT=0,
+    )
+    def test_concurrency_limit(self):
+        payload = {'id_xblock': '*', 'course_id': str(self.course1.id), 'xblock_type': 'problem'}
+        release = admission.acquire('get_xblock_course_data')
+        response = self._post('get_xblock_course_data', payload)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        # Endpoints without a limit are not affected.
+        self.assertEqual(self._post('get_user_certificates', {'username': 'student1'}).status_code, 200)
+        release()
+        self.assertEqual(self._post('get_xblock_course_data', payload).status_code, 200)
+
+        # Streaming responses hold their slot until they are consumed.
+        response = self.auth_client.post(
+            reverse('redfid_edx_api:get_xblock_course_data') + '?stream=1',
+            content_type='application/json',
+            data=json.dumps(payload),
+        )
+        self.assertIsNone(admission.acquire('get_xblock_course_data'))
+        self.assertEqual(b''.join(response.streaming_content), b'[]')
+        release = admission.acquire('get_xblock_course_data')
+        self.assertIsNotNone(release)
+        release()
+
+    @override_settings(
+        REDFID_EDX_API_CONCURRENCY_LIMITS={},
+        REDFID_EDX_API_CLUSTER_CONCURRENCY_LIMITS={'get_xblock_course_data': 2},
+        REDFID_EDX_API_CONCURRENCY_QUEUE_TIMEOUT=0,
+    )
+    def test_cluster_concurrency_limit(self):
+        caches['default'].clear()
+        first = admission.acquire('get_xblock_course_data')
+        second = admission.acquire('get_xblock_course_data')
+        self.assertIsNone(admission.acquire('get_xblock_course_data'))
+        response = self._post('get_xblock_course_data', {
+            'id_xblock': '*', 'course_id': str(self.course1.id), 'xblock_type': 'problem',
+        })
+        self.assertEqual(response.status_code, 429)
+        first()
+        first()
+        self.assertEqual(caches['default'].get(admission.SLOTS_CACHE_KEY.format('get_xblock_course_data')), 1)
+        second()
+        self.assertEqual(caches['default'].get(admission.SLOTS_CACHE_KEY.format('get_xblock_course_data')), 0)
+
+    # ------------------------------------------------------------------
+    # Read replica
+    # ------------------------------------------------------------------
+
+    def test_read_replica_falls_back_to_primary(self):
+        with override_settings(REDFID_EDX_API_READ_REPLICA_ALIAS='missing'):
+            self.assertIsNone(db_routing.get_read_alias())
+            with patch('redfid_edx_api.db_routing.use_alias', wraps=db_routing.use_alias) as use_alias:
+                response = self._post('get_user_certificates', {'username': 'student1'})
+        self.assertEqual(response.status_code, 200)
+        use_alias.assert_not_called()
+
+    @override_settings(REDFID_EDX_API_READ_REPLICA_ALIAS='default')
+    def test_read_replica_routing(self):
+        router = db_routing.ReadReplicaRouter()
+        self.assertIsNone(router.db_for_read(User))
+        with db_routing.use_alias('default'):
+            self.assertEqual(router.db_for_read(User), 'default')
+            self.assertIsNone(router.db_for_write(User))
+            with db_routing.primary_only():
+                self.assertIsNone(router.db_for_read(User))
+        self.assertIsNone(router.db_for_read(User))
+
+        with patch('redfid_edx_api.db_routing.use_alias', wraps=db_routing.use_alias) as use_alias:
+            response = self._post('get_user_certificates', {'username': 'student1'})
+        self.assertEqual(response.status_code, 200)
+        use_alias.assert_called_once_with('default')
+
+    @override_settings(REDFID_EDX_API_READ_REPLICA_ALIAS='default', REDFID_EDX_API_READ_REPLICA_STICKY_SECONDS=60)
+    def test_read_replica_sticky_after_write(self):
+        caches['default'].clear()
+        self.assertFalse(db_routing.is_sticky(self.staff_user.id))
+        response = self._post('suspend_or_activate_user', {'username': 'ghost', 'is_active': False})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(db_routing.is_sticky(self.staff_user.id))
+
+        response = self._post('suspend_or_activate_user', {'username': 'student1', 'is_active': False})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(db_routing.is_sticky(self.staff_user.id))
+        with patch('redfid_edx_api.db_routing.use_alias', wraps=db_routing.use_alias) as use_alias:
+            self._post('get_user_certificates', {'username': 'student1'})
+        use_alias.assert_not_called()
+        caches['default'].clear()
+
+    # ------------------------------------------------------------------
+    # Batch
+    # ------------------------------------------------------------------
+
+    def test_batch_validation(self):
+        response = self._post_raw('batch', 'not-json')
+        self.assertEqual(response.content, b'Invalid JSON data')
+        response = self._post('batch', {})
+        self.assertEqual(response.content, b'Missing operations')
+        response = self._post('batch', {'operations': [{'endpoint': 'batch'}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.content, b'Invalid endpoint')
+        response = self._post('batch', {'operations': [{'endpoint': 'get_users', 'body': []}]})
+        self.assertEqual(response.content, b'Invalid body')
+        with override_settings(REDFID_EDX_API_BATCH_MAX_OPERATIONS=1):
+            response = self._post('batch', {'operations': [{'endpoint': 'get_users'}] * 2})
+        self.assertEqual(response.content, b'Too many operations')
+
+    def test_batch_success(self):
+        GeneratedCertificate.objects.create(user=self.student1, course_id=self.course1.id, verify_uuid='uuid-b1', key='key-b1')
+        response = self._post('batch', {'operations': [
+            {'id': 'certs', 'endpoint': 'get_user_certificates', 'body': {'username': 'student1'}},
+            {'endpoint': 'suspend_or_activate_user', 'body': {'username': 'student2', 'is_active': False}},
+            {'endpoint': 'get_xblock_user_data', 'body': {'username': 'ghost'}},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertFalse(data['rolled_back'])
+        results = data['results']
+        self.assertEqual(results[0]['id'], 'certs')
+        self.assertEqual(results[0]['status'], 200)
+        self.assertEqual(
+            results[0]['body'], self._post('get_user_certificates', {'username': 'student1'}).json(),
+        )
+        self.assertEqual(results[1]['endpoint'], 'suspend_or_activate_user')
+        self.assertEqual(results[1]['status'], 200)
+        self.assertEqual(results[2]['status'], 400)
+        self.assertEqual(results[2]['body'], 'Missing id_xblock')
+        self.assertFalse(User.objects.get(username='student2').is_active)
+
+    def test_batch_atomic_rollback(self):
+        response = self._post('batch', {'atomic': True, 'operations': [
+            {'endpoint': 'suspend_or_activate_user', 'body': {'username': 'student2', 'is_active': False}},
+            {'endpoint': 'suspend_or_activate_user', 'body': {'username': 'ghost', 'is_active': False}},
+            {'endpoint': 'suspend_or_activate_user', 'body': {'username': 'student1', 'is_active': False}},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertTrue(data['rolled_back'])
+        self.assertEqual([result['status'] for result in data['results']], [200, 400])
+        self.assertTrue(User.objects.get(username='student2').is_active)
+        self.assertTrue(User.objects.get(username='student1').is_active)
+
+    @override_settings(REDFID_EDX_API_BATCH_WORKERS=2)
+    def test_batch_concurrent(self):
+        def fake_run_operation(request, views, operation):
+            count_rows(1)
+            return {"endpoint": operation['endpoint'], "status": 200, "body": operation['body']['username']}
+
+        metrics_registry.clear()
+        usernames = ['student1', 'student2', 'ghost', 'student1']
+        with patch('redfid_edx_api.batch.run_operation', side_effect=fake_run_operation), \
+                patch('redfid_edx_api.batch.connections') as mock_connections:
+            response = self._post('batch', {'concurrent': True, 'operations': [
+                {'endpoint': 'get_user_certificates', 'body': {'username': username}} for username in usernames
+            ]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['body'] for result in response.json()['results']], usernames)
+        # Each worker thread closes its connections once, and reports to the request's metrics.
+        self.assertEqual(mock_connections.close_all.call_count, 2)
+        self.assertIn('redfid_edx_api_response_rows_sum{endpoint="batch"} 4', metrics_registry.export().splitlines())
+
+    # ------------------------------------------------------------------
+    # Instrumentation
+    # ------------------------------------------------------------------
+
+    def test_server_timing_header(self):
+        self._make_student_module(
+            self.student1, self.course1.id, 'problem', 'p1', {'student_answers': {'a': '1'}},
+        )
+        payload = {'id_xblock': '*', 'course_id': str(self.course1.id), 'xblock_type': 'problem'}
+        response = self._post('get_xblock_course_data', payload)
+        self.assertNotIn('Server-Timing', response)
+        with self.assertLogs('redfid_edx_api.instrumentation', level='INFO') as logs:
+            response = self.auth_client.post(
+                reverse('redfid_edx_api:get_xblock_course_data'),
+                content_type='application/json',
+                data=json.dumps(payload),
+                HTTP_X_REDFID_SERVER_TIMING='1',
+            )
+        for name in ('db;', 'parse;', 'decode;', 'serialize;', 'total;', 'bytes;'):
+            self.assertIn(name, response['Server-Timing'])
+        metrics = json.loads(logs.records[0].args[0])
+        self.assertEqual(metrics['endpoint'], 'get_xblock_course_data')
+        self.assertEqual(metrics['status'], 200)
+        self.assertGreater(metrics['db_queries'], 0)
+        self.assertEqual(metrics['bytes'], len(response.content))
+
+    def test_server_timing_requires_staff(self):
+        self.non_auth_client.login(username='student1', password='12345')
+        response = self.non_auth_client.get(
+            reverse('redfid_edx_api:get_users'), HTTP_X_REDFID_SERVER_TIMING='1',
+        )
+        self.assertNotIn('Server-Timing', response)
+
+    def test_instrumentation_streaming_log(self):
+        with self.assertLogs('redfid_edx_api.instrumentation', level='INFO') as logs:
+            response = self.auth_client.get(reverse('redfid_edx_api:get_users') + '?stream=1')
+            content = b''.join(response.streaming_content)
+        metrics = json.loads(logs.records[0].args[0])
+        self.assertTrue(metrics['streaming'])
+        self.assertEqual(metrics['bytes'], len(content))
+        self.assertGreater(metrics['db_queries'], 0)
+
+    def test_metrics_endpoint(self):
+        metrics_registry.clear()
+        self._post('get_user_certificates', {'username': 'student1'})
+        self._post('get_user_certificates', {})
+        self._post_raw('get_user_certificates', 'not-json')
+        response = self.auth_client.get(reverse('redfid_edx_api:metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        lines = response.content.decode('utf-8').splitlines()
+        self.assertIn('redfid_edx_api_requests_total{endpoint="get_user_certificates",status="200"} 1', lines)
+        self.assertIn('redfid_edx_api_requests_total{endpoint="get_user_certificates",status="400"} 2', lines)
+        self.assertIn('redfid_edx_api_errors_total{endpoint="get_user_certificates",reason="Missing username"} 1', lines)
+        self.assertIn('redfid_edx_api_errors_total{endpoint="get_user_certificates",reason="Invalid JSON data"} 1', lines)
+        self.assertIn('redfid_edx_api_request_duration_seconds_count{endpoint="get_user_certificates"} 3', lines)
+        self.assertIn('redfid_edx_api_db_queries_bucket{endpoint="get_user_certificates",le="+Inf"} 3', lines)
+        self.assertIn('redfid_edx_api_response_rows_bucket{endpoint="get_user_certificates",le="1"} 1', lines)
+
+    def test_metrics_record_unhandled_exceptions(self):
+        metrics_registry.clear()
+        with patch('redfid_edx_api.views.GetUserCertificates.post', side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                self._post('get_user_certificates', {'username': 'student1'})
+        lines = metrics_registry.export().splitlines()
+        self.assertIn('redfid_edx_api_requests_total{endpoint="get_user_certificates",status="500"} 1', lines)
+        self.assertIn('redfid_edx_api_errors_total{endpoint="get_user_certificates",reason="exception"} 1', lines)
+        self.assertIn('redfid_edx_api_request_duration_seconds_count{endpoint="get_user_certificates"} 1', lines)
+
+
+# --- Query-budget benchmarks ---
+#
+# The tests above use one or two rows per model, so an N+1 query pattern in a
+# view goes unnoticed. These build datasets of N learners and N blocks and
+# check that the number of queries of each endpoint stays under a ceiling and
+# does not grow with N. Wall time and peak memory of each run are written to
+# the JSON file named by REDFID_EDX_API_BENCHMARK_REPORT, if set, to compare
+# releases.
+
+BENCHMARK_SIZES = (10, 100, 1000)
+
+# Ceilings include the session authentication queries of the test client, and the queries made through the
+# fake managers of the optional XBlocks.
+QUERY_BUDGETS = {
+    'get_users': 6,
+    'get_user_certificates': 6,
+    'get_course_certificates': 6,
+    'get_certificate_status': 6,
+    'get_xblock_user_data': 6,
+    'get_xblock_course_data': 6,
+    'get_iaa_user_data': 7,
+    'get_iaa_course_data': 7,
+    'get_iterativexblock_user_data': 7,
+    'get_iterativexblock_course_data': 7,
+}
+
+
+# Bulk queries are split in chunks of REDFID_EDX_API_BULK_CHUNK_SIZE by design;
+# a single chunk keeps the query count independent of N here.
+@override_settings(REDFID_EDX_API_BULK_CHUNK_SIZE=max(BENCHMARK_SIZES), REDFID_EDX_API_QUERY_GUARD_STRICT=True)
+class TestRedfidEdxApiQueryBudget(ModuleStoreTestCase):
+    MODULESTORE = TEST_DATA_SPLIT_MODULESTORE
+
+    report = {}
+
+    def setUp(self):
+        super(TestRedfidEdxApiQueryBudget, self).setUp()
+        UserFactory(username='apistaff', password='12345', email='apistaff@edx.org', is_staff=True)
+        self.auth_client = Client()
+        self.auth_client.login(username='apistaff', password='12345')
+
+    @classmethod
+    def tearDownClass(cls):
+        super(TestRedfidEdxApiQueryBudget, cls).tearDownClass()
+        path = os.environ.get('REDFID_EDX_API_BENCHMARK_REPORT')
+        if path:
+            with open(path, 'w') as report_file:
+                json.dump(cls.report, report_file, indent=2, sort_keys=True)
+
+    def _build_dataset(self, n):
+        """
+        N learners with a certificate in a new course, and N problem blocks: learner i answered block i,
+        and the first learner answered every block.
+        """
+        course = CourseFactory.create(org='bench', course='c{}'.format(n), run='2020')
+        User.objects.bulk_create([
+            User(username='bench{}_{}'.format(n, i), email='bench{}_{}@edx.org'.format(n, i)) for i in range(n)
+        ])
+        users = list(User.objects.filter(username__startswith='bench{}_'.format(n)).order_by('id'))
+        GeneratedCertificate.objects.bulk_create([
+            GeneratedCertificate(
+                user=user, course_id=course.id, verify_uuid='uuid-{}'.format(user.username), key='key-{}'.format(user.username),
+            ) for user in users
+        ])
+        block_ids = ['b{}'.format(i) for i in range(n)]
+        course_id = str(course.id)
+        course_suffix = course_id.split('course-v1:')[1] if 'course-v1:' in course_id else course_id
+        StudentModule.objects.bulk_create([
+            StudentModule(
+                student=user,
+                course_id=course.id,
+                module_state_key='block-v1:{}+type@problem+block@{}'.format(course_suffix, block_id),
+                module_type='problem',
+                state=json.dumps({'student_answers': {'a': block_id}}),
+            ) for user, block_id in list(zip(users, block_ids)) + [(users[0], block_id) for block_id in block_ids[1:]]
+        ])
+        return course, users, block_ids
+
+    def _run(self, name, payload, method='post'):
+        course_cache.clear()
+        user_cache.clear()
+        url = reverse('redfid_edx_api:%s' % name)
+        if method == 'get':
+            return self.auth_client.get(url)
+        return self.auth_client.post(url, content_type='application/json', data=json.dumps(payload))
+
+    def _measure(self, name, n, payload, method='post'):
+        fake_queries = FakeManager.queries
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = self._run(name, payload, method)
+            wall_time = time.perf_counter() - start
+        query_count = len(queries) + FakeManager.queries - fake_queries
+        self.assertEqual(response.status_code, 200, response.content)
+        tracemalloc.start()
+        try:
+            self._run(name, payload, method)
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.report.setdefault(name, {})[str(n)] = {
+            'queries': query_count,
+            'wall_time_ms': round(wall_time * 1000, 1),
+            'peak_memory_kb': round(peak_memory / 1024, 1),
+            'response_bytes': len(response.content),
+        }
+        return query_count
+
+    def _assert_query_budget(self, name, build_payload, method='post', fake=None):
+        counts = {}
+        for n in BENCHMARK_SIZES:
+            course, users, block_ids = self._build_dataset(n)
+            payload = build_payload(course, users, block_ids)
+            if fake is None:
+                counts[n] = self._measure(name, n, payload, method)
+            else:
+                with fake(course, users, block_ids):
+                    counts[n] = self._measure(name, n, payload, method)
+        self.assertLessEqual(max(counts.values()), QUERY_BUDGETS[name], counts)
+        self.assertEqual(len(set(counts.values())), 1, 'queries of {} grow with N: {}'.format(name, counts))
+
+    def test_get_users_query_budget(self):
+        self._assert_query_budget('get_users', lambda course, users, block_ids: None, method='get')
+
+    def test_get_user_certificates_query_budget(self):
+        self._assert_query_budget(
+            'get_user_certificates', lambda course, users, block_ids: {'username': users[0].username},
+        )
+
+    def test_get_course_certificates_query_budget(self):
+        self._assert_query_budget(
+            'get_course_certificates', lambda course, users, block_ids: {'course_id': str(course.id)},
+        )
+
+    def test_get_certificate_status_query_budget(self):
+        self._assert_query_budget('get_certificate_status', lambda course, users, block_ids: {'pairs': [
+            {'username': user.username, 'course_id': str(course.id)} for user in users
+        ]})
+
+    def test_get_certificate_status_many_courses_query_budget(self):
+        # One course per learner: the queries must not grow with the number of distinct courses either.
+        def build_payload(course, users, block_ids):
+            course_ids = ['course-v1:bench+many{}+{}'.format(len(users), i) for i in range(len(users))]
+            GeneratedCertificate.objects.bulk_create([
+                GeneratedCertificate(
+                    user=user, course_id=CourseKey.from_string(course_id),
+                    verify_uuid='uuid-many-{}'.format(user.username), key='key-many-{}'.format(user.username),
+                ) for user, course_id in zip(users, course_ids)
+            ])
+            return {'pairs': [
+                {'username': user.username, 'course_id': course_id} for user, course_id in zip(users, course_ids)
+            ]}
+
+        self._assert_query_budget('get_certificate_status', build_payload)
+
+    def test_get_xblock_user_data_query_budget(self):
+        self._assert_query_budget('get_xblock_user_data', lambda course, users, block_ids: {
+            'username': users[0].username, 'course_id': str(course.id), 'xblock_type': 'problem', 'id_xblock': block_ids,
+        })
+
+    def test_get_xblock_course_data_query_budget(self):
+        self._assert_query_budget('get_xblock_course_data', lambda course, users, block_ids: {
+            'course_id': str(course.id), 'xblock_type': 'problem', 'id_xblock': block_ids,
+        })
+
+    def test_get_iaa_course_data_query_budget(self):
+        def fake(course, users, block_ids):
+            activity = FakeIAAActivity(id_course=str(course.id), activity_name='Activity')
+            stages = [FakeIAAStage(activity=activity, stage_label=block_id, stage_number=i) for i, block_id in enumerate(block_ids[:10])]
+            submissions = [
+                FakeIAASubmission(id_student=user.id, stage=stage, submission='answer', submission_time='2020-01-01')
+                for stage in stages for user in users
+            ]
+            return fake_iaa_module(activities=[activity], stages=stages, submissions=submissions)
+
+        self._assert_query_budget(
+            'get_iaa_course_data', lambda course, users, block_ids: {'course_id': str(course.id)}, fake=fake,
+        )
+
+    def test_get_iaa_user_data_query_budget(self):
+        def fake(course, users, block_ids):
+            activity = FakeIAAActivity(id_course=str(course.id), activity_name='Activity')
+            stages = [FakeIAAStage(activity=activity, stage_label=block_id, stage_number=i) for i, block_id in enumerate(block_ids)]
+            submissions = [
+                FakeIAASubmission(id_student=users[0].id, stage=stage, submission='answer', submission_time='2020-01-01')
+                for stage in stages
+            ]
+            return fake_iaa_module(activities=[activity], stages=stages, submissions=submissions)
+
+        self._assert_query_budget(
+            'get_iaa_user_data',
+            lambda course, users, block_ids: {'username': users[0].username, 'course_id': str(course.id)},
+            fake=fake,
+        )
+
+    def test_get_iterativexblock_user_data_query_budget(self):
+        def fake(course, users, block_ids):
+            questions = [
+                FakeIterativeQuestion(id=i, id_xblock=block_id, id_course=str(course.id), id_question='q')
+                for i, block_id in enumerate(block_ids)
+            ]
+            answers = [
+                FakeIterativeAnswer(
+                    id_student=users[0].id, question_id=question.id, answer='42', timestamp='2020-01-01', id_course=str(course.id),
+                ) for question in questions
+            ]
+            return fake_iterative_module(questions=questions, answers=answers)
+
+        self._assert_query_budget(
+            'get_iterativexblock_user_data',
+            lambda course, users, block_ids: {'username': users[0].username, 'course_id': str(course.id)},
+            fake=fake,
+        )
+
+    def test_get_iterativexblock_course_data_query_budget(self):
+        def fake(course, users, block_ids):
+            questions = [
+                FakeIterativeQuestion(id=i, id_xblock=block_id, id_course=str(course.id), id_question='q')
+                for i, block_id in enumerate(block_ids[:10])
+            ]
+            answers = [
+                FakeIterativeAnswer(
+                    id_student=user.id, question_id=question.id, answer='42', timestamp='2020-01-01', id_course=str(course.id),
+                ) for question in questions for user in users
+            ]
+            return fake_iterative_module(questions=questions, answers=answers)
+
+        self._assert_query_budget(
+            'get_iterativexblock_course_data', lambda course, users, block_ids: {'course_id': str(course.id)}, fake=fake,
+        )
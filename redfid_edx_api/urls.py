@@ -1,26 +1,39 @@
 from django.conf.urls import url
 from django.views.decorators.csrf import csrf_exempt
+from .instrumentation import instrument
 from .views import *
 
 
 urlpatterns = [
-    url('get_users/', GetRedfidUsers.as_view(), name='get_users'),
-    url('create_user/', csrf_exempt(CreateRedfidUser.as_view()), name='create_user'),
-    url('edit_user/', csrf_exempt(EditRedfidUser.as_view()), name='edit_user'),
-    url('suspend_or_activate_user/', csrf_exempt(SuspendOrActivateRedfidUser.as_view()), name='suspend_or_activate_user'),
-    url('change_user_password/', csrf_exempt(ChangeRedfidUserPassword.as_view()), name='change_user_password'),
-    url('delete_user/', csrf_exempt(DeleteRedfidUser.as_view()), name='delete_user'),
-    url('ensure_user_has_redfid_social_auth/', csrf_exempt(EnsureUserHasRedfidSocialAuth.as_view()), name='ensure_user_has_redfid_social_auth'),
-    url('get_iaa_user_data/', csrf_exempt(GetIAAUserData.as_view()), name='get_iaa_user_data'),
-    url('get_iaa_course_data/', csrf_exempt(GetIAACourseData.as_view()), name='get_iaa_course_data'),
-    url('get_iterativexblock_user_data/', csrf_exempt(GetIterativeXBlockUserData.as_view()), name='get_iterativexblock_user_data'),
-    url('get_iterativexblock_course_data/', csrf_exempt(GetIterativeXBlockCourseData.as_view()), name='get_iterativexblock_course_data'),
-    url('get_user_certificates/', csrf_exempt(GetUserCertificates.as_view()), name='get_user_certificates'),
-    url('get_course_certificates/', csrf_exempt(GetCourseCertificates.as_view()), name='get_course_certificates'),
-    url('emit_user_certificate/', csrf_exempt(EmitUserCertificate.as_view()), name='emit_user_certificate'),
-    url('revoke_user_certificate/', csrf_exempt(RevokeUserCertificate.as_view()), name='revoke_user_certificate'),
-    url('get_xblock_user_data/', csrf_exempt(GetXBlockUserData.as_view()), name='get_xblock_user_data'),
-    url('get_xblock_course_data/', csrf_exempt(GetXBlockCourseData.as_view()), name='get_xblock_course_data'),
-    url('enroll_user_into_course/', csrf_exempt(EnrollUserIntoCourse.as_view()), name='enroll_user_into_course'),
-    url('unenroll_user_from_course/', csrf_exempt(UnenrollUserFromCourse.as_view()), name='unenroll_user_from_course'),
+    url('get_users/', instrument(GetRedfidUsers.as_view()), name='get_users'),
+    url('create_user/', instrument(csrf_exempt(CreateRedfidUser.as_view())), name='create_user'),
+    url('edit_user/', instrument(csrf_exempt(EditRedfidUser.as_view())), name='edit_user'),
+    url('suspend_or_activate_user/', instrument(csrf_exempt(SuspendOrActivateRedfidUser.as_view())), name='suspend_or_activate_user'),
+    url('change_user_password/', instrument(csrf_exempt(ChangeRedfidUserPassword.as_view())), name='change_user_password'),
+    url('delete_user/', instrument(csrf_exempt(DeleteRedfidUser.as_view())), name='delete_user'),
+    url('ensure_user_has_redfid_social_auth/', instrument(csrf_exempt(EnsureUserHasRedfidSocialAuth.as_view())), name='ensure_user_has_redfid_social_auth'),
+    url('get_iaa_user_data/', instrument(csrf_exempt(GetIAAUserData.as_view())), name='get_iaa_user_data'),
+    url('get_iaa_course_data/', instrument(csrf_exempt(GetIAACourseData.as_view())), name='get_iaa_course_data'),
+    url('get_iterativexblock_user_data/', instrument(csrf_exempt(GetIterativeXBlockUserData.as_view())), name='get_iterativexblock_user_data'),
+    url('get_iterativexblock_course_data/', instrument(csrf_exempt(GetIterativeXBlockCourseData.as_view())), name='get_iterativexblock_course_data'),
+    url('get_user_certificates/', instrument(csrf_exempt(GetUserCertificates.as_view())), name='get_user_certificates'),
+    url('get_course_certificates/', instrument(csrf_exempt(GetCourseCertificates.as_view())), name='get_course_certificates'),
+    url('get_certificate_status/', instrument(csrf_exempt(GetCertificateStatus.as_view())), name='get_certificate_status'),
+    url('emit_user_certificate/', instrument(csrf_exempt(EmitUserCertificate.as_view())), name='emit_user_certificate'),
+    url('emit_course_certificates/', instrument(csrf_exempt(EmitCourseCertificates.as_view())), name='emit_course_certificates'),
+    url('queue_user_certificate/', instrument(csrf_exempt(QueueUserCertificate.as_view())), name='queue_user_certificate'),
+    url('get_certificate_emission_job/', instrument(csrf_exempt(GetCertificateEmissionJob.as_view())), name='get_certificate_emission_job'),
+    url('revoke_user_certificate/', instrument(csrf_exempt(RevokeUserCertificate.as_view())), name='revoke_user_certificate'),
+    url('revoke_course_certificates/', instrument(csrf_exempt(RevokeCourseCertificates.as_view())), name='revoke_course_certificates'),
+    url('get_xblock_user_data/', instrument(csrf_exempt(GetXBlockUserData.as_view())), name='get_xblock_user_data'),
+    url('get_xblock_course_data/', instrument(csrf_exempt(GetXBlockCourseData.as_view())), name='get_xblock_course_data'),
+    url('enroll_user_into_course/', instrument(csrf_exempt(EnrollUserIntoCourse.as_view())), name='enroll_user_into_course'),
+    url('unenroll_user_from_course/', instrument(csrf_exempt(UnenrollUserFromCourse.as_view())), name='unenroll_user_from_course'),
+    url('enroll_users_into_course/', instrument(csrf_exempt(EnrollUsersIntoCourse.as_view())), name='enroll_users_into_course'),
+    url('unenroll_users_from_course/', instrument(csrf_exempt(UnenrollUsersFromCourse.as_view())), name='unenroll_users_from_course'),
+    url('sync_course_roster/', instrument(csrf_exempt(SyncCourseRoster.as_view())), name='sync_course_roster'),
+    url('batch/', instrument(csrf_exempt(Batch.as_view())), name='batch'),
+    url('metrics/', GetMetrics.as_view(), name='metrics'),
+    url('list_profiles/', ListProfiles.as_view(), name='list_profiles'),
+    url('download_profile/', csrf_exempt(DownloadProfile.as_view()), name='download_profile'),
 ]
\ No newline at end of file
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+from collections import OrderedDict
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .utils import chunked
+
+
+VERSION_CACHE_KEY = "redfid_edx_api.user_cache.version"
+USERNAME_CACHE_KEY = "redfid_edx_api.user_cache.{}.username.{}"
+USER_ID_CACHE_KEY = "redfid_edx_api.user_cache.{}.user_id.{}"
+
+
+class UserCache(object):
+    """
+    Cache de la resolución username <-> user_id, usada por los endpoints que solo necesitan el id o el username
+    de un usuario, y no el User completo.
+    Tiene una cache LRU por proceso, de REDFID_EDX_API_USER_CACHE_SIZE pares, cuyas entradas expiran después de
+    REDFID_EDX_API_USER_CACHE_TTL segundos, y opcionalmente (REDFID_EDX_API_USER_CACHE_SHARED) usa el cache compartido
+    de Django como segundo nivel. Las entradas se invalidan con post_save y post_delete de User (ver signals.py).
+    Como la señal puede emitirse en otro proceso, además se guarda una versión en el cache compartido de Django,
+    que se incrementa al invalidar un usuario y se compara al leer las entradas de ambos niveles, igual que en
+    course_cache.py; así ningún proceso sigue usando un par username <-> user_id después de un cambio de username
+    o de que el usuario se elimine. Los usuarios que no existen no se guardan en la cache.
+    """
+
+    def __init__(self):
+        # username -> (user_id, version, expires_at), en orden LRU, e índice user_id -> username con los mismos pares.
+        self._entries = OrderedDict()
+        self._usernames = {}
+        self._lock = threading.Lock()
+
+    def _get_local(self, key, by_username, version, now):
+        username = key if by_username else self._usernames.get(key)
+        entry = self._entries.get(username) if username is not None else None
+        if entry is None:
+            return None
+        user_id, entry_version, expires_at = entry
+        if entry_version != version or expires_at <= now:
+            self._discard(username)
+            return None
+        self._entries.move_to_end(username)
+        return user_id if by_username else username
+
+    def _discard(self, username):
+        entry = self._entries.pop(username, None)
+        if entry is not None and self._usernames.get(entry[0]) == username:
+            del self._usernames[entry[0]]
+
+    def _set_local(self, pairs, version):
+        expires_at = time.time() + settings.REDFID_EDX_API_USER_CACHE_TTL
+        with self._lock:
+            for username, user_id in pairs:
+                self._discard(username)
+                if user_id in self._usernames:
+                    self._discard(self._usernames[user_id])
+                self._entries[username] = (user_id, version, expires_at)
+                self._usernames[user_id] = username
+            while len(self._entries) > settings.REDFID_EDX_API_USER_CACHE_SIZE:
+                self._discard(next(iter(self._entries)))
+
+    def _set_shared(self, pairs, version):
+        if not settings.REDFID_EDX_API_USER_CACHE_SHARED or not pairs:
+            return
+        values = {}
+        for username, user_id in pairs:
+            values[USERNAME_CACHE_KEY.format(version, username)] = user_id
+            values[USER_ID_CACHE_KEY.format(version, user_id)] = username
+        cache.set_many(values, settings.REDFID_EDX_API_USER_CACHE_TTL)
+
+    def _resolve(self, keys, by_username):
+        """
+        Resuelve una lista de usernames (by_username) o de user_ids, primero con la cache local, luego con la
+        compartida y finalmente con la base de datos, en lotes. La versión se lee antes de consultar la base de
+        datos, para que un resultado obtenido antes de una invalidación quede guardado con la versión anterior.
+        Retorna un diccionario llave -> valor con las llaves encontradas.
+        """
+        from django.contrib.auth.models import User
+        version = cache.get(VERSION_CACHE_KEY, 0)
+        keys = list(dict.fromkeys(keys))
+        shared_key = USERNAME_CACHE_KEY if by_username else USER_ID_CACHE_KEY
+        key_index = 0 if by_username else 1
+        now = time.time()
+        out = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                value = self._get_local(key, by_username, version, now)
+                if value is None:
+                    missing.append(key)
+                else:
+                    out[key] = value
+        if not missing:
+            return out
+        # Pares (username, user_id) obtenidos del cache compartido y de la base de datos.
+        shared_pairs = []
+        db_pairs = []
+        if settings.REDFID_EDX_API_USER_CACHE_SHARED:
+            shared = cache.get_many([shared_key.format(version, key) for key in missing])
+            for key in missing:
+                value = shared.get(shared_key.format(version, key))
+                if value is not None:
+                    shared_pairs.append((key, value) if by_username else (value, key))
+            missing = [key for key in missing if shared_key.format(version, key) not in shared]
+        field = 'username__in' if by_username else 'id__in'
+        for chunk in chunked(missing):
+            db_pairs += User.objects.filter(**{field: chunk}).values_list('username', 'id')
+        found = {pair[key_index]: pair[1 - key_index] for pair in shared_pairs + db_pairs}
+        # Con una collation case-insensitive (MySQL), la base de datos también encuentra los usernames escritos con
+        # otras mayúsculas, que se retornan con la llave pedida.
+        folded = {username.lower(): user_id for username, user_id in db_pairs} if by_username else {}
+        for key in keys:
+            if key in out:
+                continue
+            if key in found:
+                out[key] = found[key]
+            elif folded and key.lower() in folded:
+                out[key] = folded[key.lower()]
+        self._set_shared(db_pairs, version)
+        self._set_local(shared_pairs + db_pairs, version)
+        return out
+
+    def resolve_many_user_ids(self, usernames):
+        """
+        Retorna un diccionario username -> user_id para los usernames dados que existen.
+        """
+        return self._resolve(usernames, by_username=True)
+
+    def resolve_many_usernames(self, user_ids):
+        """
+        Retorna un diccionario user_id -> username para los user_ids dados que existen.
+        """
+        return self._resolve(user_ids, by_username=False)
+
+    def invalidate(self, user_id, username):
+        """
+        Invalida las entradas de un usuario, incluyendo la de su username anterior si cambió, e incrementa la
+        versión compartida para que los demás procesos descarten sus entradas.
+        """
+        with self._lock:
+            self._discard(username)
+            if user_id in self._usernames:
+                self._discard(self._usernames[user_id])
+        try:
+            cache.incr(VERSION_CACHE_KEY)
+        except ValueError:
+            cache.set(VERSION_CACHE_KEY, 1, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._usernames.clear()
+
+
+user_cache = UserCache()
+
+
+def resolve_user_id(username):
+    """
+    Retorna el user_id de un username, o None si el usuario no existe.
+    """
+    return user_cache.resolve_many_user_ids([username]).get(username)
+
+
+def resolve_username(user_id):
+    """
+    Retorna el username de un user_id, o None si el usuario no existe.
+    """
+    return user_cache.resolve_many_usernames([user_id]).get(user_id)
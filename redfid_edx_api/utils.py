@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+from collections import Counter
+import json
+
+from django.conf import settings
+
+from .instrumentation import timer
+
+
+def get_bulk_chunk_size():
+    """
+    Tamaño de los lotes usados por los endpoints masivos para consultar y modificar la base de datos.
+    """
+    return getattr(settings, 'REDFID_EDX_API_BULK_CHUNK_SIZE', 500)
+
+
+def chunked(items, size=None):
+    """
+    Divide una lista en lotes de tamaño size.
+    """
+    size = size or get_bulk_chunk_size()
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def iter_groups_in_order(keys, groups):
+    """
+    Recorre groups, pares (llave, filas) como los de itertools.groupby, y retorna los pares (llave, lista de filas)
+    en el orden de keys, con una lista vacía para las llaves sin filas. Solo se guardan en memoria los grupos que
+    llegan antes de su turno, de modo que si groups viene en el orden de keys nunca hay más de uno.
+    """
+    remaining = Counter(keys)
+    pending = {}
+    groups = iter(groups)
+    exhausted = False
+    for key in keys:
+        while key not in pending and not exhausted:
+            try:
+                group_key, rows = next(groups)
+            except StopIteration:
+                exhausted = True
+            else:
+                pending[group_key] = list(rows)
+        remaining[key] -= 1
+        yield key, (pending.get(key, []) if remaining[key] else pending.pop(key, []))
+
+
+def get_users_by_username(usernames):
+    """
+    Retorna un diccionario username -> User para los usernames dados, consultando en lotes. Las llaves son los
+    usernames pedidos, aunque la base de datos los encuentre con otras mayúsculas (collation case-insensitive).
+    """
+    from django.contrib.auth.models import User
+    users = {}
+    for chunk in chunked(list(dict.fromkeys(usernames))):
+        found = {user.username: user for user in User.objects.filter(username__in=chunk)}
+        folded = {username.lower(): user for username, user in found.items()}
+        for username in chunk:
+            user = found.get(username) or folded.get(username.lower())
+            if user is not None:
+                users[username] = user
+    return users
+
+
+def get_email_languages(users):
+    """
+    Retorna un diccionario user_id -> idioma preferido para los correos, equivalente a llamar
+    get_user_email_language a cada usuario, pero consultando las preferencias en lotes.
+    """
+    from openedx.core.djangoapps.lang_pref import LANGUAGE_KEY
+    from openedx.core.djangoapps.user_api.models import UserPreference
+    languages = {}
+    for chunk in chunked([user.id for user in users]):
+        languages.update(UserPreference.objects.filter(user_id__in=chunk, key=LANGUAGE_KEY).values_list('user_id', 'value'))
+    return languages
+
+
+def get_keyset_pagination(data):
+    """
+    Obtiene los parámetros opcionales de paginación por keyset (page_size y after) del cuerpo de una solicitud.
+    Retorna (page_size, after), o lanza ValueError con el mensaje de error a retornar.
+    """
+    page_size = data.get('page_size')
+    after = data.get('after')
+    if page_size is not None and (type(page_size) != int or page_size <= 0):
+        raise ValueError("Invalid page_size")
+    if after is not None and type(after) != int:
+        raise ValueError("Invalid after")
+    return page_size, after
+
+
+def load_request_json(request):
+    """
+    Parsea el cuerpo JSON de una solicitud, midiendo el tiempo de parseo (ver instrumentation.py). El resultado se
+    guarda en la solicitud, para que los decoradores (ver response_cache.py) y la vista no lo parseen dos veces.
+    Lanza json.JSONDecodeError si el cuerpo no es JSON válido.
+    """
+    if not hasattr(request, 'redfid_edx_api_json'):
+        with timer('parse'):
+            request.redfid_edx_api_json = json.loads(request.body)
+    return request.redfid_edx_api_json
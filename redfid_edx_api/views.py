@@ -2,18 +2,48 @@
 # -- coding: utf-8 --
 
 from django.conf import settings
+from django.db import transaction
 from django.db.utils import IntegrityError
-from django.http import HttpResponseBadRequest, HttpResponse, JsonResponse
+from django.http import FileResponse, HttpResponseBadRequest, HttpResponseForbidden, HttpResponse, JsonResponse
 from edx_rest_framework_extensions import permissions
 from edx_rest_framework_extensions.auth.jwt.authentication import JwtAuthentication
 from edx_rest_framework_extensions.auth.session.authentication import SessionAuthenticationAllowInactiveUser
 import json
 from lms.djangoapps.certificates.queue import XQueueCertInterface
 import logging
+import os
 from opaque_keys.edx.keys import CourseKey
 from openedx.core.lib.api.authentication import BearerAuthenticationAllowInactiveUser
 from rest_framework.views import APIView
-from xmodule.modulestore.django import modulestore
+
+from .admission import limit_concurrency
+from .batch import run_batch, validate_operations
+from .certificates import (
+    bulk_emit_certificates,
+    bulk_revoke_certificates,
+    certificates_response,
+    get_certificate_statuses,
+    get_courses_certificates,
+)
+from .course_cache import get_course
+from .db_routing import read_replica, sticky_write
+from .enrollments import bulk_enroll_users, bulk_unenroll_users
+from .metrics import registry as metrics_registry
+from .profiling import get_profile, get_profile_path, is_privileged, list_profiles
+from .query_guard import QueryBudgetExceeded
+from .response_cache import cache_course_response
+from .snapshots import (
+    dump_answer,
+    dump_block_answers,
+    get_answer_from_state,
+    get_user_snapshot_answers,
+    iter_course_snapshot_answers,
+    snapshots_enabled,
+)
+from .streaming import list_response, RawJSON
+from .user_cache import resolve_user_id, user_cache
+from .utils import chunked, get_keyset_pagination, get_users_by_username, iter_groups_in_order, load_request_json
+from .writes import atomic_write, save_changed_fields
 
 
 logger = logging.getLogger(__name__)
@@ -29,24 +59,23 @@ class GetRedfidUsers(APIView):
 
     permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS,)
 
+    @read_replica
     def get(self, request):
         """
         Endpoint usado por el panel de administración de RedFID para obtener la lista de usuarios en la base de datos de Open edX.
         """
         from django.contrib.auth.models import User
-        users = User.objects.all()
-        out = []
-        for user in users:
-            out.append({
-                "username": user.username,
-                "email": user.email,
-                "first_name": user.first_name,
-                "last_name": user.last_name,
-                "is_active": user.is_active,
-                "is_staff": user.is_staff,
-                "is_superuser": user.is_superuser
-            })
-        return JsonResponse(out, safe=False)
+        users = User.objects.all().iterator()
+        out = ({
+            "username": user.username,
+            "email": user.email,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "is_active": user.is_active,
+            "is_staff": user.is_staff,
+            "is_superuser": user.is_superuser
+        } for user in users)
+        return list_response(request, out)
 
 
 class CreateRedfidUser(APIView):
@@ -59,6 +88,8 @@ class CreateRedfidUser(APIView):
 
     permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS,)
 
+    @sticky_write
+    @atomic_write
     def post(self, request):
         """
         Endpoint usado por el panel de administración de RedFID para crear un usuario en la base de datos de Open edX.
@@ -69,7 +100,7 @@ class CreateRedfidUser(APIView):
         from social_django.models import UserSocialAuth
         try:
             logger.info("CreateRedfidUser - request: {}".format(request))
-            data = json.loads(request.body)
+            data = load_request_json(request)
             user_id = data.get('user_id')
             username = data.get('username')
             password = data.get('password')
@@ -84,18 +115,15 @@ class CreateRedfidUser(APIView):
                 return HttpResponseBadRequest("Username is forbidden")
             try:
                 new_user = User.objects.create_user(username, email, password, first_name=first_name, last_name=last_name, is_staff=is_staff, is_superuser=is_superuser)
-                new_user.save()
             except IntegrityError:
                 return HttpResponseBadRequest("User already exists")
             full_name = first_name + " " + last_name
             try:
-                new_userprofile = UserProfile.objects.create(user=new_user, name=full_name)
-                new_userprofile.save()
+                UserProfile.objects.create(user=new_user, name=full_name)
             except IntegrityError:
                 return HttpResponseBadRequest("UserProfile already exists") # should never happen
             try:
-                new_usersocialauth = UserSocialAuth.objects.create(user=new_user, provider='redfid', uid=user_id, extra_data={})
-                new_usersocialauth.save()
+                UserSocialAuth.objects.create(user=new_user, provider='redfid', uid=user_id, extra_data={})
             except IntegrityError:
                 return HttpResponseBadRequest("UserSocialAuth already exists") # should never happen
             return HttpResponse(f"User {username} created successfully")
@@ -113,16 +141,19 @@ class EditRedfidUser(APIView):
 
     permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS,)
     
+    @sticky_write
+    @atomic_write
     def post(self, request):
         """
         Endpoint usado por el panel de administración de RedFID para editar un usuario en la base de datos de Open edX.
         Se actualizan los campos email, first_name y last_name del modelo base User, y el campo name del model UserProfile.
+        Solo se escriben los campos cuyo valor cambió.
         """
         from django.contrib.auth.models import User
         from common.djangoapps.student.models import UserProfile
         try:
             logger.info("EditRedfidUser - request: {}".format(request))
-            data = json.loads(request.body)
+            data = load_request_json(request)
             username = data.get('username')
             if not username:
                 return HttpResponseBadRequest("Missing username")
@@ -145,19 +176,15 @@ class EditRedfidUser(APIView):
             is_superuser = data.get('is_superuser')
             if is_superuser is None:
                 return HttpResponseBadRequest("Missing is_superuser")
-            user.email = email
-            user.first_name = first_name
-            user.last_name = last_name
-            user.is_staff = is_staff
-            user.is_superuser = is_superuser
-            user.save()
+            save_changed_fields(
+                user, email=email, first_name=first_name, last_name=last_name, is_staff=is_staff, is_superuser=is_superuser
+            )
             try:
                 userprofile = UserProfile.objects.get(user=user)
             except UserProfile.DoesNotExist:
                 return HttpResponseBadRequest("UserProfile not found") # should never happen
             full_name = first_name + " " + last_name
-            userprofile.name = full_name
-            userprofile.save()
+            save_changed_fields(userprofile, name=full_name)
             return HttpResponse(f"User {username} updated successfully")
         except json.JSONDecodeError:
             return HttpResponseBadRequest("Invalid JSON data")
@@ -174,6 +201,8 @@ class SuspendOrActivateRedfidUser(APIView):
 
     permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS,)
 
+    @sticky_write
+    @atomic_write
     def post(self, request):
         """
         Endpoint usado por el panel de administración de RedFID para suspender o activar un usuario en la base de datos de Open edX.
@@ -182,7 +211,7 @@ class SuspendOrActivateRedfidUser(APIView):
         from django.contrib.auth.models import User
         try:
             logger.info("SuspendOrActivateRedfidUser - request: {}".format(request))
-            data = json.loads(request.body)
+            data = load_request_json(request)
             username = data.get('username')
             if not username:
                 return HttpResponseBadRequest("Missing username")
@@ -193,8 +222,7 @@ class SuspendOrActivateRedfidUser(APIView):
                 user = User.objects.get(username=username)
             except User.DoesNotExist:
                 return HttpResponseBadRequest("User not found")
-            user.is_active = is_active
-            user.save()
+            save_changed_fields(user, is_active=is_active)
             return HttpResponse(f"User {username} is_active updated successfully")
         except json.JSONDecodeError:
             return HttpResponseBadRequest("Invalid JSON data")
@@ -210,6 +238,8 @@ class ChangeRedfidUserPassword(APIView):
 
     permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS,)
 
+    @sticky_write
+    @atomic_write
     def post(self, request):
         """
         Endpoint usado por el panel de administración de RedFID para cambiar la contraseña de un usuario en la base de datos de Open edX.
@@ -218,7 +248,7 @@ class ChangeRedfidUserPassword(APIView):
         from django.contrib.auth.models import User
         try:
             logger.info("ChangeRedfidUserPassword - request: {}".format(request))
-            data = json.loads(request.body)
+            data = load_request_json(request)
             username = data.get('username')
             if not username:
                 return HttpResponseBadRequest("Missing username")
@@ -230,7 +260,7 @@ class ChangeRedfidUserPassword(APIView):
             except User.DoesNotExist:
                 return HttpResponseBadRequest("User not found")
             user.set_password(password)
-            user.save()
+            user.save(update_fields=['password'])
             return HttpResponse(f"User {username} password updated successfully")
         except json.JSONDecodeError:
             return HttpResponseBadRequest("Invalid JSON data")
@@ -246,6 +276,8 @@ class DeleteRedfidUser(APIView):
 
     permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS,)
 
+    @sticky_write
+    @atomic_write
     def post(self, request):
         """
         Endpoint usado por el panel de administración de RedFID para eliminar un usuario en la base de datos de Open edX.
@@ -254,7 +286,7 @@ class DeleteRedfidUser(APIView):
         from django.contrib.auth.models import User
         try:
             logger.info("DeleteRedfidUser - request: {}".format(request))
-            data = json.loads(request.body)
+            data = load_request_json(request)
             username = data.get('username')
             if not username:
                 return HttpResponseBadRequest("Missing username")
@@ -277,6 +309,8 @@ class EnsureUserHasRedfidSocialAuth(APIView):
 
     permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS,)
 
+    @sticky_write
+    @atomic_write
     def post(self, request):
         """
         Endpoint usado por el panel de administración de RedFID para asegurar que un usuario tenga un UserSocialAuth asociado al SSO de RedFID.
@@ -287,7 +321,7 @@ class EnsureUserHasRedfidSocialAuth(APIView):
         from social_django.models import UserSocialAuth
         try:
             logger.info("EnsureUserHasRedfidSocialAuth - request: {}".format(request))
-            data = json.loads(request.body)
+            data = load_request_json(request)
             user_id = data.get('user_id')
             username = data.get('username')
             if not username:
@@ -308,10 +342,8 @@ class EnsureUserHasRedfidSocialAuth(APIView):
                 deleted_saml_usersocialauth = False
 
             redfid_usersocialauth = UserSocialAuth.objects.filter(user=user, provider='redfid', uid=user_id)
-            existing_redfid_usersocialauth = redfid_usersocialauth.first()
-            if not existing_redfid_usersocialauth:
-                new_redfid_usersocialauth = UserSocialAuth.objects.create(user=user, provider='redfid', uid=user_id, extra_data={})
-                new_redfid_usersocialauth.save()
+            if not redfid_usersocialauth.exists():
+                UserSocialAuth.objects.create(user=user, provider='redfid', uid=user_id, extra_data={})
                 created_redfid_usersocialauth = True
             else:
                 created_redfid_usersocialauth = False
@@ -332,31 +364,34 @@ class GetIAAUserData(APIView):
 
     permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS,)
     
+    @read_replica
     def post(self, request):
         """
         Endpoint usado por el panel de administración de RedFID para obtener los datos de un usuario en el IAAXBlock.
         """
-        from django.contrib.auth.models import User
         try:
             from iaaxblock.models import IAAActivity, IAAStage, IAASubmission
         except ImportError:
             return HttpResponseBadRequest("IAAXBlock not found")
         try:
-            data = json.loads(request.body)
+            data = load_request_json(request)
         except json.JSONDecodeError:
             return HttpResponseBadRequest("Invalid JSON data")
         username = data.get('username')
         if not username:
             return HttpResponseBadRequest("Missing username")
-        try:
-            user = User.objects.get(username=username)
-        except User.DoesNotExist:
+        user_id = resolve_user_id(username)
+        if user_id is None:
             return HttpResponseBadRequest("User not found")
         course_id = data.get('course_id')
         if not course_id:
             return HttpResponseBadRequest("Missing course_id")
-        activities = IAAActivity.objects.filter(id_course=course_id).all()
-        stages = IAAStage.objects.filter(activity__in=activities).all()
+        activities = list(IAAActivity.objects.filter(id_course=course_id).all())
+        stages = list(IAAStage.objects.filter(activity__in=activities).all())
+        submissions = {
+            submission.stage_id: submission
+            for submission in IAASubmission.objects.filter(id_student=user_id, stage__in=stages).all()
+        }
         out = []
         for activity in activities:
             out.append({
@@ -365,9 +400,9 @@ class GetIAAUserData(APIView):
                 "stages": [{
                     "label": stage.stage_label,
                     "number": stage.stage_number,
-                    "answer": IAASubmission.objects.get(id_student=user.id, stage=stage).submission if IAASubmission.objects.filter(id_student=user.id, stage=stage).exists() else None,
-                    "timestamp": str(IAASubmission.objects.get(id_student=user.id, stage=stage).submission_time) if IAASubmission.objects.filter(id_student=user.id, stage=stage).exists() else None
-                } for stage in stages if stage.activity == activity]
+                    "answer": submissions[stage.id].submission if stage.id in submissions else None,
+                    "timestamp": str(submissions[stage.id].submission_time) if stage.id in submissions else None
+                } for stage in stages if stage.activity_id == activity.id]
             })
         return JsonResponse(out, safe=False)
 
@@ -382,41 +417,51 @@ class GetIAACourseData(APIView):
 
     permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS,)
         
+    @read_replica
+    @cache_course_response
+    @limit_concurrency('get_iaa_course_data')
     def post(self, request):
         """
         Endpoint usado por el panel de administración de RedFID para obtener los datos de un curso en el IAAXBlock.
         """
-        from django.contrib.auth.models import User
         try:
             from iaaxblock.models import IAAActivity, IAAStage, IAASubmission
         except ImportError:
             return HttpResponseBadRequest("IAAXBlock not found")
         try:
-            data = json.loads(request.body)
+            data = load_request_json(request)
         except json.JSONDecodeError:
             return HttpResponseBadRequest("Invalid JSON data")
         course_id = data.get('course_id')
         if not course_id:
             return HttpResponseBadRequest("Missing course_id")
-        activities = IAAActivity.objects.filter(id_course=course_id).all()
-        stages = IAAStage.objects.filter(activity__in=activities).all()
-        out = []
-        for activity in activities:
-            out.append({
-                "id_course": activity.id_course,
-                "name": activity.activity_name,
-                "stages": [{
-                    "label": stage.stage_label,
-                    "number": stage.stage_number,
-                    "answers": [{
-                        "user": User.objects.get(id=submission.id_student).username if User.objects.filter(id=submission.id_student).exists() else None,
-                        "username": User.objects.get(id=submission.id_student).username,
-                        "answer": submission.submission,
-                        "timestamp": str(submission.submission_time)
-                    } for submission in IAASubmission.objects.filter(stage=stage).all()]
-                } for stage in stages if stage.activity == activity]
-            })
-        return JsonResponse(out, safe=False)
+        activities = list(IAAActivity.objects.filter(id_course=course_id).all())
+        stages = list(IAAStage.objects.filter(activity__in=activities).all())
+        submissions = {}
+        for submission in IAASubmission.objects.filter(stage__in=stages).all():
+            submissions.setdefault(submission.stage_id, []).append(submission)
+        usernames = user_cache.resolve_many_usernames(
+            [submission.id_student for stage_submissions in submissions.values() for submission in stage_submissions]
+        )
+
+        def answers(stage):
+            return [{
+                "user": usernames.get(submission.id_student),
+                "username": usernames.get(submission.id_student),
+                "answer": submission.submission,
+                "timestamp": str(submission.submission_time)
+            } for submission in submissions.get(stage.id, [])]
+
+        out = ({
+            "id_course": activity.id_course,
+            "name": activity.activity_name,
+            "stages": [{
+                "label": stage.stage_label,
+                "number": stage.stage_number,
+                "answers": answers(stage)
+            } for stage in stages if stage.activity_id == activity.id]
+        } for activity in activities)
+        return list_response(request, out)
 
 
 class GetIterativeXBlockUserData(APIView):
@@ -429,33 +474,37 @@ class GetIterativeXBlockUserData(APIView):
 
     permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS,)
     
+    @read_replica
     def post(self, request):
         """
         Endpoint usado por el panel de administración de RedFID para obtener los datos de un usuario en el IterativeXBlock.
         """
-        from django.contrib.auth.models import User
         try:
             from iterativexblock.models import IterativeXBlockQuestion, IterativeXBlockAnswer
         except ImportError:
             return HttpResponseBadRequest("IterativeXBlock not found")
         try:
-            data = json.loads(request.body)
+            data = load_request_json(request)
         except json.JSONDecodeError:
             return HttpResponseBadRequest("Invalid JSON data")
         username = data.get('username')
         if not username:
             return HttpResponseBadRequest("Missing username")
-        try:
-            user = User.objects.get(username=username)
-        except User.DoesNotExist:
+        user_id = resolve_user_id(username)
+        if user_id is None:
             return HttpResponseBadRequest("User not found")
         course_id = data.get('course_id')
         if not course_id:
             return HttpResponseBadRequest("Missing course_id")
-        questions = IterativeXBlockQuestion.objects.filter(id_course=course_id).all()
+        questions = list(IterativeXBlockQuestion.objects.filter(id_course=course_id).all())
+        answers = {}
+        for answer in IterativeXBlockAnswer.objects.filter(
+            id_student=user_id, question_id__in=[question.id for question in questions]
+        ):
+            answers.setdefault(answer.question_id, answer)
         out = []
         for question in questions:
-            answer = IterativeXBlockAnswer.objects.filter(id_student=user.id, question_id=question.id).first()
+            answer = answers.get(question.id)
             q = {
                 "id_xblock": question.id_xblock,
                 "id_course": question.id_course,
@@ -477,44 +526,47 @@ class GetIterativeXBlockCourseData(APIView):
 
     permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS,)
     
+    @read_replica
+    @cache_course_response
+    @limit_concurrency('get_iterativexblock_course_data')
     def post(self, request):
         """
         Endpoint usado por el panel de administración de RedFID para obtener los datos de un curso en el IterativeXBlock.
         """
-        from django.contrib.auth.models import User
         try:
             from iterativexblock.models import IterativeXBlockQuestion, IterativeXBlockAnswer
         except ImportError:
             return HttpResponseBadRequest("IterativeXBlock not found")
         try:
-            data = json.loads(request.body)
+            data = load_request_json(request)
         except json.JSONDecodeError:
             return HttpResponseBadRequest("Invalid JSON data")
         course_id = data.get('course_id')
         if not course_id:
             return HttpResponseBadRequest("Missing course_id")
         questions = IterativeXBlockQuestion.objects.filter(id_course=course_id).all()
-        answers = IterativeXBlockAnswer.objects.filter(id_course=course_id).all()
-        out = []
-        for question in questions:
-            q = {
-                "id_xblock": question.id_xblock,
-                "id_question": question.id_question,
-                "answers": []
-            }
-            for answer in answers:
-                if answer.question_id == question.id:
-                    try:
-                        username = User.objects.get(id=answer.id_student).username
-                    except User.DoesNotExist:
-                        username = None
+        answers = list(IterativeXBlockAnswer.objects.filter(id_course=course_id).all())
+        usernames = user_cache.resolve_many_usernames([answer.id_student for answer in answers])
+        answers_by_question = {}
+        for answer in answers:
+            answers_by_question.setdefault(answer.question_id, []).append(answer)
+
+        def rows():
+            for question in questions:
+                q = {
+                    "id_xblock": question.id_xblock,
+                    "id_question": question.id_question,
+                    "answers": []
+                }
+                for answer in answers_by_question.get(question.id, []):
                     q['answers'].append({
-                        "username": username,
+                        "username": usernames.get(answer.id_student),
                         "answer": answer.answer,
                         "timestamp": str(answer.timestamp)
                     })
-            out.append(q)
-        return JsonResponse(out, safe=False)
+                yield q
+
+        return list_response(request, rows())
             
 
 class GetUserCertificates(APIView):
@@ -527,32 +579,26 @@ class GetUserCertificates(APIView):
 
     permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS,)
 
+    @read_replica
     def post(self, request):
         """
         Endpoint usado por el panel de administración de RedFID para obtener los certificados de un usuario.
+        Si se entrega page_size, se retorna una página de certificados y el valor de after para la siguiente página.
         """
-        from django.contrib.auth.models import User
         from lms.djangoapps.certificates.models import GeneratedCertificate
         try:
-            data = json.loads(request.body)
+            data = load_request_json(request)
         except json.JSONDecodeError:
             return HttpResponseBadRequest("Invalid JSON data")
         username = data.get('username')
         if not username:
             return HttpResponseBadRequest("Missing username")
         try:
-            user_certificates = GeneratedCertificate.objects.filter(user__username=username).all()
-        except User.DoesNotExist:
-            return HttpResponseBadRequest("User not found")
-        out = []
-        for certificate in user_certificates:
-            out.append({
-                "username": certificate.user.username,
-                "course_id": str(certificate.course_id),
-                "verify_uuid": certificate.verify_uuid,
-                "key": certificate.key
-            })
-        return JsonResponse(out, safe=False)
+            page_size, after = get_keyset_pagination(data)
+        except ValueError as e:
+            return HttpResponseBadRequest(str(e))
+        user_certificates = GeneratedCertificate.objects.filter(user__username=username)
+        return certificates_response(request, user_certificates, page_size, after)
 
 
 class GetCourseCertificates(APIView):
@@ -565,32 +611,97 @@ class GetCourseCertificates(APIView):
 
     permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS,)
 
+    @read_replica
+    @cache_course_response
+    @limit_concurrency('get_course_certificates')
     def post(self, request):
         """
         Endpoint usado por el panel de administración de RedFID para obtener los certificados de un curso.
+        Si se entrega page_size, se retorna una página de certificados y el valor de after para la siguiente página.
+        Si course_id es una lista de cursos, o se entrega course_prefix en vez de course_id, se retornan los certificados
+        agrupados por curso, junto con el nombre y las fechas de cada curso.
         """
         from lms.djangoapps.certificates.models import GeneratedCertificate
         try:
-            data = json.loads(request.body)
+            data = load_request_json(request)
         except json.JSONDecodeError:
             return HttpResponseBadRequest("Invalid JSON data")
         course_id = data.get('course_id')
-        if not course_id:
+        course_prefix = data.get('course_prefix')
+        if not course_id and not course_prefix:
             return HttpResponseBadRequest("Missing course_id")
+        if course_id and type(course_id) == list:
+            try:
+                course_keys = [CourseKey.from_string(key) for key in course_id]
+            except:
+                return HttpResponseBadRequest("Course not found")
+            return list_response(request, get_courses_certificates(course_keys=course_keys))
+        if not course_id:
+            if not isinstance(course_prefix, str):
+                return HttpResponseBadRequest("Invalid course_prefix")
+            return list_response(request, get_courses_certificates(course_prefix=course_prefix))
         try:
-            certificates = GeneratedCertificate.objects.filter(course_id=course_id).all()
+            course_id = CourseKey.from_string(course_id)
         except:
             return HttpResponseBadRequest("Course not found")
+        try:
+            page_size, after = get_keyset_pagination(data)
+        except ValueError as e:
+            return HttpResponseBadRequest(str(e))
+        certificates = GeneratedCertificate.objects.filter(course_id=course_id)
+        return certificates_response(request, certificates, page_size, after)
+    
+
+class GetCertificateStatus(APIView):
+
+    authentication_classes = (
+        JwtAuthentication,
+        BearerAuthenticationAllowInactiveUser,
+        SessionAuthenticationAllowInactiveUser,
+    )
+
+    permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS,)
+
+    @read_replica
+    def post(self, request):
+        """
+        Endpoint usado por el panel de administración de RedFID para obtener el estado del certificado de una lista de
+        pares (username, course_id). Los certificados se consultan en lotes. Los pares sin certificado se retornan
+        con status null.
+        """
+        try:
+            data = load_request_json(request)
+        except json.JSONDecodeError:
+            return HttpResponseBadRequest("Invalid JSON data")
+        pairs = data.get('pairs')
+        if not pairs:
+            return HttpResponseBadRequest("Missing pairs")
+        if type(pairs) != list or len(pairs) > settings.REDFID_EDX_API_MAX_CERTIFICATE_STATUS_PAIRS:
+            return HttpResponseBadRequest("Invalid pairs")
+        course_keys = {}
+        for pair in pairs:
+            if type(pair) != dict or not isinstance(pair.get('username'), str) or not isinstance(pair.get('course_id'), str):
+                return HttpResponseBadRequest("Invalid pairs")
+            if pair['course_id'] not in course_keys:
+                try:
+                    course_keys[pair['course_id']] = CourseKey.from_string(pair['course_id'])
+                except:
+                    return HttpResponseBadRequest("Invalid course_id")
+        statuses = get_certificate_statuses(
+            {(pair['username'], course_keys[pair['course_id']]) for pair in pairs}
+        )
         out = []
-        for certificate in certificates:
+        for pair in pairs:
+            status, verify_uuid, key = statuses.get((pair['username'], course_keys[pair['course_id']]), (None, None, None))
             out.append({
-                "username": certificate.user.username,
-                "course_id": str(certificate.course_id),
-                "verify_uuid": certificate.verify_uuid,
-                "key": certificate.key
+                "username": pair['username'],
+                "course_id": pair['course_id'],
+                "status": status,
+                "verify_uuid": verify_uuid,
+                "key": key
             })
         return JsonResponse(out, safe=False)
-    
+
 
 class EmitUserCertificate(APIView):
     
@@ -602,6 +713,8 @@ class EmitUserCertificate(APIView):
 
     permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS,)
 
+    @sticky_write
+    @atomic_write
     def post(self, request):
         """
         Endpoint usado por el panel de administración de RedFID para emitir un certificado a un usuario.
@@ -609,7 +722,7 @@ class EmitUserCertificate(APIView):
         from django.contrib.auth.models import User
         from lms.djangoapps.certificates.models import GeneratedCertificate
         try:
-            data = json.loads(request.body)
+            data = load_request_json(request)
         except json.JSONDecodeError:
             return HttpResponseBadRequest("Invalid JSON data")
         username = data.get('username')
@@ -626,12 +739,149 @@ class EmitUserCertificate(APIView):
             course_id = CourseKey.from_string(course_id)
         except: 
             return HttpResponseBadRequest("Invalid course_id")
-        course = modulestore().get_course(course_id)
+        course = get_course(course_id)
         xqueue = XQueueCertInterface()
         xqueue.add_cert(user, course_id, course=course, generate_pdf=False, forced_grade="Aprobado")
         return HttpResponse(f"Certificate emitted for user {username} in course {course_id}")
 
 
+class EmitCourseCertificates(APIView):
+
+    authentication_classes = (
+        JwtAuthentication,
+        BearerAuthenticationAllowInactiveUser,
+        SessionAuthenticationAllowInactiveUser,
+    )
+
+    permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS,)
+
+    @sticky_write
+    def post(self, request):
+        """
+        Endpoint usado por el panel de administración de RedFID para emitir los certificados de una lista de usuarios
+        en un curso. El curso se carga una sola vez, los usuarios se obtienen con consultas en lote y los certificados
+        se emiten por lotes. Se retorna el resultado de cada usuario.
+        """
+        try:
+            data = load_request_json(request)
+        except json.JSONDecodeError:
+            return HttpResponseBadRequest("Invalid JSON data")
+        usernames = data.get('usernames')
+        course_id = data.get('course_id')
+        if not usernames:
+            return HttpResponseBadRequest("Missing usernames")
+        if type(usernames) != list or not all(isinstance(username, str) for username in usernames):
+            return HttpResponseBadRequest("Invalid usernames")
+        if not course_id:
+            return HttpResponseBadRequest("Missing course_id")
+        try:
+            course_id = CourseKey.from_string(course_id)
+        except:
+            return HttpResponseBadRequest("Invalid course_id")
+        course = get_course(course_id)
+        if course is None:
+            return HttpResponseBadRequest("Course not found")
+        usernames = list(dict.fromkeys(usernames))
+        users = get_users_by_username(usernames)
+        xqueue = XQueueCertInterface()
+        emitted = iter(bulk_emit_certificates(xqueue, [users[username] for username in usernames if username in users], course_id, course))
+        out = [
+            next(emitted) if username in users else {"username": username, "status": "error", "reason": "User not found"}
+            for username in usernames
+        ]
+        return JsonResponse({"course_id": str(course_id), "results": out}, safe=False)
+
+
+class QueueUserCertificate(APIView):
+
+    authentication_classes = (
+        JwtAuthentication,
+        BearerAuthenticationAllowInactiveUser,
+        SessionAuthenticationAllowInactiveUser,
+    )
+
+    permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS,)
+
+    @sticky_write
+    def post(self, request):
+        """
+        Endpoint usado por el panel de administración de RedFID para solicitar la emisión asíncrona de un certificado.
+        Cada solicitud lleva una idempotency_key (en el cuerpo o en el header Idempotency-Key). Se retorna de inmediato
+        el id del trabajo, que se procesa en un worker de Celery. Los reintentos con la misma idempotency_key retornan
+        el mismo trabajo, y solo lo vuelven a encolar si quedó sin procesar: pendiente porque falló el encolado, o en
+        running porque su worker murió (ver CertificateEmissionJob.is_claimable).
+        """
+        from .models import CertificateEmissionJob
+        from .tasks import emit_certificate_job
+        try:
+            data = load_request_json(request)
+        except json.JSONDecodeError:
+            return HttpResponseBadRequest("Invalid JSON data")
+        idempotency_key = data.get('idempotency_key') or request.META.get('HTTP_IDEMPOTENCY_KEY')
+        username = data.get('username')
+        course_id = data.get('course_id')
+        if not idempotency_key:
+            return HttpResponseBadRequest("Missing idempotency_key")
+        if not username:
+            return HttpResponseBadRequest("Missing username")
+        if not course_id:
+            return HttpResponseBadRequest("Missing course_id")
+        try:
+            course_id = CourseKey.from_string(course_id)
+        except:
+            return HttpResponseBadRequest("Invalid course_id")
+        try:
+            with transaction.atomic():
+                job, created = CertificateEmissionJob.objects.get_or_create(
+                    idempotency_key=idempotency_key,
+                    defaults={"username": username, "course_id": course_id},
+                )
+        except IntegrityError:
+            job, created = CertificateEmissionJob.objects.get(idempotency_key=idempotency_key), False
+        if job.username != username or job.course_id != course_id:
+            return HttpResponseBadRequest("Idempotency key already used")
+        if created or job.is_claimable():
+            job_id = str(job.job_id)
+            transaction.on_commit(lambda: emit_certificate_job.delay(job_id))
+        return JsonResponse({"job_id": str(job.job_id), "status": job.status}, safe=False)
+
+
+class GetCertificateEmissionJob(APIView):
+
+    authentication_classes = (
+        JwtAuthentication,
+        BearerAuthenticationAllowInactiveUser,
+        SessionAuthenticationAllowInactiveUser,
+    )
+
+    permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS,)
+
+    def post(self, request):
+        """
+        Endpoint usado por el panel de administración de RedFID para consultar el estado de una emisión asíncrona de un certificado.
+        """
+        from django.core.exceptions import ValidationError
+        from .models import CertificateEmissionJob
+        try:
+            data = load_request_json(request)
+        except json.JSONDecodeError:
+            return HttpResponseBadRequest("Invalid JSON data")
+        job_id = data.get('job_id')
+        if not job_id:
+            return HttpResponseBadRequest("Missing job_id")
+        try:
+            job = CertificateEmissionJob.objects.get(job_id=job_id)
+        except (CertificateEmissionJob.DoesNotExist, ValidationError):
+            return HttpResponseBadRequest("Job not found")
+        return JsonResponse({
+            "job_id": str(job.job_id),
+            "username": job.username,
+            "course_id": str(job.course_id),
+            "status": job.status,
+            "error": job.error,
+        }, safe=False)
+
+
 class RevokeUserCertificate(APIView):
         
     authentication_classes = (
@@ -642,6 +892,8 @@ class RevokeUserCertificate(APIView):
 
     permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS,)
 
+    @sticky_write
+    @atomic_write
     def post(self, request):
         """
         Endpoint usado por el panel de administración de RedFID para revocar un certificado de un usuario.
@@ -649,7 +901,7 @@ class RevokeUserCertificate(APIView):
         from django.contrib.auth.models import User
         from lms.djangoapps.certificates.models import GeneratedCertificate
         try:
-            data = json.loads(request.body)
+            data = load_request_json(request)
         except json.JSONDecodeError:
             return HttpResponseBadRequest("Invalid JSON data")
         username = data.get('username')
@@ -674,6 +926,56 @@ class RevokeUserCertificate(APIView):
         return HttpResponse(f"Certificate revoked for user {username} in course {course_id}")
 
 
+class RevokeCourseCertificates(APIView):
+
+    authentication_classes = (
+        JwtAuthentication,
+        BearerAuthenticationAllowInactiveUser,
+        SessionAuthenticationAllowInactiveUser,
+    )
+
+    permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS,)
+
+    @sticky_write
+    def post(self, request):
+        """
+        Endpoint usado por el panel de administración de RedFID para revocar los certificados de una lista de usuarios
+        en un curso, o de todos los usuarios del curso si usernames es "all". Los certificados se eliminan por lotes.
+        Se retornan los usernames cuyos certificados fueron revocados y los que no tenían certificado.
+        """
+        from lms.djangoapps.certificates.models import GeneratedCertificate
+        try:
+            data = load_request_json(request)
+        except json.JSONDecodeError:
+            return HttpResponseBadRequest("Invalid JSON data")
+        usernames = data.get('usernames')
+        course_id = data.get('course_id')
+        if not usernames:
+            return HttpResponseBadRequest("Missing usernames")
+        if usernames != "all" and (type(usernames) != list or not all(isinstance(username, str) for username in usernames)):
+            return HttpResponseBadRequest("Invalid usernames")
+        if not course_id:
+            return HttpResponseBadRequest("Missing course_id")
+        try:
+            course_id = CourseKey.from_string(course_id)
+        except:
+            return HttpResponseBadRequest("Invalid course_id")
+        if usernames == "all":
+            usernames_by_id = dict(
+                GeneratedCertificate.objects.filter(course_id=course_id).values_list('user_id', 'user__username')
+            )
+            revoked = bulk_revoke_certificates(course_id, usernames_by_id)
+            absent = []
+        else:
+            usernames = list(dict.fromkeys(usernames))
+            users = get_users_by_username(usernames)
+            revoked = bulk_revoke_certificates(course_id, {user.id: username for username, user in users.items()})
+            revoked_set = set(revoked)
+            revoked = [username for username in usernames if username in revoked_set]
+            absent = [username for username in usernames if username not in revoked_set]
+        return JsonResponse({"course_id": str(course_id), "revoked": revoked, "absent": absent}, safe=False)
+
+
 class GetXBlockUserData(APIView):
 
     authentication_classes = (
@@ -684,14 +986,14 @@ class GetXBlockUserData(APIView):
 
     permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS,)
     
+    @read_replica
     def post(self, request):
         """
         Endpoint usado por el panel de administración de RedFID para la respuesta de un usuario a un XBlock.
         """
-        from django.contrib.auth.models import User
         from lms.djangoapps.courseware.models import StudentModule
         try:
-            data = json.loads(request.body)
+            data = load_request_json(request)
         except json.JSONDecodeError:
             return HttpResponseBadRequest("Invalid JSON data")
         username = data.get('username')
@@ -712,42 +1014,36 @@ class GetXBlockUserData(APIView):
 
         course_suffix = course_id.split("course-v1:")[1] if "course-v1:" in course_id else course_id
 
-        try:
-            user = User.objects.get(username=username)
-        except User.DoesNotExist:
+        user_id = resolve_user_id(username)
+        if user_id is None:
             return HttpResponseBadRequest("User not found")
+        if snapshots_enabled():
+            block_ids = id_xblock if type(id_xblock) == list else [id_xblock]
+            module_state_keys = ["block-v1:{}+type@{}+block@{}".format(course_suffix, xblock_type, block_id) for block_id in block_ids]
+            answers = get_user_snapshot_answers(user_id, module_state_keys)
+            out = [dump_answer(answers.get(module_state_key, "null")) for module_state_key in module_state_keys]
+            if type(id_xblock) != list:
+                return HttpResponse(out[0], content_type="application/json")
+            return HttpResponse("[" + ", ".join(out) + "]", content_type="application/json")
         if type(id_xblock) == list:
-            out = []
-            for block_id in id_xblock:
-                try:
-                    module_state_key = "block-v1:{}+type@{}+block@{}".format(course_suffix, xblock_type, block_id)
-                    student_module = StudentModule.objects.get(student=user, module_state_key=module_state_key)
-                    
-                    if xblock_type == 'freetextresponse':
-                        answer = json.loads(student_module.state)['student_answer'] if 'student_answer' in json.loads(student_module.state).keys() else None
-                    elif xblock_type == 'iterativexblock' or xblock_type == 'problem':
-                        answer = json.loads(student_module.state)['student_answers'] if 'student_answers' in json.loads(student_module.state).keys() else None
-                    else:
-                        answer = None
-                    out.append({"answer": answer})
-                except StudentModule.DoesNotExist:
-                    out.append({"answer": None})
+            module_state_keys = ["block-v1:{}+type@{}+block@{}".format(course_suffix, xblock_type, block_id) for block_id in id_xblock]
+            states = {}
+            for chunk in chunked(module_state_keys):
+                states.update(
+                    (str(module_state_key), state) for module_state_key, state in StudentModule.objects.filter(
+                        student_id=user_id, module_state_key__in=chunk
+                    ).values_list('module_state_key', 'state')
+                )
+            out = [{
+                "answer": get_answer_from_state(xblock_type, states[module_state_key]) if module_state_key in states else None
+            } for module_state_key in module_state_keys]
         else:
             try:
                 module_state_key = "block-v1:{}+type@{}+block@{}".format(course_suffix, xblock_type, id_xblock)
-                student_module = StudentModule.objects.get(student=user, module_state_key=module_state_key)
-                if xblock_type == 'freetextresponse':
-                    out = {
-                        "answer": json.loads(student_module.state)['student_answer'] if 'student_answer' in json.loads(student_module.state).keys() else None
-                    }
-                elif xblock_type == 'iterativexblock' or xblock_type == 'problem':
-                    out = {
-                        "answer": json.loads(student_module.state)['student_answers'] if 'student_answers' in json.loads(student_module.state).keys() else None
-                    }
-                else:
-                    out = {
-                        "answer": None
-                    }
+                student_module = StudentModule.objects.get(student_id=user_id, module_state_key=module_state_key)
+                out = {
+                    "answer": get_answer_from_state(xblock_type, student_module.state)
+                }
             except StudentModule.DoesNotExist:
                 out = {
                     "answer": None
@@ -765,15 +1061,20 @@ class GetXBlockCourseData(APIView):
 
     permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS,)
 
+    @read_replica
+    @cache_course_response
+    @limit_concurrency('get_xblock_course_data')
     def post(self, request):
         """
         Endpoint usado por el panel de administración de RedFID para obtener las respuestas de todos
         los usuarios a un XBlock de un curso.
+        Si id_xblock es "*", se obtienen las respuestas a todos los XBlocks del tipo xblock_type en el curso,
+        agrupadas por XBlock.
         """
-        from django.contrib.auth.models import User
+        from itertools import groupby
         from lms.djangoapps.courseware.models import StudentModule
         try:
-            data = json.loads(request.body)
+            data = load_request_json(request)
         except json.JSONDecodeError:
             return HttpResponseBadRequest("Invalid JSON data")
         id_xblock = data.get('id_xblock')
@@ -791,29 +1092,71 @@ class GetXBlockCourseData(APIView):
 
         course_suffix = course_id.split("course-v1:")[1] if "course-v1:" in course_id else course_id
 
+        if id_xblock == "*":
+            try:
+                course_key = CourseKey.from_string("course-v1:" + course_suffix)
+            except:
+                return HttpResponseBadRequest("Invalid course_id")
+            prefix = "block-v1:{}+type@{}+block@".format(course_suffix, xblock_type)
+            if snapshots_enabled():
+                rows = iter_course_snapshot_answers(course_key=course_key, xblock_type=xblock_type)
+                out = (
+                    RawJSON(dump_block_answers(block_key[len(prefix):], [(username, answer) for _, username, answer in snapshots]))
+                    for block_key, snapshots in groupby(rows, key=lambda row: row[0])
+                )
+                return list_response(request, out)
+            rows = StudentModule.objects.filter(
+                course_id=course_key,
+                module_type=xblock_type,
+                module_state_key__startswith=prefix,
+            ).order_by('module_state_key', 'id').values_list(
+                'module_state_key', 'student__username', 'state'
+            ).iterator()
+            out = ({
+                "id_xblock": module_state_key[len(prefix):],
+                "answers": [{
+                    "username": username,
+                    "answer": get_answer_from_state(xblock_type, state),
+                } for _, username, state in modules]
+            } for module_state_key, modules in groupby(rows, key=lambda row: str(row[0])))
+            return list_response(request, out)
+
         block_ids = id_xblock if type(id_xblock) == list else [id_xblock]
-        out = []
-        for block_id in block_ids:
-            module_state_key = "block-v1:{}+type@{}+block@{}".format(course_suffix, xblock_type, block_id)
-            modules = StudentModule.objects.filter(module_state_key=module_state_key).select_related('student')
-            answers = []
-            for module in modules:
-                state = json.loads(module.state)
-                if xblock_type == 'freetextresponse':
-                    answer = state.get('student_answer')
-                elif xblock_type in ('iterativexblock', 'problem'):
-                    answer = state.get('student_answers')
-                else:
-                    answer = None
-                answers.append({
-                    "username": module.student.username,
-                    "answer": answer,
-                })
-            out.append({"id_xblock": block_id, "answers": answers})
+        if snapshots_enabled():
+            def snapshot_rows():
+                for chunk in chunked(block_ids):
+                    module_state_keys = [
+                        "block-v1:{}+type@{}+block@{}".format(course_suffix, xblock_type, block_id) for block_id in chunk
+                    ]
+                    groups = groupby(iter_course_snapshot_answers(block_keys=module_state_keys), key=lambda row: row[0])
+                    for block_id, (_, snapshots) in zip(chunk, iter_groups_in_order(module_state_keys, groups)):
+                        yield RawJSON(dump_block_answers(block_id, [(username, answer) for _, username, answer in snapshots]))
+
+            out = snapshot_rows()
+            if type(id_xblock) != list:
+                return HttpResponse(next(out), content_type="application/json")
+            return list_response(request, out)
+
+        def rows():
+            # Las filas se recorren ordenadas por module_state_key, y cada XBlock se retorna apenas se completan
+            # sus filas, en el orden pedido (ver iter_groups_in_order).
+            for chunk in chunked(block_ids):
+                module_state_keys = [
+                    "block-v1:{}+type@{}+block@{}".format(course_suffix, xblock_type, block_id) for block_id in chunk
+                ]
+                modules = StudentModule.objects.filter(module_state_key__in=module_state_keys).order_by(
+                    'module_state_key', 'id'
+                ).values_list('module_state_key', 'student__username', 'state').iterator()
+                groups = groupby(modules, key=lambda row: str(row[0]))
+                for block_id, (_, block_modules) in zip(chunk, iter_groups_in_order(module_state_keys, groups)):
+                    yield {"id_xblock": block_id, "answers": [{
+                        "username": username,
+                        "answer": get_answer_from_state(xblock_type, state),
+                    } for _, username, state in block_modules]}
 
         if type(id_xblock) != list:
-            return JsonResponse(out[0], safe=False)
-        return JsonResponse(out, safe=False)
+            return JsonResponse(next(rows()), safe=False)
+        return list_response(request, rows())
 
 
 class EnrollUserIntoCourse(APIView):
@@ -826,6 +1169,8 @@ class EnrollUserIntoCourse(APIView):
 
     permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS,)
 
+    @sticky_write
+    @atomic_write
     def post(self, request):
         """
         Endpoint usado por el panel de administración de RedFID para inscribir un usuario en un curso.
@@ -833,7 +1178,7 @@ class EnrollUserIntoCourse(APIView):
         from django.contrib.auth.models import User
         from lms.djangoapps.instructor.enrollment import enroll_email, get_user_email_language
         try:
-            data = json.loads(request.body)
+            data = load_request_json(request)
         except json.JSONDecodeError:
             return HttpResponseBadRequest("Invalid JSON data")
         username = data.get('username')
@@ -850,17 +1195,58 @@ class EnrollUserIntoCourse(APIView):
             user = User.objects.get(username=username)
             email = user.email
             language = get_user_email_language(user)
+        except QueryBudgetExceeded:
+            raise
         except:
             return HttpResponseBadRequest("User not found")
         try:
             enroll_email(
                 course_id, email, False, False, {}, language=language
             )
+        except QueryBudgetExceeded:
+            raise
         except:
             return HttpResponseBadRequest("Error enrolling user in course")
         return HttpResponse(f"User {username} enrolled in course {course_id}")
     
 
+class EnrollUsersIntoCourse(APIView):
+
+    authentication_classes = (
+        JwtAuthentication,
+        BearerAuthenticationAllowInactiveUser,
+        SessionAuthenticationAllowInactiveUser,
+    )
+
+    permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS,)
+
+    @sticky_write
+    def post(self, request):
+        """
+        Endpoint usado por el panel de administración de RedFID para inscribir una lista de usuarios en un curso.
+        Los usuarios y sus preferencias de idioma se obtienen con consultas en lote, y las inscripciones se realizan
+        por lotes. Se retorna el resultado de cada usuario.
+        """
+        try:
+            data = load_request_json(request)
+        except json.JSONDecodeError:
+            return HttpResponseBadRequest("Invalid JSON data")
+        usernames = data.get('usernames')
+        course_id = data.get('course_id')
+        if not usernames:
+            return HttpResponseBadRequest("Missing usernames")
+        if type(usernames) != list or not all(isinstance(username, str) for username in usernames):
+            return HttpResponseBadRequest("Invalid usernames")
+        if not course_id:
+            return HttpResponseBadRequest("Missing course_id")
+        try:
+            course_id = CourseKey.from_string(course_id)
+        except:
+            return HttpResponseBadRequest("Invalid course_id")
+        out = bulk_enroll_users(course_id, list(dict.fromkeys(usernames)))
+        return JsonResponse({"course_id": str(course_id), "results": out}, safe=False)
+
+
 class UnenrollUserFromCourse(APIView):
 
     authentication_classes = (
@@ -871,6 +1257,8 @@ class UnenrollUserFromCourse(APIView):
 
     permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS,)
     
+    @sticky_write
+    @atomic_write
     def post(self, request):
         """
         Endpoint usado por el panel de administración de RedFID para desinscribir un usuario de un curso.
@@ -878,7 +1266,7 @@ class UnenrollUserFromCourse(APIView):
         from django.contrib.auth.models import User
         from lms.djangoapps.instructor.enrollment import unenroll_email, get_user_email_language
         try:
-            data = json.loads(request.body)
+            data = load_request_json(request)
         except json.JSONDecodeError:
             return HttpResponseBadRequest("Invalid JSON data")
         username = data.get('username')
@@ -895,16 +1283,206 @@ class UnenrollUserFromCourse(APIView):
             user = User.objects.get(username=username)
             email = user.email
             language = get_user_email_language(user)
+        except QueryBudgetExceeded:
+            raise
         except:
             return HttpResponseBadRequest("User not found")
         try:
             unenroll_email(
                 course_id, email, False, {}, language=language
             )
+        except QueryBudgetExceeded:
+            raise
         except:
             return HttpResponseBadRequest("Error unenrolling user from course")
         return HttpResponse(f"User {username} unenrolled from course {course_id}")
 
-    
 
+class UnenrollUsersFromCourse(APIView):
+
+    authentication_classes = (
+        JwtAuthentication,
+        BearerAuthenticationAllowInactiveUser,
+        SessionAuthenticationAllowInactiveUser,
+    )
+
+    permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS,)
 
+    @sticky_write
+    def post(self, request):
+        """
+        Endpoint usado por el panel de administración de RedFID para desinscribir una lista de usuarios de un curso.
+        Los usuarios y sus preferencias de idioma se obtienen con consultas en lote, y las desinscripciones se realizan
+        por lotes. Se retorna el resultado de cada usuario.
+        """
+        try:
+            data = load_request_json(request)
+        except json.JSONDecodeError:
+            return HttpResponseBadRequest("Invalid JSON data")
+        usernames = data.get('usernames')
+        course_id = data.get('course_id')
+        if not usernames:
+            return HttpResponseBadRequest("Missing usernames")
+        if type(usernames) != list or not all(isinstance(username, str) for username in usernames):
+            return HttpResponseBadRequest("Invalid usernames")
+        if not course_id:
+            return HttpResponseBadRequest("Missing course_id")
+        try:
+            course_id = CourseKey.from_string(course_id)
+        except:
+            return HttpResponseBadRequest("Invalid course_id")
+        out = bulk_unenroll_users(course_id, list(dict.fromkeys(usernames)))
+        return JsonResponse({"course_id": str(course_id), "results": out}, safe=False)
+
+
+class SyncCourseRoster(APIView):
+
+    authentication_classes = (
+        JwtAuthentication,
+        BearerAuthenticationAllowInactiveUser,
+        SessionAuthenticationAllowInactiveUser,
+    )
+
+    permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS,)
+
+    @sticky_write
+    def post(self, request):
+        """
+        Endpoint usado por el panel de administración de RedFID para sincronizar los inscritos de un curso.
+        Recibe la lista completa de usernames que deben estar inscritos, la compara con las inscripciones activas
+        del curso, e inscribe o desinscribe solamente a los usuarios que cambiaron.
+        """
+        from common.djangoapps.student.models import CourseEnrollment
+        try:
+            data = load_request_json(request)
+        except json.JSONDecodeError:
+            return HttpResponseBadRequest("Invalid JSON data")
+        usernames = data.get('usernames')
+        course_id = data.get('course_id')
+        if usernames is None:
+            return HttpResponseBadRequest("Missing usernames")
+        if type(usernames) != list or not all(isinstance(username, str) for username in usernames):
+            return HttpResponseBadRequest("Invalid usernames")
+        if not course_id:
+            return HttpResponseBadRequest("Missing course_id")
+        try:
+            course_id = CourseKey.from_string(course_id)
+        except:
+            return HttpResponseBadRequest("Invalid course_id")
+        desired = set(usernames)
+        current = set(CourseEnrollment.objects.filter(
+            course_id=course_id, is_active=True
+        ).values_list('user__username', flat=True))
+        results = bulk_enroll_users(course_id, sorted(desired - current))
+        results += bulk_unenroll_users(course_id, sorted(current - desired))
+        return JsonResponse({
+            "course_id": str(course_id),
+            "enrolled": [result["username"] for result in results if result["status"] == "enrolled"],
+            "unenrolled": [result["username"] for result in results if result["status"] == "unenrolled"],
+            "unchanged": len(desired & current),
+            "errors": [result for result in results if result["status"] == "error"],
+        }, safe=False)
+
+
+class Batch(APIView):
+
+    authentication_classes = (
+        JwtAuthentication,
+        BearerAuthenticationAllowInactiveUser,
+        SessionAuthenticationAllowInactiveUser,
+    )
+
+    permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS,)
+
+    def post(self, request):
+        """
+        Endpoint usado por el panel de administración de RedFID para ejecutar varias operaciones en una sola solicitud.
+        Recibe una lista ordenada de operaciones {"endpoint", "body", "id" (opcional)}, que se ejecutan con las vistas
+        de los demás endpoints, autenticando una sola vez. Con concurrent, las operaciones de lectura consecutivas
+        se ejecutan en paralelo; con atomic, todas se ejecutan en una transacción que se deshace si alguna falla.
+        Se retorna el resultado de cada operación, en el mismo orden.
+        """
+        try:
+            data = load_request_json(request)
+        except json.JSONDecodeError:
+            return HttpResponseBadRequest("Invalid JSON data")
+        operations = data.get('operations')
+        error = validate_operations(operations)
+        if error:
+            return HttpResponseBadRequest(error)
+        results, rolled_back = run_batch(
+            request, operations, concurrent=data.get('concurrent') is True, atomic=data.get('atomic') is True
+        )
+        return JsonResponse({"results": results, "rolled_back": rolled_back}, safe=False)
+
+
+class GetMetrics(APIView):
+
+    authentication_classes = (
+        JwtAuthentication,
+        BearerAuthenticationAllowInactiveUser,
+        SessionAuthenticationAllowInactiveUser,
+    )
+
+    permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS,)
+
+    def get(self, request):
+        """
+        Endpoint usado para monitorear la integración con el panel de administración de RedFID.
+        Retorna en formato de texto de Prometheus los agregados de este proceso de cada endpoint: cantidad de
+        solicitudes, histogramas de duración, filas retornadas y consultas a la base de datos, y errores por motivo.
+        """
+        return HttpResponse(metrics_registry.export(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+class ListProfiles(APIView):
+
+    authentication_classes = (
+        JwtAuthentication,
+        BearerAuthenticationAllowInactiveUser,
+        SessionAuthenticationAllowInactiveUser,
+    )
+
+    permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS,)
+
+    def get(self, request):
+        """
+        Endpoint usado para listar los perfiles de solicitudes guardados por profiling.profile_view, con su endpoint,
+        parámetros y fecha. Solo para superusuarios o JWT de administrador.
+        """
+        if not is_privileged(request):
+            return HttpResponseForbidden("Not allowed")
+        return JsonResponse(list_profiles(), safe=False)
+
+
+class DownloadProfile(APIView):
+
+    authentication_classes = (
+        JwtAuthentication,
+        BearerAuthenticationAllowInactiveUser,
+        SessionAuthenticationAllowInactiveUser,
+    )
+
+    permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS,)
+
+    def post(self, request):
+        """
+        Endpoint usado para descargar un perfil guardado por profiling.profile_view (archivo .prof de cProfile
+        o .html de pyinstrument). Solo para superusuarios o JWT de administrador.
+        """
+        if not is_privileged(request):
+            return HttpResponseForbidden("Not allowed")
+        try:
+            data = load_request_json(request)
+        except json.JSONDecodeError:
+            return HttpResponseBadRequest("Invalid JSON data")
+        profile_id = data.get('profile_id')
+        if not profile_id:
+            return HttpResponseBadRequest("Missing profile_id")
+        profile = get_profile(profile_id)
+        if profile is None:
+            return HttpResponseBadRequest("Profile not found")
+        path = get_profile_path(profile)
+        if path is None or not os.path.isfile(path):
+            return HttpResponseBadRequest("Profile not found")
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=os.path.basename(path))
@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+from functools import wraps
+
+from django.db import transaction
+
+
+def atomic_write(view_func):
+    """
+    Decorador para el método post de los endpoints que modifican un usuario o una inscripción. La vista se ejecuta
+    en una sola transacción, que se deshace si la respuesta es un error, para no dejar escrituras a medias (por
+    ejemplo, un User sin su UserProfile).
+    """
+    @wraps(view_func)
+    def wrapper(self, request, *args, **kwargs):
+        with transaction.atomic():
+            response = view_func(self, request, *args, **kwargs)
+            if response.status_code >= 400:
+                transaction.set_rollback(True)
+        return response
+    return wrapper
+
+
+def save_changed_fields(instance, **values):
+    """
+    Asigna values a instance y guarda solamente los campos cuyo valor cambió, con un UPDATE de esas columnas.
+    Si ningún valor cambió, no se escribe nada. Retorna la lista de campos guardados.
+    """
+    changed = [field for field, value in values.items() if getattr(instance, field) != value]
+    for field in changed:
+        setattr(instance, field, values[field])
+    if changed:
+        instance.save(update_fields=changed)
+    return changed